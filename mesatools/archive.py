@@ -0,0 +1,418 @@
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from .reader import (MesaData, MesaLogDir, MesaProfileCatalog,
+                     MesaProfileIndex, KeyError, ProfileError, BadPathError)
+
+# Layout of a run archive:
+#
+#   magic (8 bytes) | table of contents length (uint64, little endian) |
+#   table of contents (JSON) | padding | array | padding | array | ...
+#
+# Every array starts on an `alignment`-byte boundary (measured from the start
+# of the file) so that it can be used directly from a memory map. The table
+# of contents records the dtype, shape, and offset of every array, plus the
+# header data and column names needed to rebuild MesaData objects.
+magic = b'MESARUN1'
+alignment = 64
+
+
+def _padding(position):
+    """Number of bytes needed to bring `position` to the next boundary."""
+    return -position % alignment
+
+
+def pack_logs(log_path, archive_path, profile_prefix='profile',
+              profile_suffix='data', history_file='history.data',
+              index_file='profiles.index'):
+    """Pack a logs directory into a single run archive file.
+
+    Reads the history, the profile index, and every profile file present in
+    `log_path` and writes them to `archive_path`. Profile columns are stored
+    as one contiguous array per column holding all profiles back to back
+    (ordered by profile number), with a shared table of offsets marking
+    where each profile starts, so profiles with different numbers of zones
+    need no padding. A column missing from some profiles is filled with NaN
+    (or zero for integer data) there, but is not reported as a column of
+    those profiles when they are read back.
+
+    Parameters
+    ----------
+    log_path       : string
+                     Path to the logs directory to be packed
+    archive_path   : string
+                     Path of the archive file to be written
+    profile_prefix : string, optional
+                     Prefix before profile number in profile file names,
+                     default is 'profile'
+    profile_suffix : string, optional
+                     Suffix after profile number and period for profile file
+                     names, default is 'data'
+    history_file   : string, optional
+                     Name of the history file in the logs directory, default
+                     is 'history.data'
+    index_file     : string, optional
+                     Name of the profiles index file in the logs directory,
+                     default is 'profiles.index'
+
+    Returns
+    -------
+    None
+
+    Notes
+    -----
+    All profile data are held in memory while the archive is written, so
+    packing needs roughly as much memory as the archive is large.
+    """
+    logs = MesaLogDir(log_path, profile_prefix=profile_prefix,
+                      profile_suffix=profile_suffix, history_file=history_file,
+                      index_file=index_file, memoize_profiles=False)
+    arrays = {}
+
+    history = logs.history
+    for name in history.bulk_names:
+        arrays['history/' + name] = history.data(name)
+    index_names = MesaProfileIndex.index_names
+    arrays['index'] = np.column_stack([logs.profiles.data(name) for name in
+                                       index_names])
+
+    catalog = logs.catalog
+    profile_numbers = catalog.profile_numbers.tolist()
+    column_names = []
+    # position of each column in column_names
+    column_positions = {}
+    column_dtypes = {}
+    profile_columns = []
+    profile_headers = []
+    columns = {}
+    zones = []
+    for p_num in profile_numbers:
+        profile = MesaData(catalog.path(p_num))
+        profile_headers.append([profile.header_names,
+                                [profile.header_data[name] for name in
+                                 profile.header_names]])
+        these_columns = []
+        for name in profile.bulk_names:
+            if name not in column_dtypes:
+                column_positions[name] = len(column_names)
+                column_names.append(name)
+                column_dtypes[name] = profile.bulk_data.dtype[name]
+                columns[name] = {}
+            else:
+                column_dtypes[name] = np.result_type(
+                    column_dtypes[name], profile.bulk_data.dtype[name])
+            columns[name][p_num] = profile.data(name)
+            these_columns.append(column_positions[name])
+        profile_columns.append(these_columns)
+        zones.append(len(profile.bulk_data))
+    offsets = np.zeros(len(zones) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(zones)
+    arrays['profiles/offsets'] = offsets
+    for name in column_names:
+        dtype = column_dtypes[name]
+        fill = np.nan if np.issubdtype(dtype, np.inexact) else 0
+        values = np.full(offsets[-1], fill, dtype=dtype)
+        for i, p_num in enumerate(profile_numbers):
+            if p_num in columns[name]:
+                values[offsets[i]:offsets[i + 1]] = columns[name][p_num]
+        arrays['profiles/' + name] = values
+        del columns[name]
+
+    toc = {
+        'history': {'file_name': history.file_name,
+                    'header_names': history.header_names,
+                    'header_data': [history.header_data[name] for name in
+                                    history.header_names],
+                    'bulk_names': list(history.bulk_names)},
+        'index': {'file_name': logs.profiles.file_name,
+                  'names': list(index_names)},
+        'profiles': {'prefix': profile_prefix,
+                     'suffix': profile_suffix,
+                     'numbers': profile_numbers,
+                     'sizes': catalog.sizes.tolist(),
+                     'mtimes': catalog.mtimes.tolist(),
+                     'names': column_names,
+                     'columns': profile_columns,
+                     'headers': profile_headers},
+        'arrays': {}
+    }
+    position = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        toc['arrays'][name] = {'dtype': array.dtype.str,
+                               'shape': list(array.shape),
+                               'offset': position}
+        position += array.nbytes + _padding(array.nbytes)
+    toc_bytes = json.dumps(toc).encode()
+    data_start = len(magic) + 8 + len(toc_bytes)
+    data_start += _padding(data_start)
+
+    temp_path = archive_path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(magic)
+            f.write(struct.pack('<Q', len(toc_bytes)))
+            f.write(toc_bytes)
+            f.write(b'\0' * (data_start - f.tell()))
+            for array in arrays.values():
+                f.write(array.tobytes())
+                f.write(b'\0' * _padding(array.nbytes))
+        os.replace(temp_path, archive_path)
+    except BaseException:
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def is_archive(path):
+    """Determine if `path` is a run archive made by `pack_logs`."""
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as f:
+        return f.read(len(magic)) == magic
+
+
+class MesaRunArchive:
+    """Read access to a run archive made by `pack_logs`.
+
+    The archive file is memory-mapped, so opening it reads only the table of
+    contents, and arrays are read from disk only as they are used. Mostly
+    accessed via the MesaLogDir class, which opens archives in place of logs
+    directories.
+
+    Parameters
+    ----------
+    file_name : string
+                Path to the archive file
+
+    Attributes
+    ----------
+    file_name       : string
+                      Path to the archive file
+    profile_prefix  : string
+                      Prefix of the profile file names that were packed
+    profile_suffix  : string
+                      Suffix of the profile file names that were packed
+    profile_numbers : numpy_array
+                      Sorted profile numbers of all packed profiles
+    profile_names   : list
+                      Names of all columns found in any packed profile
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        if not is_archive(file_name):
+            raise BadPathError(file_name + ' is not a MESA run archive.')
+        with open(file_name, 'rb') as f:
+            f.seek(len(magic))
+            toc_length = struct.unpack('<Q', f.read(8))[0]
+            self._toc = json.loads(f.read(toc_length).decode())
+            self._data_start = len(magic) + 8 + toc_length
+            self._data_start += _padding(self._data_start)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        profiles = self._toc['profiles']
+        self.profile_prefix = profiles['prefix']
+        self.profile_suffix = profiles['suffix']
+        self.profile_numbers = np.array(profiles['numbers'], dtype=int)
+        self.profile_names = profiles['names']
+        self._position = {p_num: i for i, p_num in
+                          enumerate(profiles['numbers'])}
+        # a copy, so that the mapping can be closed while it is in use
+        self._offsets = self._array('profiles/offsets').copy()
+
+    def _array(self, name):
+        """Memory-mapped view of the stored array called `name`."""
+        if self._mmap is None:
+            raise ValueError('I/O operation on closed archive ' +
+                             self.file_name + '.')
+        info = self._toc['arrays'][name]
+        dtype = np.dtype(info['dtype'])
+        count = int(np.prod(info['shape']))
+        return np.frombuffer(self._mmap, dtype=dtype, count=count,
+                             offset=self._data_start + info['offset']
+                             ).reshape(info['shape'])
+
+    def history(self):
+        """Return the packed history.
+
+        Returns
+        -------
+        MesaData
+            History data, as read from the original history file
+        """
+        info = self._toc['history']
+        return MesaData.from_data(
+            self._structured('history/', info['bulk_names'], slice(None)),
+            dict(zip(info['header_names'], info['header_data'])),
+            self.file_name)
+
+    def history_summary(self):
+        """Return the history header and last row without copying columns.
+
+        Returns
+        -------
+        header_data : dict
+                      Header data, as in `MesaData.header_data`
+        last_row    : dict
+                      Values of each history column in the last row
+        """
+        info = self._toc['history']
+        last_row = {}
+        for name in info['bulk_names']:
+            column = self._array('history/' + name)
+            if len(column) > 0:
+                last_row[name] = column[-1]
+        return dict(zip(info['header_names'], info['header_data'])), last_row
+
+    def profile_index(self):
+        """Return the packed profile index.
+
+        Returns
+        -------
+        MesaProfileIndex
+            Profile index, as read from the original index file
+        """
+        return MesaProfileIndex.from_array(np.array(self._array('index')),
+                                           self.file_name)
+
+    def catalog(self):
+        """Return a catalog of the packed profiles.
+
+        Returns
+        -------
+        MesaProfileCatalog
+            Catalog with the sizes and mtimes the profile files had when they
+            were packed
+        """
+        profiles = self._toc['profiles']
+        entries = {}
+        for p_num, size, mtime in zip(profiles['numbers'], profiles['sizes'],
+                                      profiles['mtimes']):
+            name = (self.profile_prefix + str(p_num) + '.' +
+                    self.profile_suffix)
+            entries[p_num] = (os.path.join(self.file_name, name), size, mtime)
+        return MesaProfileCatalog.from_entries(self.file_name,
+                                               self.profile_prefix,
+                                               self.profile_suffix, entries)
+
+    def profile(self, profile_number):
+        """Return one packed profile.
+
+        Parameters
+        ----------
+        profile_number : int
+                         profile number of the desired profile
+
+        Returns
+        -------
+        MesaData
+            Profile data, as read from the original profile file
+
+        Raises
+        ------
+        ProfileError
+            If no profile with `profile_number` was packed
+        """
+        i = self._index_of_profile(profile_number)
+        profiles = self._toc['profiles']
+        names = [self.profile_names[j] for j in profiles['columns'][i]]
+        header_names, header_data = profiles['headers'][i]
+        rows = slice(self._offsets[i], self._offsets[i + 1])
+        catalog_path = os.path.join(
+            self.file_name, self.profile_prefix + str(profile_number) + '.' +
+            self.profile_suffix)
+        return MesaData.from_data(self._structured('profiles/', names, rows),
+                                  dict(zip(header_names, header_data)),
+                                  catalog_path)
+
+    def column(self, key):
+        """Return one profile column for all packed profiles at once.
+
+        The values of all profiles are stored back to back, so this is a
+        single contiguous read from the archive.
+
+        Parameters
+        ----------
+        key : string
+              Name of a profile column
+
+        Returns
+        -------
+        values  : numpy_array
+                  Values of `key` for all profiles, in order of profile number
+        offsets : numpy_array
+                  Values for the i-th profile in `self.profile_numbers` are
+                  `values[offsets[i]:offsets[i + 1]]`
+
+        Raises
+        ------
+        KeyError
+            If `key` is not a column of any packed profile
+        """
+        if key not in self.profile_names:
+            raise KeyError("'" + str(key) + "' is not a valid data type.")
+        return self._array('profiles/' + key), self._offsets
+
+    def profile_column(self, key, profile_numbers=None):
+        """Return one profile column split into one array per profile.
+
+        Parameters
+        ----------
+        key             : string
+                          Name of a profile column
+        profile_numbers : array_like of int, optional
+                          Profiles to return, default is all packed profiles
+                          in order of profile number
+
+        Returns
+        -------
+        list of numpy_array
+            Memory-mapped values of `key`, one array per profile in
+            `profile_numbers`
+        """
+        values, offsets = self.column(key)
+        if profile_numbers is None:
+            profile_numbers = self.profile_numbers
+        positions = [self._index_of_profile(p_num) for p_num in
+                     profile_numbers]
+        return [values[offsets[i]:offsets[i + 1]] for i in positions]
+
+    def close(self):
+        """Unmap the archive file and close it.
+
+        Arrays returned by `column` and `profile_column` are views of the
+        mapping and keep it alive, so while any are in use the file is only
+        closed once the last of them is released. Copy them first (with
+        `np.array`) to close the file at once, for instance before deleting
+        or replacing it on Windows. The archive can't be read once closed.
+        """
+        if self._mmap is None:
+            return
+        mapping, self._mmap = self._mmap, None
+        try:
+            mapping.close()
+        except BufferError:
+            # arrays still use the mapping, which closes when they are freed
+            pass
+
+    def _index_of_profile(self, profile_number):
+        if profile_number not in self._position:
+            raise ProfileError("No profile with profile number " +
+                               str(profile_number) + " in " +
+                               self.file_name + ".")
+        return self._position[profile_number]
+
+    def _structured(self, prefix, names, rows):
+        """Copy rows of the stored columns `names` into a record array."""
+        columns = [self._array(prefix + name)[rows] for name in names]
+        length = len(columns[0]) if columns else 0
+        data = np.empty(length, dtype=[(name, column.dtype) for name, column
+                                       in zip(names, columns)])
+        for name, column in zip(names, columns):
+            data[name] = column
+        return data
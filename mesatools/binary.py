@@ -0,0 +1,218 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+
+from .reader import (MesaData, MesaLogDir, BadPathError, _nearest_indices,
+                     _sorted_lookup)
+
+
+class MesaBinaryRun:
+    """Structure providing access to all output of a MESA binary run.
+
+    A binary run writes a binary history along with one logs directory per
+    star (just one if the companion is a point mass). All three are loaded
+    concurrently, and the component histories can be aligned with the
+    binary history, by model number or by age, in a single vectorized join.
+
+    Parameters
+    ----------
+    run_path            : string, optional
+                          Path to the work directory of the run, default is
+                          '.'. Other paths are relative to it.
+    binary_history_file : string, optional
+                          Path of the binary history file, default is
+                          'binary_history.data'
+    log_paths           : tuple of string, optional
+                          Paths of the logs directories of the two stars,
+                          default is ('LOGS1', 'LOGS2'). A star whose logs
+                          directory does not exist (like a point mass) is
+                          left as None.
+    executor            : concurrent.futures.Executor, optional
+                          Executor used to load the three sources at once.
+                          Default is a thread pool of its own, since
+                          MesaLogDir may use `MesaLogDir.executor()` while
+                          loading, and waiting on that pool from within
+                          itself can deadlock.
+    log_kwargs          : keyword arguments
+                          Passed on to MesaLogDir for each star, e.g.
+                          `lazy=True`
+
+    Attributes
+    ----------
+    run_path       : string
+                     Path to the work directory of the run
+    binary_history : MesaData
+                     The binary history
+    star_1         : MesaLogDir
+                     Logs of the first star, or None if there are none
+    star_2         : MesaLogDir
+                     Logs of the second star, or None if there are none
+    """
+
+    def __init__(self, run_path='.', binary_history_file='binary_history.data',
+                 log_paths=('LOGS1', 'LOGS2'), executor=None, **log_kwargs):
+        self.run_path = run_path
+        binary_path = os.path.join(run_path, binary_history_file)
+        if not os.path.isfile(binary_path):
+            raise BadPathError(binary_history_file + ' not found in ' +
+                               run_path + '.')
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=len(log_paths) + 1)
+        try:
+            self._load(executor, binary_path, log_paths, log_kwargs)
+        finally:
+            if own_executor:
+                executor.shutdown()
+        self._joins = {}
+
+    def _load(self, executor, binary_path, log_paths, log_kwargs):
+        """Load the binary history and both stars' logs in `executor`."""
+        binary_future = executor.submit(MesaData, binary_path)
+        star_futures = []
+        for log_path in log_paths:
+            log_path = os.path.join(self.run_path, log_path)
+            if os.path.exists(log_path):
+                star_futures.append(executor.submit(MesaLogDir, log_path,
+                                                    **log_kwargs))
+            else:
+                star_futures.append(None)
+        self.binary_history = binary_future.result()
+        self.star_1, self.star_2 = [None if future is None else
+                                    future.result() for future in
+                                    star_futures]
+
+    def star(self, number):
+        """Return the MesaLogDir of star 1 or 2.
+
+        Raises
+        ------
+        BadPathError
+            If the star has no logs directory
+        """
+        log_dir = {1: self.star_1, 2: self.star_2}.get(number)
+        if log_dir is None:
+            raise BadPathError('No logs found for star ' + str(number) + '.')
+        return log_dir
+
+    def alignment(self, number, on='model_number'):
+        """Match each binary history row to a row of a star's history.
+
+        Parameters
+        ----------
+        number : int
+                 1 or 2, the star whose history is matched
+        on     : string, optional
+                 'model_number' (the default) to match equal model numbers,
+                 or 'age' to match each binary row to the star's row that is
+                 nearest in age
+
+        Returns
+        -------
+        indices : numpy_array
+                  For each binary history row, the index of the matching row
+                  of the star's history (only meaningful where `found`)
+        found   : numpy_array
+                  Boolean array marking binary history rows with a match
+        """
+        if (number, on) not in self._joins:
+            history = self.star(number).history
+            if on == 'model_number':
+                found, indices = _sorted_lookup(
+                    history.data('model_number'),
+                    self.binary_history.data('model_number'))
+                self._joins[(number, on)] = (indices, found)
+            elif on == 'age':
+                binary_ages = self.binary_history.data('age')
+                self._joins[(number, on)] = (
+                    _nearest_indices(history.data('star_age'), binary_ages),
+                    np.ones(len(binary_ages), dtype=bool))
+            else:
+                raise ValueError("on must be 'model_number' or 'age', not '" +
+                                 str(on) + "'.")
+        return self._joins[(number, on)]
+
+    def data(self, key, star=None, on='model_number'):
+        """Return a column aligned with the rows of the binary history.
+
+        Parameters
+        ----------
+        key  : string
+               Name of a binary history column, or of a star's history
+               column if `star` is given
+        star : int, optional
+               1 or 2 to take `key` from that star's history, default is
+               None, meaning the binary history
+        on   : string, optional
+               How a star's rows are matched to binary rows, 'model_number'
+               (the default) or 'age'. See `alignment`.
+
+        Returns
+        -------
+        numpy_array
+            Values of `key` for each binary history row. For a star's
+            column, binary rows without a matching row are NaN.
+
+        Raises
+        ------
+        KeyError
+            If `key` is not a valid column
+        """
+        if star is None:
+            return self.binary_history.data(key)
+        values = self.star(star).history.data(key)
+        indices, found = self.alignment(star, on)
+        if np.all(found):
+            return values[indices]
+        res = np.full(len(indices), np.nan)
+        res[found] = values[indices[found]]
+        return res
+
+    def table(self, binary_keys=(), star_1_keys=(), star_2_keys=(),
+              on='model_number'):
+        """Gather binary and star columns into one aligned table.
+
+        Parameters
+        ----------
+        binary_keys : list of string, optional
+                      Binary history columns to include
+        star_1_keys : list of string, optional
+                      History columns of star 1 to include, named
+                      'star_1_' + key in the result
+        star_2_keys : list of string, optional
+                      History columns of star 2 to include, named
+                      'star_2_' + key in the result
+        on          : string, optional
+                      How star rows are matched to binary rows. See
+                      `alignment`.
+
+        Returns
+        -------
+        dict
+            numpy arrays aligned with the binary history rows, always
+            including 'model_number'
+
+        Examples
+        --------
+        >>> b = MesaBinaryRun()
+        >>> t = b.table(['period_days', 'star_1_mass'], ['log_R'])
+        >>> plt.plot(t['star_1_mass'], t['period_days'])
+        """
+        res = {'model_number': self.binary_history.data('model_number')}
+        for key in binary_keys:
+            res[key] = self.data(key)
+        for number, keys in ((1, star_1_keys), (2, star_2_keys)):
+            for key in keys:
+                res['star_{}_{}'.format(number, key)] = self.data(
+                    key, star=number, on=on)
+        return res
+
+    def __getattr__(self, method_name):
+        if method_name.startswith('_'):
+            raise AttributeError(method_name)
+        if self.binary_history.in_data(method_name):
+            return self.binary_history.data(method_name)
+        elif self.binary_history.in_header(method_name):
+            return self.binary_history.header(method_name)
+        raise AttributeError(method_name)
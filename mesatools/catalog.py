@@ -0,0 +1,717 @@
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed)
+import json
+import os
+import re
+import sqlite3
+import time
+
+import numpy as np
+
+from .database import dtype_and_value
+from .fortran import namelist_assignments
+from .grid import find_runs, read_history_columns, summarize_run
+from .reader import MesaData, BadPathError, _fingerprint
+
+# Flags and file names of extra inlists, in both the older
+# (read_extra_controls_inlist1, extra_controls_inlist1_name) and newer
+# (read_extra_controls_inlist(1), extra_controls_inlist_name(1)) styles
+_extra_flag_matcher = re.compile(
+    r'\Aread_extra_(\w+?)_inlist(?:(\d+)|\((\d+)\))\Z')
+_extra_name_formats = ('extra_{}_inlist{}_name', 'extra_{}_inlist_name({})')
+
+# Columns of the runs table that are not run values
+_fixed_columns = ('run_id', 'path', 'files', 'scanned')
+
+
+def read_inlist(file_name, run_path=None, files=None, max_depth=10):
+    """Read the namelist assignments of an inlist, following extra inlists.
+
+    Any extra inlist switched on for a namelist (as with
+    `read_extra_controls_inlist1` and `extra_controls_inlist1_name`) has
+    that namelist read from it too, overriding earlier values, as MESA does.
+
+    Parameters
+    ----------
+    file_name : string
+                Path to the inlist
+    run_path  : string, optional
+                Directory that names of extra inlists are relative to,
+                default is the directory of `file_name`
+    files     : list, optional
+                If given, the path of every inlist read is appended to it
+    max_depth : int, optional
+                Deepest chain of extra inlists to follow, default is 10
+
+    Returns
+    -------
+    dict
+        Maps lower case namelist names to dicts of lower case item names
+        (with any indices, like 'x_ctrl(1)') to their values as written
+
+    Raises
+    ------
+    BadPathError
+        If the inlist or one of its extra inlists does not exist, or if the
+        extra inlists nest more than `max_depth` deep
+    """
+    if run_path is None:
+        run_path = os.path.dirname(file_name)
+    if max_depth < 0:
+        raise BadPathError('Extra inlists nest too deeply at ' + file_name +
+                           '.')
+    if not os.path.isfile(file_name):
+        raise BadPathError('Inlist ' + file_name + ' not found.')
+    if files is not None:
+        files.append(file_name)
+    with open(file_name, 'r') as f:
+        assignments = namelist_assignments(f.read())
+    res = {}
+    for namelist, pairs in assignments.items():
+        values = res.setdefault(namelist, {})
+        for name, value in pairs:
+            values[name.lower()] = value
+        for extra_file in _extra_inlists(namelist, values):
+            extra = read_inlist(os.path.join(run_path, extra_file), run_path,
+                                files, max_depth - 1)
+            values.update(extra.get(namelist, {}))
+    return res
+
+
+def _extra_inlists(namelist, values):
+    """Names of the extra inlists switched on in one namelist's values."""
+    extras = []
+    for name, value in values.items():
+        match = _extra_flag_matcher.match(name)
+        if (match is None or match.group(1) != namelist or
+                value.lower() != '.true.'):
+            continue
+        number = match.group(2) or match.group(3)
+        for name_format in _extra_name_formats:
+            extra_name = name_format.format(namelist, number)
+            if extra_name in values:
+                extras.append((int(number), _unquote(values[extra_name])))
+                break
+    return [extra_file for number, extra_file in sorted(extras)]
+
+
+def catalog_run(run_path, log_dir='LOGS', history_file='history.data',
+                inlist='inlist', columns=None, events=None):
+    """Gather everything the run catalog records about one run.
+
+    Module-level so that it can be sent to a process pool.
+
+    Parameters
+    ----------
+    run_path     : string
+                   Path to the run directory
+    log_dir      : string, optional
+                   Name of the logs directory in the run, default is 'LOGS'
+    history_file : string, optional
+                   Name of the history file, default is 'history.data'
+    inlist       : string, optional
+                   Name of the main inlist in the run, default is 'inlist'
+    columns      : list of string, optional
+                   History columns whose final values are recorded, default
+                   is all of them
+    events       : dict, optional
+                   Maps event names to expressions of history columns, as for
+                   `summarize_run`
+
+    Returns
+    -------
+    dict
+        'files' maps each file and directory the record depends on to its
+        mtime (in ns); 'inlist' maps namelists to their raw item values (see
+        `read_inlist`); 'header' and 'final' hold the history header and
+        final row values; 'events' holds the model number of each event
+    """
+    log_path = os.path.join(run_path, log_dir)
+    history_path = os.path.join(log_path, history_file)
+    files = [run_path, log_path, history_path]
+    inlist_path = os.path.join(run_path, inlist)
+    if os.path.exists(inlist_path):
+        values = read_inlist(inlist_path, run_path, files)
+    else:
+        values = {}
+    header, last = MesaData.read_summary(history_path)
+    if columns is not None:
+        last = {key: last[key] for key in columns if key in last}
+    if events:
+        event_values = summarize_run(run_path, log_dir, history_file, (),
+                                     events)[1]
+    else:
+        event_values = {}
+    return {'files': {path: os.stat(path).st_mtime_ns for path in files},
+            'inlist': values, 'header': header, 'final': last,
+            'events': event_values}
+
+
+class MesaRunCatalog:
+    """Indexed SQLite catalog of many MESA runs and their inlists.
+
+    Each run found below a root directory (see `find_runs`) becomes one row
+    of the `runs` table holding its inlist parameters, history header
+    values, and final history values. Columns named in `index_columns` when
+    scanning are indexed, so that queries on them over large grids are
+    fast. Inlist parameters are typed with the inlist database when one is
+    given, and otherwise guessed from how the value is written.
+
+    Keep the catalog in its own database file, not in mesa.db:
+    `make_database` rebuilds mesa.db in a temporary file and swaps it into
+    place, which would drop the catalog's rows and leave open catalogs
+    writing to the replaced file.
+
+    Columns are named after the lower case inlist parameter (array elements
+    like `x_ctrl(1)` become `x_ctrl_1`), 'header_' plus a history header
+    name, 'final_' plus a history column, or an event name plus
+    '_model_number'. Parameters left at their defaults are NULL. The
+    `run_columns` table records where each column came from.
+
+    Scans are incremental: a run is only read again if the mtime of its
+    directory, logs directory, history file, or any inlist it read has
+    changed, and runs that have disappeared are dropped.
+
+    Parameters
+    ----------
+    db_file   : string
+                Path to the SQLite database file, created if needed. Should
+                not be mesa.db.
+    inlist_db : InlistDbHandler, optional
+                Inlist database used to type parameters, such as
+                `InlistDbHandler(MesaDatabase())`. Default is to guess
+                types.
+
+    Attributes
+    ----------
+    db_file  : string
+               Path to the SQLite database file
+    failures : dict
+               Maps paths of runs that failed to load in the last scan to the
+               error message
+
+    Examples
+    --------
+    >>> cat = MesaRunCatalog('runs.db')
+    >>> cat.scan('grid', index_columns=['initial_mass', 'initial_z'])
+    >>> cat.paths('initial_mass > ? AND initial_z = ? AND '
+    ...           'final_center_he4 < ?', (3, 0.014, 1e-4))
+    """
+
+    def __init__(self, db_file, inlist_db=None):
+        self.db_file = db_file
+        self.failures = {}
+        self._conn = sqlite3.connect(db_file)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY '
+                'KEY, path TEXT UNIQUE NOT NULL, files TEXT, scanned REAL)')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS run_columns (name TEXT PRIMARY '
+                'KEY, source TEXT)')
+        self._inlist_db = inlist_db
+        self._dtypes = {}
+        self._columns = {row[1] for row in
+                         self._conn.execute('PRAGMA table_info(runs)')}
+
+    def scan(self, root='.', log_dir='LOGS', history_file='history.data',
+             inlist='inlist', columns=None, events=None, index_columns=(),
+             executor=None, max_workers=None):
+        """Bring the catalog up to date with the runs below `root`.
+
+        Parameters
+        ----------
+        root         : string, optional
+                       Top of the tree of runs, default is '.'
+        log_dir      : string, optional
+                       Name of the logs directory in each run, default is
+                       'LOGS'
+        history_file : string, optional
+                       Name of the history file, default is 'history.data'
+        inlist       : string, optional
+                       Name of the main inlist in each run, default is
+                       'inlist'
+        columns      : list of string, optional
+                       History columns whose final values are recorded,
+                       default is all of them
+        events       : dict, optional
+                       Maps event names to expressions of history columns,
+                       like {'he_depletion': 'center_he4 < 1e-4'}, whose
+                       first model numbers are recorded
+        index_columns : list of string, optional
+                       Columns of the runs table to index, in addition to
+                       those indexed by earlier scans
+        executor     : concurrent.futures.Executor, optional
+                       Executor in which runs are read, default is a new
+                       process pool with `max_workers` processes
+        max_workers  : int, optional
+                       Size of the default process pool
+
+        Returns
+        -------
+        updated : list of string
+                  Paths of runs added or read again
+        removed : list of string
+                  Paths of runs no longer found, which were dropped
+        """
+        root = os.path.abspath(root)
+        paths = find_runs(root, log_dir, history_file)
+        known = {path: (run_id, json.loads(files)) for run_id, path, files in
+                 self._conn.execute('SELECT run_id, path, files FROM runs')
+                 if path == root or path.startswith(root + os.sep)}
+        removed = sorted(set(known) - set(paths))
+        with ThreadPoolExecutor(max_workers=16) as stat_executor:
+            changed = list(stat_executor.map(
+                lambda path: path not in known or _changed(known[path][1]),
+                paths))
+        stale = [path for path, is_changed in zip(paths, changed) if
+                 is_changed]
+
+        self.failures = {}
+        records = {}
+        if stale:
+            own_executor = executor is None
+            if own_executor:
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+            try:
+                futures = {executor.submit(catalog_run, path, log_dir,
+                                           history_file, inlist, columns,
+                                           events): path for path in stale}
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        records[path] = future.result()
+                    except Exception as e:
+                        self.failures[path] = '{}: {}'.format(
+                            type(e).__name__, e)
+            finally:
+                if own_executor:
+                    executor.shutdown()
+
+        with self._conn:
+            self._conn.executemany('DELETE FROM runs WHERE path=?',
+                                   [(path,) for path in removed])
+            for path in stale:
+                if path not in records:
+                    continue
+                values = self._row_values(records[path])
+                names = list(_fixed_columns) + list(values)
+                row = [known[path][0] if path in known else None, path,
+                       json.dumps(records[path]['files']), time.time()]
+                row += list(values.values())
+                self._conn.execute('DELETE FROM runs WHERE path=?', (path,))
+                self._conn.execute('INSERT INTO runs ({}) VALUES ({})'.format(
+                    ', '.join(_quote(name) for name in names),
+                    ', '.join('?' * len(names))), row)
+            for column in index_columns:
+                if column in self._columns:
+                    self._conn.execute(
+                        'CREATE INDEX IF NOT EXISTS {} ON runs ({})'.format(
+                            _quote('runs_' + column), _quote(column)))
+        return sorted(records), removed
+
+    def select(self, where=None, params=(), columns=('path',)):
+        """Query the runs table.
+
+        Parameters
+        ----------
+        where   : string, optional
+                  SQL condition on the columns of the runs table, with a ?
+                  for each of `params`. Default is to select all runs.
+        params  : tuple, optional
+                  Values injected into `where`
+        columns : list of string, optional
+                  Columns to return, default is just 'path'
+
+        Returns
+        -------
+        list of tuple
+            One tuple of `columns` per matching run, in order of path
+        """
+        query = 'SELECT {} FROM runs'.format(', '.join(_quote(name) for name
+                                                       in columns))
+        if where:
+            query += ' WHERE ' + where
+        return self._conn.execute(query + ' ORDER BY path', params).fetchall()
+
+    def paths(self, where=None, params=()):
+        """Return paths of runs matching `where` (see `select`)."""
+        return [row[0] for row in self.select(where, params)]
+
+    def columns(self):
+        """Return a dict mapping run value columns to where they came from.
+
+        The source is the namelist for inlist parameters, or 'header',
+        'final', or 'event' for history values.
+        """
+        return dict(self._conn.execute('SELECT name, source FROM run_columns'))
+
+    def close(self):
+        """Close the connection to the database file."""
+        self._conn.close()
+
+    def _row_values(self, record):
+        """Turn one `catalog_run` record into typed column values."""
+        values = {}
+        sources = {}
+        self._find_dtypes(re.sub(r'\(.*\)', '', name) for items in
+                          record['inlist'].values() for name in items)
+        for namelist, items in record['inlist'].items():
+            for name, value in items.items():
+                column = _column_name(name)
+                values[column] = self._typed(name, value)
+                sources[column] = namelist
+        for prefix, source in (('header_', 'header'), ('final_', 'final')):
+            for name, value in record[source].items():
+                column = _column_name(prefix + name)
+                values[column] = _sql_value(value)
+                sources[column] = source
+        for name, value in record['events'].items():
+            values[_column_name(name)] = _sql_value(value)
+            sources[_column_name(name)] = 'event'
+        for column in values:
+            if column not in self._columns:
+                self._add_column(column, sources[column])
+        return values
+
+    def _add_column(self, column, source):
+        self._conn.execute('ALTER TABLE runs ADD COLUMN ' + _quote(column))
+        self._conn.execute('INSERT OR REPLACE INTO run_columns VALUES (?, ?)',
+                           (column, source))
+        self._columns.add(column)
+
+    def _typed(self, name, value_string):
+        """Convert an inlist value to the type the inlist database gives."""
+        try:
+            guess, value = dtype_and_value(value_string, verbose=False)
+        except ValueError:
+            return value_string
+        if guess == 'str':
+            return _unquote(value)
+        dtype = self._dtype(re.sub(r'\(.*\)', '', name))
+        if dtype == 'float' and guess == 'int':
+            return float(value)
+        if dtype == 'int' and guess == 'float' and value.is_integer():
+            return int(value)
+        if dtype == 'str':
+            return value_string
+        return value
+
+    def _dtype(self, name):
+        """Data type of an inlist item from the inlist database, or None."""
+        self._find_dtypes([name])
+        return self._dtypes.get(name)
+
+    def _find_dtypes(self, names):
+        """Look up the data types of the inlist items `names` not yet known."""
+        if self._inlist_db is None:
+            return
+        names = list({name for name in names if name not in self._dtypes})
+        items = self._inlist_db.find_namelist_items(names)
+        for name, item in zip(names, items):
+            self._dtypes[name] = None if item is None else item.dtype
+
+
+def read_history_table(run_path, log_dir='LOGS', history_file='history.data',
+                       columns=None):
+    """Read the history columns of one run for `MesaHistoryDatabase`.
+
+    Module-level so that it can be sent to a process pool.
+
+    Returns
+    -------
+    fingerprint : tuple
+                  (size, mtime in ns) of the history file when it was read
+    columns     : dict
+                  numpy arrays of 'model_number' and each column read, with
+                  backups and restarts removed
+    """
+    path = os.path.join(run_path, log_dir, history_file)
+    fingerprint = _fingerprint(path)
+    if columns is None:
+        history = MesaData(path)
+        data = {name: history.bulk_data[name] for name in history.bulk_names}
+    else:
+        data = read_history_columns(path, columns)
+        data['model_number'] = data['model_number'].astype(int)
+    return fingerprint, data
+
+
+class MesaHistoryDatabase:
+    """Full history time series of many runs in one SQLite database.
+
+    All rows of every history go into a single `history` table keyed by
+    `run_id` and `model_number`, so that SQL can work across runs (binning
+    on age, joining runs, and so on). The `history_runs` table maps each
+    `run_id` to its run directory. Histories are parsed in a process pool
+    and inserted in large batched transactions with journaling and syncing
+    relaxed, and indexes are (re)built after loading, so thousands of
+    histories load in minutes. Loading is incremental: only runs that are
+    new or whose history file has changed are (re)loaded.
+
+    Parameters
+    ----------
+    db_file : string
+              Path to the SQLite database file, created if needed. May be
+              shared with a `MesaRunCatalog`, whose runs can be joined on
+              `path`.
+
+    Attributes
+    ----------
+    db_file  : string
+               Path to the SQLite database file
+    failures : dict
+               Maps paths of runs that failed to load in the last call to
+               `load` to the error message
+
+    Examples
+    --------
+    >>> hdb = MesaHistoryDatabase('histories.db')
+    >>> hdb.load('grid', columns=['star_age', 'log_L', 'log_Teff'],
+    ...          index_columns=['star_age'])
+    >>> hdb.query('SELECT run_id, CAST(log10(star_age) * 10 AS INT) AS bin, '
+    ...           'AVG(log_L) FROM history GROUP BY run_id, bin')
+    """
+
+    # Settings used while loading, restored afterwards. A crash mid-load can
+    # corrupt the database, but it can always be rebuilt from the histories.
+    load_pragmas = ('PRAGMA journal_mode=MEMORY', 'PRAGMA synchronous=OFF',
+                    'PRAGMA temp_store=MEMORY', 'PRAGMA cache_size=-262144')
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.failures = {}
+        self._conn = sqlite3.connect(db_file)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS history_runs (run_id INTEGER '
+                'PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER, '
+                'mtime INTEGER, rows INTEGER)')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS history (run_id INTEGER, '
+                'model_number INTEGER)')
+        # SQLite column names are case insensitive
+        self._columns = {row[1].lower() for row in
+                         self._conn.execute('PRAGMA table_info(history)')}
+
+    def load(self, runs='.', columns=None, log_dir='LOGS',
+             history_file='history.data', index_columns=(), executor=None,
+             max_workers=None, batch_rows=500000):
+        """Load new and changed histories into the database.
+
+        Parameters
+        ----------
+        runs          : string or list of string, optional
+                        Either the top of a tree of runs (see `find_runs`),
+                        in which case stored runs below it that no longer
+                        exist are dropped, or a list of run directories.
+                        Default is '.'.
+        columns       : list of string, optional
+                        History columns to load, default is all of them.
+                        'model_number' is always loaded.
+        log_dir       : string, optional
+                        Name of the logs directory in each run, default is
+                        'LOGS'
+        history_file  : string, optional
+                        Name of the history file, default is 'history.data'
+        index_columns : list of string, optional
+                        Columns to index, in addition to the (run_id,
+                        model_number) index
+        executor      : concurrent.futures.Executor, optional
+                        Executor in which histories are parsed, default is a
+                        new process pool with `max_workers` processes
+        max_workers   : int, optional
+                        Size of the default process pool
+        batch_rows    : int, optional
+                        Number of rows inserted per transaction, default is
+                        500000
+
+        Returns
+        -------
+        loaded  : list of string
+                  Paths of runs (re)loaded
+        removed : list of string
+                  Paths of runs dropped from the database
+        """
+        if isinstance(runs, str):
+            root = os.path.abspath(runs)
+            paths = find_runs(root, log_dir, history_file)
+        else:
+            root = None
+            paths = [os.path.abspath(path) for path in runs]
+        known = {path: (run_id, (size, mtime)) for run_id, path, size, mtime
+                 in self._conn.execute(
+                     'SELECT run_id, path, size, mtime FROM history_runs')}
+        removed = [] if root is None else sorted(
+            path for path in known if path.startswith(root + os.sep) and
+            path not in paths)
+        stale = [path for path in paths if path not in known or
+                 _fingerprint(os.path.join(path, log_dir, history_file)) !=
+                 known[path][1]]
+
+        self.failures = {}
+        loaded = []
+        saved = self._set_pragmas(self.load_pragmas)
+        try:
+            with self._conn:
+                old_ids = [(known[path][0],) for path in removed + stale
+                           if path in known]
+                self._conn.executemany(
+                    'DELETE FROM history WHERE run_id=?', old_ids)
+                self._conn.executemany(
+                    'DELETE FROM history_runs WHERE run_id=?', old_ids)
+            # inserting into indexed tables is much slower, so unless only a
+            # small part of the table is being loaded, index afterwards
+            stored = self._conn.execute(
+                'SELECT COUNT(*) FROM history_runs').fetchone()[0]
+            if len(stale) >= stored / 4:
+                self._drop_indexes()
+            if stale:
+                own_executor = executor is None
+                if own_executor:
+                    executor = ProcessPoolExecutor(max_workers=max_workers)
+                try:
+                    futures = {executor.submit(read_history_table, path,
+                                               log_dir, history_file,
+                                               columns): path
+                               for path in stale}
+                    pending = 0
+                    self._conn.execute('BEGIN')
+                    for future in as_completed(futures):
+                        path = futures[future]
+                        try:
+                            fingerprint, data = future.result()
+                        except Exception as e:
+                            self.failures[path] = '{}: {}'.format(
+                                type(e).__name__, e)
+                            continue
+                        pending += self._insert(path, fingerprint, data)
+                        loaded.append(path)
+                        if pending >= batch_rows:
+                            self._conn.commit()
+                            self._conn.execute('BEGIN')
+                            pending = 0
+                    self._conn.commit()
+                finally:
+                    if self._conn.in_transaction:
+                        self._conn.commit()
+                    if own_executor:
+                        executor.shutdown()
+            self._create_indexes(index_columns)
+        finally:
+            # later writes through this connection are crash safe again
+            self._set_pragmas(saved)
+        return sorted(loaded), removed
+
+    def query(self, sql, params=()):
+        """Run an SQL query on the database and return all resulting rows."""
+        return self._conn.execute(sql, params).fetchall()
+
+    def run_id(self, run_path):
+        """Return the run_id of a run directory, or None if not loaded."""
+        row = self._conn.execute('SELECT run_id FROM history_runs WHERE '
+                                 'path=?', (os.path.abspath(run_path),)
+                                 ).fetchone()
+        return None if row is None else row[0]
+
+    def close(self):
+        """Close the connection to the database file."""
+        self._conn.close()
+
+    def _set_pragmas(self, pragmas):
+        """Run `pragmas` and return the pragmas that undo them."""
+        undo = []
+        for pragma in pragmas:
+            name = pragma.split()[1].split('=')[0]
+            value = self._conn.execute('PRAGMA ' + name).fetchone()[0]
+            undo.append('PRAGMA {}={}'.format(name, value))
+            self._conn.execute(pragma)
+        return undo[::-1]
+
+    def _insert(self, path, fingerprint, data):
+        """Insert one run's history, returning the number of rows."""
+        names = ['model_number'] + [name for name in data if name !=
+                                    'model_number']
+        for name in names:
+            column = _column_name(name)
+            if column not in self._columns:
+                # keep the case of the history column name
+                column = re.sub(r'\W+', '_', name).strip('_')
+                kind = ('INTEGER' if np.issubdtype(data[name].dtype,
+                                                   np.integer) else
+                        'REAL' if np.issubdtype(data[name].dtype,
+                                                np.number) else 'TEXT')
+                self._conn.execute('ALTER TABLE history ADD COLUMN {} '
+                                   '{}'.format(_quote(column), kind))
+                self._columns.add(column.lower())
+        rows = len(data['model_number'])
+        run_id = self._conn.execute(
+            'INSERT INTO history_runs (path, size, mtime, rows) VALUES '
+            '(?, ?, ?, ?)', (path, fingerprint[0], fingerprint[1], rows)
+        ).lastrowid
+        values = [data[name].tolist() for name in names]
+        self._conn.executemany(
+            'INSERT INTO history (run_id, {}) VALUES (?, {})'.format(
+                ', '.join(_quote(_column_name(name)) for name in names),
+                ', '.join('?' * len(names))),
+            zip([run_id] * rows, *values))
+        return rows
+
+    def _index_names(self):
+        return [row[0] for row in self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' AND "
+            "tbl_name='history' AND sql IS NOT NULL")]
+
+    def _drop_indexes(self):
+        with self._conn:
+            for name in self._index_names():
+                self._conn.execute('DROP INDEX ' + _quote(name))
+
+    def _create_indexes(self, index_columns):
+        with self._conn:
+            self._conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS '
+                               'history_run_model ON history (run_id, '
+                               'model_number)')
+            for name in index_columns:
+                column = _column_name(name)
+                if column in self._columns:
+                    self._conn.execute(
+                        'CREATE INDEX IF NOT EXISTS {} ON history ({})'.format(
+                            _quote('history_' + column), _quote(column)))
+
+
+def _changed(files):
+    """Determine if any of the recorded files has a different mtime."""
+    for path, mtime in files.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def _column_name(name):
+    """Column name for an item, like 'x_ctrl_1' for 'x_ctrl(1)'."""
+    return re.sub(r'\W+', '_', name.lower()).strip('_')
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _unquote(value):
+    """Strip the quotes from a fortran string literal."""
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"':
+        return value[1:-1]
+    return value
+
+
+def _sql_value(value):
+    """Convert numpy scalars and anything unusual to SQLite values."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
@@ -0,0 +1,265 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .reader import (MesaData, KeyError, HistoryError, _interpolate_at,
+                     _sorted_lookup)
+
+
+class MesaComparison:
+    """Column-by-column differences between a candidate and a reference run.
+
+    The two data sets are aligned on the points of the reference: by exact
+    match of model numbers if `on` is 'model_number', and otherwise by
+    interpolating every shared column of the candidate at once to the
+    reference values of the `on` column (like 'star_age' for histories or
+    'mass' for profiles). Reference points outside the candidate's range,
+    or model numbers the candidate lacks, are left out.
+
+    The difference at each point is relative to the larger magnitude of the
+    two values (or `atol`, if that is larger), so it is symmetric and stays
+    finite where both values pass through zero.
+
+    Parameters
+    ----------
+    candidate : MesaData or MesaLogDir
+                Data being tested. If a MesaLogDir is given, its history is
+                used.
+    reference : MesaData or MesaLogDir
+                Data being compared against
+    on        : string, optional
+                Column to align on, which must increase or decrease
+                monotonically in both data sets. Default is 'model_number'.
+    keys      : list of string, optional
+                Columns to compare, default is every numeric column the two
+                data sets share
+    rtol      : float, optional
+                Relative difference above which a column fails, default is
+                1e-6
+    atol      : float, optional
+                Smallest magnitude differences are taken relative to, default
+                is 0
+
+    Attributes
+    ----------
+    on             : string
+                     Column the data sets were aligned on
+    keys           : list of string
+                     Columns that were compared
+    coordinate     : numpy_array
+                     Reference values of `on` at each compared point
+    relative_diff  : numpy_array
+                     (points, `keys`) array of relative differences
+    max_diff       : dict
+                     Largest relative difference of each column
+    rms_diff       : dict
+                     Root mean square relative difference of each column
+    first_exceeded : dict
+                     Value of `on` at the first point where each column's
+                     relative difference exceeds `rtol`, or None if it never
+                     does
+
+    Examples
+    --------
+    >>> c = MesaComparison(MesaData('new/LOGS/history.data'),
+    ...                    MesaData('old/LOGS/history.data'), on='star_age')
+    >>> c.passed
+    False
+    >>> print(c.report())
+    """
+
+    def __init__(self, candidate, reference, on='model_number', keys=None,
+                 rtol=1e-6, atol=0.0):
+        candidate = getattr(candidate, 'history', candidate)
+        reference = getattr(reference, 'history', reference)
+        self.on = on
+        self.rtol = rtol
+        self.atol = atol
+        for data in (candidate, reference):
+            if not data.in_data(on):
+                raise KeyError("'" + str(on) + "' is not a valid data type " +
+                               "in " + data.file_name + ".")
+            steps = np.diff(data.data(on))
+            if not (np.all(steps > 0) or np.all(steps < 0)):
+                raise HistoryError("Can't align on '" + on + "' because it "
+                                   "is not monotonic in " + data.file_name +
+                                   ".")
+        if keys is None:
+            keys = [name for name in reference.bulk_names if name != on and
+                    candidate.in_data(name) and
+                    np.issubdtype(reference.bulk_data.dtype[name], np.number)
+                    and np.issubdtype(candidate.bulk_data.dtype[name],
+                                      np.number)]
+        self.keys = list(keys)
+
+        ref_coord = reference.data(on)
+        cand_coord = candidate.data(on)
+        ref_values = _stack(reference, self.keys)
+        cand_values = _stack(candidate, self.keys)
+        if on == 'model_number':
+            if cand_coord[0] > cand_coord[-1]:
+                cand_coord = cand_coord[::-1]
+                cand_values = cand_values[::-1]
+            found, indices = _sorted_lookup(cand_coord, ref_coord)
+            cand_values = cand_values[indices[found]]
+        else:
+            found = ((ref_coord >= min(cand_coord[0], cand_coord[-1])) &
+                     (ref_coord <= max(cand_coord[0], cand_coord[-1])))
+            cand_values = _interpolate_at(cand_coord, cand_values,
+                                          ref_coord[found])
+        self.coordinate = ref_coord[found]
+        ref_values = ref_values[found]
+
+        scale = np.maximum(np.maximum(np.abs(cand_values),
+                                      np.abs(ref_values)), atol)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.relative_diff = np.where(
+                scale > 0, np.abs(cand_values - ref_values) / scale, 0.0)
+        # points where either value is NaN are ignored
+        valid = ~np.isnan(self.relative_diff)
+        counts = valid.sum(axis=0)
+        diff = np.where(valid, self.relative_diff, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            max_diff = np.where(counts > 0, diff.max(axis=0, initial=0.0),
+                                np.nan)
+            rms_diff = np.sqrt((diff ** 2).sum(axis=0) / counts)
+        exceeded = diff > rtol
+        any_exceeded = exceeded.any(axis=0)
+        if len(diff) > 0:
+            first = np.argmax(exceeded, axis=0)
+        else:
+            first = np.zeros(len(self.keys), dtype=int)
+        self.max_diff = dict(zip(self.keys, max_diff.tolist()))
+        self.rms_diff = dict(zip(self.keys, rms_diff.tolist()))
+        self.first_exceeded = {
+            key: self.coordinate[first[i]].item() if any_exceeded[i] else None
+            for i, key in enumerate(self.keys)}
+
+    @property
+    def failed_keys(self):
+        """Columns whose relative difference exceeds `rtol` somewhere."""
+        return [key for key in self.keys if self.first_exceeded[key] is not
+                None]
+
+    @property
+    def passed(self):
+        """Whether every compared column is within `rtol` everywhere."""
+        return len(self.failed_keys) == 0
+
+    def report(self, failed_only=True):
+        """Make a table of the differences, one line per column.
+
+        Parameters
+        ----------
+        failed_only : bool, optional
+                      Whether to list only columns that exceed `rtol`,
+                      default is True
+
+        Returns
+        -------
+        str
+            Multiline report with the maximum and RMS relative difference of
+            each column and the value of `on` where it first exceeds `rtol`
+        """
+        keys = self.failed_keys if failed_only else self.keys
+        width = max([len(key) for key in keys] + [len('column')])
+        lines = ['{} points compared on {}, {} of {} columns exceed rtol = '
+                 '{:g}'.format(len(self.coordinate), self.on,
+                               len(self.failed_keys), len(self.keys),
+                               self.rtol),
+                 '{:{w}}  {:>10}  {:>10}  {:>14}'.format(
+                     'column', 'max', 'rms', 'first ' + self.on[:8], w=width)]
+        for key in keys:
+            first = self.first_exceeded[key]
+            lines.append('{:{w}}  {:10.3e}  {:10.3e}  {:>14}'.format(
+                key, self.max_diff[key], self.rms_diff[key],
+                '-' if first is None else '{:.6g}'.format(first), w=width))
+        return '\n'.join(lines)
+
+
+def compare_profiles(candidate, reference, model_numbers=None, on='mass',
+                     keys=None, rtol=1e-6, atol=0.0):
+    """Compare the profiles two runs share, model by model.
+
+    Parameters
+    ----------
+    candidate     : MesaLogDir
+                    Logs being tested
+    reference     : MesaLogDir
+                    Logs being compared against
+    model_numbers : list of int, optional
+                    Models whose profiles are compared, default is every
+                    model with a profile in both runs
+    on            : string, optional
+                    Profile column to align on, default is 'mass'
+    keys, rtol, atol
+                    As for MesaComparison
+
+    Returns
+    -------
+    dict
+        Maps model numbers to MesaComparison objects
+    """
+    if model_numbers is None:
+        model_numbers = np.intersect1d(candidate.model_numbers,
+                                       reference.model_numbers)
+    return {int(m_num): MesaComparison(
+                candidate.profile_data(model_number=m_num),
+                reference.profile_data(model_number=m_num), on, keys, rtol,
+                atol)
+            for m_num in model_numbers}
+
+
+def compare_files(candidate_file, reference_file, on='model_number',
+                  keys=None, rtol=1e-6, atol=0.0):
+    """Compare two history or profile files.
+
+    Module-level so that it can be sent to a process pool. Arguments are as
+    for MesaComparison, but with paths to the files in place of data.
+    """
+    return MesaComparison(MesaData(candidate_file), MesaData(reference_file),
+                          on, keys, rtol, atol)
+
+
+def compare_many(pairs, on='model_number', keys=None, rtol=1e-6, atol=0.0,
+                 executor=None, max_workers=None):
+    """Compare many (candidate, reference) pairs of files in parallel.
+
+    Parameters
+    ----------
+    pairs       : list of tuple of string
+                  (candidate file, reference file) pairs of history or
+                  profile files
+    on, keys, rtol, atol
+                  As for MesaComparison
+    executor    : concurrent.futures.Executor, optional
+                  Executor in which pairs are compared, default is a new
+                  process pool with `max_workers` processes
+    max_workers : int, optional
+                  Size of the default process pool
+
+    Returns
+    -------
+    list of MesaComparison
+        One comparison per pair, in the order of `pairs`
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        n = len(pairs)
+        return list(executor.map(compare_files,
+                                 [pair[0] for pair in pairs],
+                                 [pair[1] for pair in pairs], [on] * n,
+                                 [keys] * n, [rtol] * n, [atol] * n))
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def _stack(data, keys):
+    """(rows, keys) float array of the columns `keys` of MesaData `data`."""
+    if len(keys) == 0:
+        return np.zeros((len(data.bulk_data), 0))
+    return np.column_stack([np.asarray(data.data(key), dtype=float) for key in
+                            keys])
@@ -1,8 +1,16 @@
-from os.path import join, isfile, splitext
+from os.path import join, isfile
+import hashlib
+import json
+import mmap
 import os
 import re
-import shutil
 import sqlite3
+import struct
+import threading
+import time
+from urllib.request import pathname2url
+
+import numpy as np
 
 from .helpers import get_mesa_dir
 from .fortran import f_end, full_lines
@@ -35,6 +43,10 @@ dfts = {
     'float': 0.0
 }
 
+# Most names bound to one query, well below SQLite's limit on host
+# parameters (999 on older builds)
+max_query_names = 500
+
 
 class NamelistItem(object):
     """Container for MESA namelist item.
@@ -90,6 +102,9 @@ class NamelistItem(object):
     @classmethod
     def from_tuple(cls, tup):
         '''Make new InlistItem from tuple produced by `to_tuple`'''
+        if tup is None:
+            raise InvalidItemError('No namelist item data to read. The item '
+                                   'was probably not found in the database.')
         name = tup[0]
         dtype = tup[2]
         default = tup[3]
@@ -123,6 +138,50 @@ class NamelistItem(object):
                 self.dim, self.order, self.namelist, self.doc)
 
 
+class LogColumn(object):
+    """Container for a column of MESA history or profile files.
+
+    Parameters
+    ----------
+    name : str
+        name of the column as listed in its columns list
+    kind : str
+        'history' or 'profile'
+    enabled : bool
+        whether the column is written by default
+    argument : str or None
+        argument the column's entry takes, like 'h1' in 'total_mass h1'
+    section : str
+        section of the columns list the column is in
+    doc : str
+        comment describing the column
+    order : int
+        position of the column in its columns list
+
+    Attributes
+    ----------
+    name, kind, enabled, argument, section, doc, order
+        As above
+    lower_name : str
+        same as `name`, but all in lower case for consistency
+    """
+
+    def __init__(self, name, kind, enabled, argument, section, doc, order):
+        self.name = name
+        self.lower_name = name.lower()
+        self.kind = kind
+        self.enabled = bool(enabled)
+        self.argument = argument
+        self.section = section
+        self.doc = doc
+        self.order = order
+
+    def to_dict(self):
+        return {'name': self.name, 'kind': self.kind, 'enabled':
+                self.enabled, 'argument': self.argument, 'section':
+                self.section, 'doc': self.doc, 'order': self.order}
+
+
 class BadPathError(Exception):
     def __init__(self, msg):
         Exception.__init__(self, msg)
@@ -133,7 +192,86 @@ class InvalidDatabaseError(Exception):
         Exception.__init__(self, msg)
 
 
-def dtype_and_value(val_string):
+class InvalidItemError(Exception):
+    def __init__(self, msg, suggestions=()):
+        Exception.__init__(self, msg)
+        self.suggestions = list(suggestions)
+
+
+def trigrams(name):
+    '''Set of the three-character pieces of a name, case insensitive.
+
+    The name is padded with two spaces in front and one behind, so short
+    names have trigrams and matching starts of names count extra.
+    '''
+    padded = '  {} '.format(name.lower())
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex(object):
+    '''Index of names for fast typo-tolerant lookup.
+
+    Similarity of two names is the number of trigrams they share divided by
+    the number of distinct trigrams in either. A lookup only touches the
+    names that share a trigram with the query, counting shared trigrams of
+    all of them at once.
+
+    Parameters
+    ----------
+    names : list of str
+        names to be indexed
+
+    Attributes
+    ----------
+    names : list of str
+        indexed names, without duplicates
+    '''
+
+    def __init__(self, names):
+        self.names = list(dict.fromkeys(names))
+        postings = {}
+        sizes = []
+        for i, name in enumerate(self.names):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self._postings = {gram: np.array(indices, dtype=np.int32) for
+                          gram, indices in postings.items()}
+        self._sizes = np.array(sizes, dtype=float)
+
+    def similar(self, name, limit=5, min_similarity=0.3):
+        '''Find the indexed names most similar to `name`.
+
+        Parameters
+        ----------
+        name : str
+            name to be matched, possibly misspelled
+        limit : int, optional
+            greatest number of names to return, default is 5
+        min_similarity : float, optional
+            smallest similarity, between 0 and 1, of names to return, default
+            is 0.3
+
+        Returns
+        -------
+        list of tuple
+            (name, similarity) pairs, most similar first
+        '''
+        grams = trigrams(name)
+        hits = [self._postings[gram] for gram in grams if gram in
+                self._postings]
+        if len(hits) == 0:
+            return []
+        shared = np.bincount(np.concatenate(hits),
+                             minlength=len(self.names))
+        similarity = shared / (self._sizes + len(grams) - shared)
+        found = np.flatnonzero(similarity >= min_similarity)
+        found = found[np.argsort(-similarity[found], kind='stable')][:limit]
+        return [(self.names[i], similarity[i].item()) for i in found]
+
+
+def dtype_and_value(val_string, verbose=True):
     '''Determine data type and appropriate value of value in string form.
 
     Figures out if the value represented in a string is most likely a boolean,
@@ -145,6 +283,9 @@ def dtype_and_value(val_string):
     ----------
     val_string : str
         the string that is to be analyzed
+    verbose : bool, optional
+        whether to print a warning when the data type can't be guessed,
+        default is True
 
     Returns
     -------
@@ -154,7 +295,8 @@ def dtype_and_value(val_string):
     Notes
     -----
     If the data type cannot be guessed through the fairly loose criteria given
-    here, it will be preserved as a string and a warning will be printed.
+    here, it will be preserved as a string and, if `verbose`, a warning
+    will be printed.
     '''
     if val_string.lower() in ['.true.', '.false.']:
         dtype = 'bool'
@@ -173,63 +315,147 @@ def dtype_and_value(val_string):
         dtype = 'int'
         val = val_string
     else:
-        print("Couldn't determine dtype of " +
-              val_string + '. Keeping it as a string ' +
-              'literal.')
+        if verbose:
+            print("Couldn't determine dtype of " +
+                  val_string + '. Keeping it as a string ' +
+                  'literal.')
         dtype = 'str'
         val = val_string
     val = dtype_funcs[dtype](val)
     return dtype, val
 
 
+# Regular expressions used to read defaults files, compiled once
+doc_header_matcher = re.compile('\A\s*!\s*###\s*(.*?)(\(.*\))?\s*\Z')
+doc_blank_matcher = re.compile('\s*\Z')
+doc_text_matcher = re.compile('\s*!\s*[^#]\w+')
+code_matcher = re.compile('\s*\w+')
+comment_line_matcher = re.compile('\A\s*\!')
+blank_line_matcher = re.compile('\A\s+\Z')
+paren_matcher = re.compile('\(.*\)')
+
+# Lines of history_columns.list and profile_columns.list: section headers
+# like '!## mixing regions', and columns like 'model_number ! comment',
+# commented out columns like '!star_age', and columns that take an argument
+# like '!total_mass h1' or '!mixing_regions 40'
+column_section_matcher = re.compile('\A\s*!\s*(#+)\s*(.*?)\s*\Z')
+column_matcher = re.compile('\A\s*(!)?\s*([A-Za-z]\w*)(?:[ \t]+(\w+))?\s*'
+                            '(?:!(.*))?\Z')
+column_alias_matcher = re.compile('alias(?:es)?\s*:?\s*([A-Za-z]\w*(?:\s*,'
+                                  '\s*[A-Za-z]\w*)*)', re.IGNORECASE)
+
+
+def read_doc_texts(defaults_lines):
+    """Get the full doc text of every item documented in a defaults file.
+
+    Reads the file once. An item's doc text starts at its first `! ###`
+    header and runs to the next line of code, collecting any further
+    headers for the same item and all doc lines in between.
+
+    Parameters
+    ----------
+    defaults_lines : list of str
+        lines of a defaults file
+
+    Returns
+    -------
+    dict
+        maps item names, as written in their headers, to their doc text
+    """
+    docs = {}
+    # lines since the last line of code, as (header name, line) pairs with
+    # a header name of None for doc lines
+    block = []
+    for line in defaults_lines:
+        header = doc_header_matcher.match(line)
+        if header is not None:
+            block.append((header.group(1), line.strip() + "\n"))
+        elif code_matcher.match(line) is not None:
+            seen = set()
+            for i, (name, text) in enumerate(block):
+                if name is None or name in seen:
+                    continue
+                seen.add(name)
+                if name not in docs:
+                    docs[name] = ''.join(
+                        this_text for this_name, this_text in block[i:]
+                        if this_name is None or this_name == name).strip()
+            block = []
+        elif (doc_blank_matcher.match(line) is not None or
+              doc_text_matcher.match(line) is not None):
+            block.append((None, '  ' + line.strip() + '\n'))
+    return docs
+
+
+def missing_doc_text(name):
+    """Doc text used for items whose documentation can't be found."""
+    return "Could not get documentation for item {}.".format(name)
+
+
 def get_doc_text(defaults_lines, name):
     """Get full doc text for an inlist item."""
-    def is_doc(line):
-        blank_matcher = re.compile('\s*\Z')
-        text_matcher = re.compile('\s*!\s*[^#]\w+')
-        return ((blank_matcher.match(line) or text_matcher.match(line)) is not
-                None)
-
-    def is_code(line):
-        code_matcher = re.compile('\s*\w+')
-        return code_matcher.match(line) is not None
-
-    header_matcher = re.compile('\A\s*!\s*###\s*{}(\(.*\))?\s*\Z'.format(name))
-    res = ''
-    # print("Getting documentation for {}".format(name))
-    found_header = False
-    for i, line in enumerate(defaults_lines):
-        if header_matcher.match(line) is not None:
-            res += (line.strip() + "\n")
-            found_header = True
-        elif found_header:
-            if is_code(line):
-                # print("CODE LINE: {}".format(line))
-                # print("reached end!")
-                # print(res.strip())
-                return res.strip()
-            elif is_doc(line):
-                res += ('  ' + line.strip() + '\n')
-    # print("Never found the end.\n")
-    return "Could not get documentation for item {}.".format(name)
+    return read_doc_texts(defaults_lines).get(name, missing_doc_text(name))
 
 
-def generate_language_data(mesa_dir=None):
-    """Make list of InlistItems that characterizes all valid inlist commands.
+def read_defaults(defaults_lines):
+    """Read the assignments of a defaults file in one pass.
 
     Parameters
     ----------
-    mesa_dir : str, optional
-        path to mesa installation from which to generate language, default is
-        taken from environment variable MESA_DIR
+    defaults_lines : list of str
+        lines of a defaults file
+
+    Returns
+    -------
+    list of tuple
+        (name, dtype, default, dim, doc) of each assignment, in the order
+        they appear
     """
+    docs = read_doc_texts(defaults_lines)
+    res = []
+    for line in defaults_lines:
+        # only look at lines that AREN'T comments or blank lines
+        if (comment_line_matcher.match(line) or
+                blank_line_matcher.match(line)):
+            continue
+        # split definition line around equals sign
+        def_line = line.split('=')
+        # get name and see if it has any indices
+        assign_name = def_line[0]
+        if paren_matcher.match(assign_name):
+            num_indices = assign_name.count(',')
+        else:
+            num_indices = 0
+        assign_name = paren_matcher.sub('', assign_name).strip()
+        # get default value in string form
+        val_string = def_line[1].strip()
+        if '!' in val_string:
+            val_string = val_string[:val_string.index('!')].strip()
+        dtype, val = dtype_and_value(val_string)
+        res.append((assign_name, dtype, val, num_indices,
+                    docs.get(assign_name, missing_doc_text(assign_name))))
+    return res
 
-    # Confirm/find mesa directory
-    mesa_dir = get_mesa_dir(mesa_dir)
 
+def language_sources(mesa_dir):
+    """Find the files that define each namelist of a MESA installation.
+
+    Parameters
+    ----------
+    mesa_dir : str
+        path to mesa installation
+
+    Returns
+    -------
+    namelists : list of str
+        names of the namelists, in the order they are processed
+    define_files : dict
+        maps each namelist to a list of its definition files
+    default_files : dict
+        maps each namelist to its defaults file
+    """
     # Determine mesa version for use in determining file names
-    with open(join(mesa_dir, 'data', 'version_number'), 'r') as f:
-        version = int(f.readline())
+    version = int(read_version(mesa_dir))
 
     # Just do basic mesa star namelists now,
     # should be able to add support for binary, others easily, though
@@ -254,181 +480,827 @@ def generate_language_data(mesa_dir=None):
                                          'ctrls_io.{}'.format(f_end(version))))
     default_files = {namelist: join(mesa_dir, 'star', 'defaults', namelist +
                                     '.defaults') for namelist in namelists}
+    return namelists, define_files, default_files
+
+
+def parse_namelist(namelist, define_files, default_file):
+    """Read the definition and defaults files of one namelist.
 
+    Parameters
+    ----------
+    namelist : str
+        name of the namelist
+    define_files : list of str
+        paths to the files declaring the namelist's items
+    default_file : str
+        path to the namelist's defaults file
+
+    Returns
+    -------
+    dict
+        'declared' holds (name, dtype, default, dim) of every declared item
+        and 'defaults' holds the assignments of the defaults file (see
+        `read_defaults`), or None if it couldn't be opened. Only holds
+        built-in types, so it can be stored as JSON.
+    """
     # Useful regular expressions used elsewhere downscope
     dimension_match = re.compile('dimension\((.*)\)', re.IGNORECASE)
-    paren_matcher = re.compile('\(.*\)')
 
-    # Go through each namelist, pulling information with associated
-    # definition and default files and buliding a dict of arrays of inlist
-    # items.
-    namelist_data = []
-    for namelist in namelists:
-        print("Gathering inlist items for namelist {}...".format(namelist))
-        for define_file in define_files[namelist]:
-            try:
-                with open(define_file, 'r') as f:
-                    lines = f.readlines()
-            except IOError as e:
-                print("Couldn't open file {}.".format(define_file))
-                continue
-
-            # Get full lines with no comments (inline or otherwise) or blank
-            # lines
-            code_lines = full_lines(lines, include_blanks=False,
-                                    include_comments=False)
-            code_lines = [line[0:line.index('!')].strip() if '!' in line else
-                          line.strip() for line in code_lines]
-
-            assignment_lines = []
-            for i, line in enumerate(code_lines):
-                if re.match('\A\s*contains', line):
-                    break
-                if '::' not in line:
-                    continue
-                else:
-                    assignment_lines.append(line)
-
-            # Break each full line into pairs of declaration information (
-            # type, dimension, etc.) and names (one or more separated by
-            # commas), ascertaining the type, dimension, and default value of
-            # each variable.
-            pairs = [[s.strip() for s in line.split('::')] for line in
-                     assignment_lines]
-            for this_type, names in pairs:
-                if 'logical' in this_type:
-                    dtype = dtypes['logical']
-                elif 'character' in this_type:
-                    dtype = dtypes['character']
-                elif 'integer' in this_type:
-                    dtype = dtypes['integer']
-                elif 'real' in this_type:
-                    dtype = dtypes['real']
-                else:
-                    dtype = dtypes['character']
-                dft = dfts.get(dtype, '')
-                name_chars = list(names)
-
-                # Iterate through names and keep track of which have
-                # dimension greater than 1 (names ending with parentheticals
-                # with zero or more commas) and those that have dimension 0 (
-                # no parentheses at all. Compute dimension by either counting
-                # commas in parentheticals or in the DIMENSION keyword
-                new_names = []
-                paren_level = 0
-                for char in name_chars:
-                    if paren_level > 0 and char == ',':
-                        new_names.append('!')
-                        continue
-                    elif char == '(':
-                        paren_level += 1
-                    elif char == ')':
-                        paren_level -= 1
-                    new_names.append(char)
-                new_names = (''.join(new_names).split(','))
-                for name in new_names:
-                    if re.match('\(.*\)', name):
-                        num_indices = name.count('!') + 1
-                        name = re.sub('\(.*\)', '')
-                    elif dimension_match.match(this_type):
-                        dim_match = dimension_match.match(this_type)
-                        num_indices = dim_match.groups()[0].count(',') + 1
-                    else:
-                        num_indices = 0
-                    name = paren_matcher.sub('', name)
-                    # print("Adding inlist item {}".format(name.strip()))
-
-                    # Add new record for namelist item, which will later be
-                    # checked for more proper defaults, order,
-                    # and documentation.
-                    namelist_data.append(NamelistItem(name.strip(),
-                                                      dtype, dft, num_indices,
-                                                      -1, namelist, ''))
-        default_file = default_files[namelist]
-        # Read in lines from default files. If that fails, fail gracefully
-        # and try opening the next one.
+    print("Gathering inlist items for namelist {}...".format(namelist))
+    declared = []
+    for define_file in define_files:
         try:
-            with open(default_file, 'r') as f:
+            with open(define_file, 'r') as f:
                 lines = f.readlines()
         except IOError as e:
-            print("Couldn't open file {}.".format(default_file))
+            print("Couldn't open file {}.".format(define_file))
             continue
 
-        # Get all names for items in this namelist
-        names = [item.name for item in namelist_data]
-        lower_names = [name.lower() for name in names]
-
-        # Go through each line of the defaults file, looking for lines that
-        # define the default for a control. Then name, order, dtype and
-        # default from its position and value in the file.
-        order = 0
-        for i, line in enumerate(lines):
-            # only look at lines that AREN'T comments or blank lines
-            if re.match('\A\s*\!', lines[i]) or re.match('\A\s+\Z',
-                                                         lines[i]):
+        # Get full lines with no comments (inline or otherwise) or blank
+        # lines
+        code_lines = full_lines(lines, include_blanks=False,
+                                include_comments=False)
+        code_lines = [line[0:line.index('!')].strip() if '!' in line else
+                      line.strip() for line in code_lines]
+
+        assignment_lines = []
+        for i, line in enumerate(code_lines):
+            if re.match('\A\s*contains', line):
+                break
+            if '::' not in line:
                 continue
             else:
-                # split definition line around equals sign
-                # print("Processing line " + lines[k])
-                def_line = lines[i].split('=')
-                # get name and see if it has any indices
-                assign_name = def_line[0]
-                if paren_matcher.match(assign_name):
-                    num_indices = assign_name.count(',')
+                assignment_lines.append(line)
+
+        # Break each full line into pairs of declaration information (
+        # type, dimension, etc.) and names (one or more separated by
+        # commas), ascertaining the type, dimension, and default value of
+        # each variable.
+        pairs = [[s.strip() for s in line.split('::')] for line in
+                 assignment_lines]
+        for this_type, names in pairs:
+            if 'logical' in this_type:
+                dtype = dtypes['logical']
+            elif 'character' in this_type:
+                dtype = dtypes['character']
+            elif 'integer' in this_type:
+                dtype = dtypes['integer']
+            elif 'real' in this_type:
+                dtype = dtypes['real']
+            else:
+                dtype = dtypes['character']
+            dft = dfts.get(dtype, '')
+            name_chars = list(names)
+
+            # Iterate through names and keep track of which have
+            # dimension greater than 1 (names ending with parentheticals
+            # with zero or more commas) and those that have dimension 0 (
+            # no parentheses at all. Compute dimension by either counting
+            # commas in parentheticals or in the DIMENSION keyword
+            new_names = []
+            paren_level = 0
+            for char in name_chars:
+                if paren_level > 0 and char == ',':
+                    new_names.append('!')
+                    continue
+                elif char == '(':
+                    paren_level += 1
+                elif char == ')':
+                    paren_level -= 1
+                new_names.append(char)
+            new_names = (''.join(new_names).split(','))
+            for name in new_names:
+                if re.match('\(.*\)', name):
+                    num_indices = name.count('!') + 1
+                    name = re.sub('\(.*\)', '')
+                elif dimension_match.match(this_type):
+                    dim_match = dimension_match.match(this_type)
+                    num_indices = dim_match.groups()[0].count(',') + 1
                 else:
                     num_indices = 0
-                assign_name = paren_matcher.sub('', assign_name).strip()
-                # get default value in string form
-                val_string = def_line[1].strip()
-                if '!' in val_string:
-                    val_string = val_string[:val_string.index(
-                        '!')].strip()
-                dtype, val = dtype_and_value(val_string)
-                doc = get_doc_text(lines, assign_name)
-
-                # find inlist item and update metadata
-                try:
-                    j = lower_names.index(assign_name.lower())
-                    namelist_data[j].default = val
-                    namelist_data[j].order = order
-                    namelist_data[j].doc = doc
-                except ValueError as e:
-                    namelist_data.append(NamelistItem(assign_name,
-                                                      dtype, val, num_indices,
-                                                      order, namelist, doc))
-                order += 1
-        # namelist_dicts = [item.to_dict() for item in namelist_data]
+                name = paren_matcher.sub('', name)
+                # print("Adding inlist item {}".format(name.strip()))
+
+                # Add new record for namelist item, which will later be
+                # merged with its default, order, and documentation.
+                declared.append((name.strip(), dtype, dft, num_indices))
+
+    # Read in lines from default files. If that fails, fail gracefully
+    # and leave it out.
+    try:
+        with open(default_file, 'r') as f:
+            lines = f.readlines()
+    except IOError as e:
+        print("Couldn't open file {}.".format(default_file))
+        return {'declared': declared, 'defaults': None}
+    return {'declared': declared, 'defaults': read_defaults(lines)}
+
+
+def merge_namelists(namelists, parsed):
+    """Combine parsed namelists into the rows of the inlist database.
+
+    Parameters
+    ----------
+    namelists : list of str
+        names of the namelists, in the order they are processed
+    parsed : dict
+        maps each namelist to its output from `parse_namelist`
+
+    Returns
+    -------
+    list of tuple
+        rows of the inlist_items table (see `NamelistItem.to_tuple`)
+    """
+    namelist_data = []
+    namelist_tuples = []
+    for namelist in namelists:
+        for name, dtype, dft, num_indices in parsed[namelist]['declared']:
+            namelist_data.append(NamelistItem(name, dtype, dft, num_indices,
+                                              -1, namelist, ''))
+        if parsed[namelist]['defaults'] is None:
+            continue
+
+        # Map lower case names of all items so far to the first item with
+        # that name
+        items = {}
+        for item in namelist_data:
+            items.setdefault(item.lower_name, item)
+
+        # Go through each assignment in the defaults file, updating the
+        # default, order, and doc of known items and adding the rest.
+        for order, (assign_name, dtype, val, num_indices, doc) in enumerate(
+                parsed[namelist]['defaults']):
+            item = items.get(assign_name.lower())
+            if item is not None:
+                item.default = val
+                item.order = order
+                item.doc = doc
+            else:
+                namelist_data.append(NamelistItem(assign_name, dtype, val,
+                                                  num_indices, order,
+                                                  namelist, doc))
         namelist_tuples = [item.to_tuple() for item in namelist_data]
     return namelist_tuples
 
 
-def make_database(save_file=join(get_mesa_dir(), 'data', 'mesa.db')):
-    '''Make database of inlist commands.
+def generate_language_data(mesa_dir=None):
+    """Make list of InlistItems that characterizes all valid inlist commands.
+
+    Parameters
+    ----------
+    mesa_dir : str, optional
+        path to mesa installation from which to generate language, default is
+        taken from environment variable MESA_DIR
+    """
+
+    # Confirm/find mesa directory
+    mesa_dir = get_mesa_dir(mesa_dir)
+    namelists, define_files, default_files = language_sources(mesa_dir)
+    parsed = {namelist: parse_namelist(namelist, define_files[namelist],
+                                       default_files[namelist])
+              for namelist in namelists}
+    return merge_namelists(namelists, parsed)
+
+
+def read_column_list(lines):
+    """Read the columns listed in a history or profile columns list.
+
+    Parameters
+    ----------
+    lines : list of str
+        lines of a file like `$MESA_DIR/star/defaults/history_columns.list`
+
+    Returns
+    -------
+    list of list
+        [name, enabled, argument, section, doc, aliases] of each column in
+        order. `enabled` is whether the column is on by default (not
+        commented out), `argument` is the argument the entry takes, like
+        'h1' in '!total_mass h1', or None, `section` is the last '!#'
+        header before it, `doc` is its inline comment, and `aliases` are
+        other names for it, given in its comment like 'alias: log_cntr_T'.
+        Only the first entry of a name is kept, as MESA does.
+
+    Notes
+    -----
+    Comment lines of prose are told apart from commented out columns by
+    having more than a name and one argument before any second '!'.
+    """
+    res = []
+    seen = set()
+    section = ''
+    for line in lines:
+        line = line.strip()
+        section_match = column_section_matcher.match(line)
+        if section_match:
+            section = section_match.group(2)
+            continue
+        match = column_matcher.match(line)
+        if not match:
+            continue
+        commented, name, argument, doc = match.groups()
+        if name.lower() in seen or (name == 'include' and not commented):
+            continue
+        seen.add(name.lower())
+        doc = (doc or '').strip()
+        alias_match = column_alias_matcher.search(doc)
+        aliases = ([alias.strip() for alias in alias_match.group(1).split(',')]
+                   if alias_match else [])
+        res.append([name, commented is None, argument, section, doc, aliases])
+    return res
+
+
+def column_sources(mesa_dir):
+    """Find the history and profile column lists of a MESA installation.
+
+    Returns
+    -------
+    dict
+        maps 'history' and 'profile' to the paths of their columns lists
+    """
+    return {kind: join(mesa_dir, 'star', 'defaults',
+                       '{}_columns.list'.format(kind))
+            for kind in ('history', 'profile')}
+
+
+def parse_column_list(column_file):
+    """Read a columns list file (see `read_column_list`), or return None if
+    it couldn't be opened."""
+    try:
+        with open(column_file, 'r') as f:
+            lines = f.readlines()
+    except IOError:
+        print("Couldn't open file {}.".format(column_file))
+        return None
+    return read_column_list(lines)
+
+
+def generate_column_data(mesa_dir=None):
+    """Read the valid history and profile columns of a MESA installation.
+
+    Parameters
+    ----------
+    mesa_dir : str, optional
+        path to mesa installation, default is taken from environment
+        variable MESA_DIR
+
+    Returns
+    -------
+    dict
+        maps 'history' and 'profile' to their columns, as given by
+        `read_column_list`, or None if the list couldn't be read
+    """
+    mesa_dir = get_mesa_dir(mesa_dir)
+    return {kind: parse_column_list(column_file) for kind, column_file in
+            column_sources(mesa_dir).items()}
+
+
+def file_fingerprint(path, known=None):
+    """Get the (size, mtime, hash) fingerprint of a file.
+
+    Parameters
+    ----------
+    path : str
+        path to the file
+    known : tuple, optional
+        earlier fingerprint of the file. If the size and mtime still match,
+        its hash is reused rather than reading the file again.
+
+    Returns
+    -------
+    tuple or None
+        (size, mtime in ns, sha1 hex digest) of the file, or None if it does
+        not exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if known is not None and tuple(known[:2]) == (stat.st_size,
+                                                  stat.st_mtime_ns):
+        return tuple(known)
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return stat.st_size, stat.st_mtime_ns, digest
+
+
+# Schema of the language database. Items are stored once in language_items
+# no matter how many versions share them, and version_items lists the items
+# of each version in order. inlist_items shows the most recently built
+# version in the layout of the original single-version database.
+language_schema = [
+    'CREATE TABLE IF NOT EXISTS versions (version text PRIMARY KEY, '
+    'mesa_dir text, built integer)',
+    'CREATE TABLE IF NOT EXISTS language_items (item_id integer PRIMARY KEY, '
+    'digest text UNIQUE, name text, lower_name text, dtype text, dft text, '
+    'dim integer, namelist text, doc text)',
+    'CREATE TABLE IF NOT EXISTS version_items (version text, position '
+    'integer, item_id integer, lower_name text, namelist text, ord integer, '
+    'PRIMARY KEY (version, position)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS version_items_name ON version_items '
+    '(version, lower_name, namelist, item_id)',
+    'CREATE INDEX IF NOT EXISTS version_items_namelist ON version_items '
+    '(version, namelist, position)',
+    'CREATE INDEX IF NOT EXISTS version_items_item ON version_items '
+    '(item_id)',
+    'CREATE TABLE IF NOT EXISTS source_files (version text, namelist text, '
+    'path text, size integer, mtime integer, hash text, PRIMARY KEY '
+    '(version, namelist, path))',
+    'CREATE TABLE IF NOT EXISTS parsed_namelists (version text, namelist '
+    'text, data text, PRIMARY KEY (version, namelist))',
+    'CREATE TABLE IF NOT EXISTS log_columns (version text, kind text, name '
+    'text, lower_name text, enabled integer, argument text, section text, '
+    'doc text, position integer, PRIMARY KEY (version, kind, lower_name)) '
+    'WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS log_columns_position ON log_columns '
+    '(version, kind, position)',
+    'CREATE TABLE IF NOT EXISTS column_names (version text, kind text, '
+    'lookup text, lower_name text, PRIMARY KEY (version, kind, lookup)) '
+    'WITHOUT ROWID',
+    'CREATE VIEW IF NOT EXISTS versioned_items AS SELECT i.name, '
+    'v.lower_name, i.dtype, i.dft, i.dim, v.ord, v.namelist, i.doc, '
+    'v.version, v.position FROM version_items v JOIN language_items i ON '
+    'i.item_id = v.item_id',
+    'CREATE VIEW IF NOT EXISTS inlist_items AS SELECT name, lower_name, '
+    'dtype, dft, dim, ord, namelist, doc FROM versioned_items WHERE version = '
+    '(SELECT version FROM versions ORDER BY built DESC LIMIT 1) ORDER BY '
+    'position'
+]
+
+
+def read_version(mesa_dir):
+    """Read the version of a MESA installation as it is keyed in databases.
+
+    Parameters
+    ----------
+    mesa_dir : str
+        path to mesa installation
+
+    Returns
+    -------
+    str
+        contents of `$MESA_DIR/data/version_number`, like '10398'
+    """
+    with open(join(mesa_dir, 'data', 'version_number'), 'r') as f:
+        return version_key(f.readline())
+
+
+def version_key(version):
+    """Normalize a MESA version, like 10398 or 'r10398', to '10398'."""
+    version = str(version).strip()
+    if version.startswith('r'):
+        version = version[1:]
+    return version
+
+
+def _create_language_tables(conn):
+    """Create missing tables of the language database in `conn`.
+
+    Tables left by the older single-version layout are dropped first.
+    """
+    kinds = dict(conn.execute('SELECT name, type FROM sqlite_master'))
+    if kinds.get('inlist_items') == 'table':
+        conn.execute('DROP TABLE inlist_items')
+    for table in ('source_files', 'parsed_namelists'):
+        if table in kinds and 'version' not in [
+                row[1] for row in
+                conn.execute('PRAGMA table_info({})'.format(table))]:
+            conn.execute('DROP TABLE ' + table)
+    for statement in language_schema:
+        conn.execute(statement)
+
+
+def _index_docs(conn):
+    """Rebuild the full-text index of item names and docs in `conn`.
+
+    Does nothing if sqlite was compiled without FTS5, in which case
+    documentation searches fall back to LIKE.
+    """
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS language_docs USING "
+                     "fts5(name, doc, content='language_items', "
+                     "content_rowid='item_id')")
+    except sqlite3.OperationalError:
+        return
+    conn.execute("INSERT INTO language_docs(language_docs) VALUES "
+                 "('rebuild')")
+
+
+def make_database(save_file=None, mesa_dir=None, force=False):
+    '''Make or update the database of inlist commands.
+
+    One database can hold the languages of many MESA versions, keyed by the
+    contents of `$MESA_DIR/data/version_number`. Building from a MESA
+    installation adds or updates its version and makes it the default
+    version of the database (the one shown in the inlist_items table).
+    Items that are identical in several versions are only stored once.
+    The valid history and profile columns of each version, read from its
+    columns lists, are stored as well (see `ColumnDbHandler`).
+
+    The database records a fingerprint (size, mtime, and hash) of every
+    source file each version was built from, along with the parsed contents
+    of each namelist. An update only re-parses the namelists whose source
+    files changed (by content, not just mtime), and does nothing at all if
+    none did. The new database is built in a temporary file in one
+    transaction and then atomically moved into place, so readers never see
+    a half-built database. Any other tables in an existing file are kept.
+    Afterwards, a snapshot of the languages is written next to the database
+    (see `write_snapshot`) for InlistDbHandler to load quickly.
 
     Parameters
     ----------
     save_file : str, optional
         path to database file that should hold language information, default is
-        `$MESA_DIR/data/mesa.db`
+        `data/mesa.db` in `mesa_dir`
+    mesa_dir : str, optional
+        path to mesa installation from which to generate language, default is
+        taken from environment variable MESA_DIR
+    force : bool, optional
+        whether to re-parse every namelist, default is False
 
     Returns
     -------
-    None
+    list of str
+        namelists that were re-parsed, along with 'history_columns' and
+        'profile_columns' if the columns lists were
     '''
-    data = generate_language_data(mesa_dir=get_mesa_dir())
-    print(data)
+    mesa_dir = get_mesa_dir(mesa_dir)
+    if save_file is None:
+        save_file = join(mesa_dir, 'data', 'mesa.db')
+    version = read_version(mesa_dir)
+    namelists, define_files, default_files = language_sources(mesa_dir)
+    sources = {namelist: define_files[namelist] + [default_files[namelist]]
+               for namelist in namelists}
+    # column lists are cached and fingerprinted like namelists
+    column_files = column_sources(mesa_dir)
+    for kind, column_file in column_files.items():
+        sources[kind + '_columns'] = [column_file]
+
+    # Gather what the existing database was built from, if anything
+    known_files = {}
+    parsed = {}
+    current = None
+    if isfile(save_file) and not force:
+        conn = sqlite3.connect(save_file)
+        try:
+            tables = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table'")}
+            if {'versions', 'source_files', 'parsed_namelists'} <= tables:
+                for namelist, path, size, mtime, digest in conn.execute(
+                        'SELECT namelist, path, size, mtime, hash FROM '
+                        'source_files WHERE version=?', (version,)):
+                    known_files[(namelist, path)] = (
+                        None if size is None else (size, mtime, digest))
+                for namelist, data in conn.execute(
+                        'SELECT namelist, data FROM parsed_namelists WHERE '
+                        'version=?', (version,)):
+                    parsed[namelist] = json.loads(data)
+                row = conn.execute('SELECT version FROM versions ORDER BY '
+                                   'built DESC LIMIT 1').fetchone()
+                current = row[0] if row is not None else None
+        finally:
+            conn.close()
+
+    # A namelist is re-parsed if it has no cached parse or the contents of
+    # any of its source files changed. Files that were only touched keep
+    # their cached parse, but get their new mtime recorded.
+    fingerprints = {}
+    changed = []
+    for namelist in sources:
+        stale = namelist not in parsed
+        for path in sources[namelist]:
+            key = (namelist, path)
+            known = known_files.get(key)
+            fingerprints[key] = file_fingerprint(path, known)
+            old_hash = known[2] if known is not None else None
+            new_hash = (fingerprints[key][2] if fingerprints[key] is not None
+                        else None)
+            if key not in known_files or new_hash != old_hash:
+                stale = True
+        if stale:
+            changed.append(namelist)
+    if not changed and fingerprints == known_files:
+        if current != version:
+            # a single update is atomic, so no need for a temporary file
+            conn = sqlite3.connect(save_file)
+            with conn:
+                conn.execute('UPDATE versions SET built=(SELECT max(built) + '
+                             '1 FROM versions) WHERE version=?', (version,))
+            conn.close()
+            write_snapshot(save_file)
+        elif not _has_current_snapshot(save_file):
+            write_snapshot(save_file)
+        return []
+    for namelist in changed:
+        if namelist in define_files:
+            parsed[namelist] = parse_namelist(
+                namelist, define_files[namelist], default_files[namelist])
+        else:
+            parsed[namelist] = parse_column_list(sources[namelist][0])
+    data = merge_namelists(namelists, parsed)
+
+    # Rows of the column tables. Every column can be looked up by its own
+    # name and its aliases, but an alias never hides another column.
+    columns = []
+    column_names = []
+    aliases = []
+    for kind in column_files:
+        for position, (name, enabled, argument, section, doc,
+                       column_aliases) in enumerate(
+                parsed[kind + '_columns'] or []):
+            columns.append((version, kind, name, name.lower(), enabled,
+                            argument, section, doc, position))
+            column_names.append((version, kind, name.lower(), name.lower()))
+            aliases += [(version, kind, alias.lower(), name.lower()) for
+                        alias in column_aliases]
+
+    # Identify each item by its contents, other than its order, so that
+    # items shared by versions are stored once
+    items = []
+    for row in data:
+        content = row[:5] + row[6:]
+        items.append((hashlib.sha1(json.dumps(content).encode()).hexdigest(),)
+                     + content)
+
+    # Build the new database beside the old one, then swap it in
+    temp_file = '{}.{}.tmp'.format(save_file, os.getpid())
+    if isfile(save_file):
+        old_conn = sqlite3.connect(save_file)
+        temp_conn = sqlite3.connect(temp_file)
+        old_conn.backup(temp_conn)
+        old_conn.close()
+    else:
+        temp_conn = sqlite3.connect(temp_file)
+    try:
+        with temp_conn:
+            _create_language_tables(temp_conn)
+            for table in ('version_items', 'source_files',
+                          'parsed_namelists', 'log_columns', 'column_names'):
+                temp_conn.execute('DELETE FROM {} WHERE version=?'.format(
+                    table), (version,))
+            temp_conn.executemany(
+                'INSERT OR IGNORE INTO language_items (digest, name, '
+                'lower_name, dtype, dft, dim, namelist, doc) VALUES '
+                '(?,?,?,?,?,?,?,?)', items)
+            item_ids = dict(temp_conn.execute(
+                'SELECT digest, item_id FROM language_items'))
+            temp_conn.executemany(
+                'INSERT INTO version_items VALUES (?,?,?,?,?,?)',
+                [(version, position, item_ids[item[0]], row[1], row[6],
+                  row[5]) for position, (item, row) in
+                 enumerate(zip(items, data))])
+            temp_conn.execute('DELETE FROM language_items WHERE item_id NOT '
+                              'IN (SELECT item_id FROM version_items)')
+            _index_docs(temp_conn)
+            temp_conn.execute(
+                'INSERT OR REPLACE INTO versions VALUES (?, ?, (SELECT '
+                'coalesce(max(built), 0) + 1 FROM versions))',
+                (version, mesa_dir))
+            temp_conn.executemany(
+                'INSERT INTO source_files VALUES (?,?,?,?,?,?)',
+                [(version,) + key + (tuple(fingerprint) if fingerprint is not
+                                     None else (None, None, None))
+                 for key, fingerprint in fingerprints.items()])
+            temp_conn.executemany(
+                'INSERT INTO parsed_namelists VALUES (?,?,?)',
+                [(version, namelist, json.dumps(parsed[namelist])) for
+                 namelist in sources])
+            temp_conn.executemany(
+                'INSERT INTO log_columns VALUES (?,?,?,?,?,?,?,?,?)', columns)
+            temp_conn.executemany(
+                'INSERT OR IGNORE INTO column_names VALUES (?,?,?,?)',
+                column_names + aliases)
+            # statistics let lookups by name use the index over versions
+            temp_conn.execute('ANALYZE')
+        temp_conn.close()
+        os.replace(temp_file, save_file)
+    except BaseException:
+        temp_conn.close()
+        if isfile(temp_file):
+            os.remove(temp_file)
+        raise
+    write_snapshot(save_file)
+    return changed
+
+
+def _has_current_snapshot(db_file):
+    try:
+        snapshot = LanguageSnapshot(snapshot_path(db_file))
+    except (OSError, ValueError):
+        return False
+    try:
+        return snapshot.is_current(db_file)
+    finally:
+        snapshot.close()
+
+
+# Layout of a language snapshot:
+#
+#   magic (8 bytes) | table of contents length (uint64, little endian) |
+#   table of contents (JSON) | padding | sections of each version ...
+#
+# For each MESA version the table of contents records where three sections
+# start and end, relative to the end of the padding (a multiple of 8 bytes
+# into the file): the names and namelists of its items, one "name<TAB>
+# namelist" line per item in order; the byte offsets of each item's record
+# as uint64, little endian; and the records, each the JSON list of the
+# item's row of inlist_items. Records are only decoded when an item is
+# looked up. The table of contents also records the default version and the
+# device and inode of the database file the snapshot was made from, which
+# change whenever `make_database` replaces it.
+snapshot_magic = b'MESALNG1'
+
+
+def snapshot_path(db_file):
+    """Path of the language snapshot of a database, like `mesa.lang`."""
+    return os.path.splitext(db_file)[0] + '.lang'
+
+
+def write_snapshot(db_file, snapshot_file=None):
+    """Write a snapshot of all languages in a database for fast loading.
+
+    `make_database` calls this after each build, so there is rarely a need
+    to call it directly.
 
-    # Make SQlite3 table
-    conn = sqlite3.connect(save_file)
-    c = conn.cursor()
-    c.execute("CREATE TABLE inlist_items\n" + "(name text, lower_name text, "
-              "dtype text, dft text, dim integer, ord integer, namelist " +
-              "text, doc text)")
-    conn.commit()
+    Parameters
+    ----------
+    db_file : str
+        path to database made by `make_database`
+    snapshot_file : str, optional
+        path to the snapshot, default is given by `snapshot_path`. The file
+        is replaced atomically.
+    """
+    if snapshot_file is None:
+        snapshot_file = snapshot_path(db_file)
+    stat = os.stat(db_file)
+    conn = sqlite3.connect(db_file)
+    try:
+        versions = [row[0] for row in conn.execute(
+            'SELECT version FROM versions ORDER BY built')]
+        rows = {version: conn.execute(
+            'SELECT name, lower_name, dtype, dft, dim, ord, namelist, doc '
+            'FROM versioned_items WHERE version=? ORDER BY position',
+            (version,)).fetchall() for version in versions}
+    finally:
+        conn.close()
+
+    sections = []
+    toc = {'db_file_id': [stat.st_dev, stat.st_ino],
+           'default': versions[-1] if versions else None, 'versions': {}}
+    position = 0
+    for version in versions:
+        names = '\n'.join('{}\t{}'.format(row[0], row[6]) for row in
+                          rows[version]).encode()
+        records = [json.dumps(row).encode() for row in rows[version]]
+        offsets = np.zeros(len(records) + 1, dtype='<u8')
+        offsets[1:] = np.cumsum([len(record) for record in records])
+        entry = {'count': len(records)}
+        for name, section in (('names', names),
+                              ('offsets', offsets.tobytes()),
+                              ('records', b''.join(records))):
+            section += b'\0' * (-len(section) % 8)
+            entry[name] = [position, len(section)]
+            sections.append(section)
+            position += len(section)
+        toc['versions'][version] = entry
+    toc = json.dumps(toc).encode()
+    header = snapshot_magic + struct.pack('<Q', len(toc)) + toc
+    header += b'\0' * (-len(header) % 8)
+
+    temp_file = '{}.{}.tmp'.format(snapshot_file, os.getpid())
+    with open(temp_file, 'wb') as f:
+        f.write(header)
+        for section in sections:
+            f.write(section)
+    os.replace(temp_file, snapshot_file)
+
+
+class LanguageSnapshot(object):
+    """Memory-mapped language snapshot made by `write_snapshot`.
+
+    Parameters
+    ----------
+    snapshot_file : str
+        path to the snapshot
+
+    Attributes
+    ----------
+    default_version : str or None
+        default version of the database the snapshot was made from
+    versions : list of str
+        versions in the snapshot
+    """
 
-    # Add data
-    c.executemany('INSERT INTO inlist_items VALUES (?,?,?,?,?,?,?,?)', data)
-    conn.commit()
+    def __init__(self, snapshot_file):
+        with open(snapshot_file, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:8] != snapshot_magic:
+            raise ValueError('{} is not a language snapshot.'.format(
+                snapshot_file))
+        toc_length = struct.unpack('<Q', self._map[8:16])[0]
+        self._toc = json.loads(self._map[16:16 + toc_length].decode())
+        self._start = 16 + toc_length + (-(16 + toc_length) % 8)
+        self.default_version = self._toc['default']
+        self.versions = list(self._toc['versions'])
+
+    def is_current(self, db_file):
+        """Whether the snapshot was made from the database as it is now."""
+        try:
+            stat = os.stat(db_file)
+        except OSError:
+            return False
+        return self._toc['db_file_id'] == [stat.st_dev, stat.st_ino]
+
+    def language(self, version=None):
+        """Items of `version`, or of the default version, or None if the
+        snapshot doesn't have it.
+
+        Returns
+        -------
+        Language
+        """
+        if version is None:
+            version = self.default_version
+        entry = self._toc['versions'].get(version)
+        if entry is None:
+            return None
+        start, length = entry['names']
+        names = []
+        namelists = []
+        if entry['count'] > 0:
+            for line in self._map[self._start + start:self._start + start +
+                                  length].rstrip(b'\0').decode().split('\n'):
+                name, namelist = line.split('\t')
+                names.append(name)
+                namelists.append(namelist)
+        # a copy, so that the map can be closed
+        offsets = np.frombuffer(self._map, dtype='<u8', count=entry['count'] +
+                                1, offset=self._start + entry['offsets'][0]
+                                ).copy()
+        records = self._start + entry['records'][0]
+
+        def read_row(i):
+            return tuple(json.loads(self._map[
+                records + int(offsets[i]):records + int(offsets[i + 1])]))
+
+        return Language(names, namelists, read_row)
+
+    def close(self):
+        """Unmap the snapshot. Its languages can't read items afterwards."""
+        self._map.close()
+
+
+class Language(object):
+    """Items of one MESA version held in memory for fast lookups.
+
+    Each item is only made into a NamelistItem the first time it is used.
+
+    Parameters
+    ----------
+    names : list of str
+        names of the items, in order
+    namelists : list of str
+        namelist of each item
+    read_row : function
+        gives the row of inlist_items of the item at a position
+
+    Attributes
+    ----------
+    names : list of str
+        names of the items, in order
+    lower_names : list of str
+        lower case names of the items
+    namelists : list of str
+        namelists in the order they first appear
+    """
+
+    def __init__(self, names, namelists, read_row):
+        self.names = names
+        self.lower_names = [name.lower() for name in names]
+        self._read_row = read_row
+        self._items = {}
+        self._index = {}
+        self._namelist_positions = {}
+        for i, (name, namelist) in enumerate(zip(self.lower_names,
+                                                 namelists)):
+            self._index.setdefault(name, i)
+            self._namelist_positions.setdefault(namelist, []).append(i)
+        self.namelists = list(self._namelist_positions)
+
+    def item(self, i):
+        """The NamelistItem at position `i`."""
+        if i not in self._items:
+            self._items[i] = NamelistItem.from_tuple(self._read_row(i))
+        return self._items[i]
+
+    def find(self, lower_name):
+        """The first NamelistItem with a lower case name, or None."""
+        i = self._index.get(lower_name)
+        return None if i is None else self.item(i)
+
+    def namelist_positions(self, namelist):
+        """Positions of the items of a namelist, in order."""
+        return self._namelist_positions.get(namelist, [])
 
 
 def have_database():
@@ -438,33 +1310,74 @@ def have_database():
 class MesaDatabase(object):
     '''Interface for reading and searching a MESA database.
 
+    Safe to share between threads: each thread gets its own read-only
+    connection, opened the first time the thread queries the database and
+    kept for later queries. If the database file is replaced, as by
+    `make_database`, connections reopen on their first query at least
+    `check_interval` seconds after the last check. Use as a context
+    manager, or call `close`, to close every connection.
+
     Parameters
     ----------
     db_file : str, optional
         path to MESA database file. If none is provided, looks in
         $MESA_DIR/data/mesa.db
+    cached_statements : int, optional
+        number of prepared statements each connection keeps for reuse,
+        default is 128
+    timeout : float, optional
+        seconds to wait for a lock held by a writer before failing, default
+        is 30
+    check_interval : float, optional
+        seconds between checks of whether the database file has been
+        replaced, default is 1. Checking costs a `stat` call, so it isn't
+        done on every query.
 
     Attributes
     ----------
     db_file : str
         path to MESA database file
     cursor : sqlite.Cursor
-        database cursor for reading from database
+        this thread's database cursor for reading from database
     '''
 
-    def __init__(self, db_file=None):
+    def __init__(self, db_file=None, cached_statements=128, timeout=30.0,
+                 check_interval=1.0):
         if db_file is None:
             db_file = join(get_mesa_dir(), 'data', 'mesa.db')
         self._db_file = db_file
-        self._cursor = None
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self._local = threading.local()
+        # maps each open connection to the thread that uses it
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        '''Close the connections of all threads.
 
-    def create(self):
-        """Backs up old database if it is present and makes new database."""
-        if self._does_db_file_exist():
-            name, ext = splitext(self.db_file)
-            old_db_file = ''.join((name + '_old', ext))
-            shutil.move(self.db_file, old_db_file)
-        make_database(self.db_file)
+        Threads that query the database afterwards open new ones.
+        '''
+        with self._lock:
+            connections = list(self._connections)
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+
+    def create(self, force=False):
+        """Makes the database, or brings it up to date with MESA's sources.
+
+        See `make_database`. The file is replaced atomically, so there is no
+        need to move the old one aside.
+        """
+        return make_database(self.db_file, force=force)
 
     def search(self, table, query, terms):
         '''Generic search on the database cursor.
@@ -534,19 +1447,81 @@ class MesaDatabase(object):
         self.search(table, query, terms)
         return self.cursor.fetchall()
 
+    def query(self, query, terms=()):
+        """Run any SQL query on the database and return all of its results.
+
+        Parameters
+        ----------
+        query : str
+            SQL query with number of ?'s matching the length of `terms`
+        terms : tuple of str, optional
+            terms to be sanitized and injected in to `query`
+
+        Returns
+        -------
+        list of tuple
+            All rows of the query's result
+        """
+        self._ensure_connection()
+        self.cursor.execute(query, tuple(terms))
+        return self.cursor.fetchall()
+
     def _ensure_connection(self):
-        '''Connects to database if not already done.'''
-        if self.cursor is None:
-            self._connect()
+        '''Connects this thread to the database if not already done.
+
+        Also reconnects if the connection was closed or the database file
+        has been replaced since it was opened, checking for the latter at
+        most once every `self.check_interval` seconds.
+        '''
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            with self._lock:
+                is_open = conn in self._connections
+            if is_open:
+                now = time.monotonic()
+                if now - self._local.checked < self.check_interval:
+                    return
+                if self._local.file_id == self._file_id():
+                    self._local.checked = now
+                    return
+            if is_open:
+                with self._lock:
+                    self._connections.pop(conn, None)
+                conn.close()
+        self._connect()
 
     def _connect(self):
-        '''Establish connection to database and make cursor.'''
-        if self._does_db_file_exist():
-            conn = sqlite3.connect(self.db_file)
-            self.cursor = conn.cursor()
-        else:
+        '''Establish this thread's connection to database and make cursor.'''
+        file_id = self._file_id()
+        uri = 'file:{}?mode=ro'.format(pathname2url(os.path.abspath(
+            self.db_file)))
+        conn = sqlite3.connect(uri, uri=True, timeout=self.timeout,
+                               cached_statements=self.cached_statements,
+                               check_same_thread=False)
+        conn.execute('PRAGMA query_only = ON')
+        with self._lock:
+            # close the connections of threads that have since finished
+            finished = [old for old, thread in self._connections.items() if
+                        not thread.is_alive()]
+            for old in finished:
+                del self._connections[old]
+            self._connections[conn] = threading.current_thread()
+        for old in finished:
+            old.close()
+        self._local.conn = conn
+        self._local.file_id = file_id
+        self._local.checked = time.monotonic()
+        self.cursor = conn.cursor()
+
+    def _file_id(self):
+        '''Device and inode of the database file, which change when it is
+        replaced.'''
+        try:
+            stat = os.stat(self.db_file)
+        except OSError:
             raise InvalidDatabaseError('No such database found: {}'.format(
                 self.db_file))
+        return stat.st_dev, stat.st_ino
 
     def _does_db_file_exist(self):
         '''Determines if database file exists or not.'''
@@ -558,52 +1533,191 @@ class MesaDatabase(object):
 
     @property
     def cursor(self):
-        return self._cursor
+        return getattr(self._local, 'cursor', None)
 
     @cursor.setter
     def cursor(self, value):
-        self._cursor = value
+        self._local.cursor = value
 
 
 class InlistDbHandler(object):
     """Interface to get data from inlist commands section of a mesa database.
 
+    Items held in memory or taken from the snapshot are dropped when the
+    database file is replaced, as by `make_database`, which is checked as
+    often as `mesa_db` checks before reconnecting. Call `close` to unmap
+    the snapshot.
+
     Parameters
     ----------
     mesa_db : mesatools.MesaDatabase
         Database that contains table 'inlist_items'
+    version : int or str, optional
+        MESA version to look items up in, like 10398 or 'r10398'. Default is
+        None, which means the most recently built version of the database.
+        Every lookup can also be given its own version.
+    preload : bool, optional
+        whether to read all items of a version into memory the first time
+        it is used, and serve lookups by name or namelist from there rather
+        than querying the database each time. Default is False.
+    use_snapshot : bool, optional
+        whether to serve lookups by name or namelist from the language
+        snapshot next to the database (see `write_snapshot`) when it is
+        current and holds the version, without connecting to the database.
+        Default is True.
 
     Attributes
     ----------
     db : mesatools.MesaDatabase
-        the database object that is queried"""
-
-    def __init__(self, mesa_db):
+        the database object that is queried
+    version : str or None
+        default MESA version of lookups
+    preload : bool
+        whether lookups are served from memory
+    use_snapshot : bool
+        whether lookups are served from the language snapshot, if any"""
+
+    def __init__(self, mesa_db, version=None, preload=False,
+                 use_snapshot=True):
         self._db = mesa_db
         self._data = None
+        self._names = None
+        self.version = None if version is None else version_key(version)
+        self.preload = preload
+        self.use_snapshot = use_snapshot
+        self._snapshot = None
+        self._loaded = {}
+        self._name_indexes = {}
+        self._doc_index = None
+        # identity of the database file everything above was read from
+        self._file_id = None
+        self._checked = -np.inf
+
+    def close(self):
+        """Unmap the language snapshot, if one is in use.
+
+        Lookups afterwards use a fresh copy of the snapshot. The database
+        itself is left open.
+        """
+        if self._snapshot:
+            self._snapshot.close()
+        self._forget()
 
-    def find_namelist_item(self, name):
+    def find_namelist_item(self, name, version=None):
         """Search through inlist_items for namelist object and return one
 
         Parameters
         ----------
         name : str
             name of the namelist item to be searched for; case insensitive
+        version : int or str, optional
+            MESA version to look in, default is `self.version`
 
         Returns
         -------
         mesatools.database.NamelistItem
             Container for data about the desired NameList Item
 
-        Notes
-        -----
-        Unclear what this returns if namelist item is not found.
+        Raises
+        ------
+        InvalidItemError
+            If there is no item named `name`. The message, and the error's
+            `suggestions`, give the most similar names (see `suggest`).
         """
-        injection = (name.lower(),)
-        return NamelistItem.from_tuple(
-            self.db.search_for_one('inlist_items', 'lower_name=?', injection))
+        language = self._language(version)
+        if language is not None:
+            item = language.find(name.lower())
+        else:
+            row = self._search(self.db.search_for_one, 'lower_name=?',
+                               (name.lower(),), version)
+            item = None if row is None else NamelistItem.from_tuple(row)
+        if item is None:
+            suggestions = self.suggest(name, version=version)
+            msg = "No namelist item named '{}'".format(name)
+            if version is not None or self.version is not None:
+                msg += ' in MESA version {}'.format(
+                    version_key(version or self.version))
+            msg += '.'
+            if suggestions:
+                msg += ' Did you mean {}?'.format(', '.join(suggestions))
+            raise InvalidItemError(msg, suggestions)
+        return item
+
+    def suggest(self, name, limit=5, min_similarity=0.3, version=None):
+        """Find names of namelist items that are similar to `name`.
+
+        Meant for "did you mean" suggestions for misspelled items. The
+        first call for a version reads the names of its items and indexes
+        them by trigram (see `TrigramIndex`); later calls take a few
+        microseconds.
 
-    def search_namelist_name(self, name, namelist=None):
+        Parameters
+        ----------
+        name : str
+            name of a namelist item, possibly misspelled; case insensitive
+        limit : int, optional
+            greatest number of names to return, default is 5
+        min_similarity : float, optional
+            smallest trigram similarity, between 0 and 1, of names to
+            return, default is 0.3
+        version : int or str, optional
+            MESA version to look in, default is `self.version`
+
+        Returns
+        -------
+        list of str
+            names of the most similar items, most similar first
+        """
+        self._check_database()
+        key = self.version if version is None else version_key(version)
+        if key not in self._name_indexes:
+            language = self._language(key)
+            if language is not None:
+                names = language.names
+            else:
+                names = [row[0] for row in
+                         self._search(self.db.search_for_many, '1', (), key)]
+            self._name_indexes[key] = (TrigramIndex(
+                [name.lower() for name in names]), {
+                name.lower(): name for name in reversed(names)})
+        index, cased = self._name_indexes[key]
+        return [cased[match] for match, _ in
+                index.similar(name, limit, min_similarity)]
+
+    def find_namelist_items(self, names, version=None):
+        """Look up many namelist items at once.
+
+        Parameters
+        ----------
+        names : list of str
+            names of the namelist items to be searched for; case insensitive
+        version : int or str, optional
+            MESA version to look in, default is `self.version`
+
+        Returns
+        -------
+        list of mesatools.database.NamelistItem
+            the item of each name in `names`, in the same order, or None for
+            names that aren't found
+        """
+        lower_names = [name.lower() for name in names]
+        language = self._language(version)
+        if language is not None:
+            return [language.find(name) for name in lower_names]
+        unique = list(set(lower_names))
+        if len(unique) == 0:
+            return []
+        found = {}
+        for start in range(0, len(unique), max_query_names):
+            chunk = unique[start:start + max_query_names]
+            query = 'lower_name IN ({})'.format(', '.join('?' * len(chunk)))
+            for row in self._search(self.db.search_for_many, query, chunk,
+                                    version):
+                if row[1] not in found:
+                    found[row[1]] = NamelistItem.from_tuple(row)
+        return [found.get(name) for name in lower_names]
+
+    def search_namelist_name(self, name, namelist=None, version=None):
         """Searches for namelist items whose names contain a certain string.
 
         Parameters
@@ -613,6 +1727,8 @@ class InlistDbHandler(object):
         namelist : str, optional
             name of a namelist to restrict search to (ex. star_job, controls,
             or pgstar. Defaults to None, which means search all namelists
+        version : int or str, optional
+            MESA version to search, default is `self.version`
 
         Returns
         -------
@@ -620,19 +1736,36 @@ class InlistDbHandler(object):
             all namelist items that have `name` somewhere in their name and
             belong to `namelist`, if provided
         """
+        language = self._language(version)
+        if language is not None:
+            if namelist is None:
+                positions = range(len(language.names))
+            else:
+                positions = language.namelist_positions(namelist)
+            return [language.item(i) for i in positions if name.lower() in
+                    language.lower_names[i]]
         search_pattern = '%{}%'.format(name.lower())
         if namelist is None:
             injection = (search_pattern,)
             query = 'lower_name LIKE ?'
         else:
-            injection = (namelist, search_pattern)
+            injection = (search_pattern, namelist)
             query = 'lower_name LIKE ? AND namelist=?'
         return [NamelistItem.from_tuple(item) for item in
-                self.db.search_for_many('inlist_items', query, injection)]
+                self._search(self.db.search_for_many, query, injection,
+                             version)]
 
-    def search_doc(self, term, namelist=None):
+    def search_doc(self, term, namelist=None, version=None, snippets=False,
+                   limit=None):
         """Searches for namelist items by terms in their documentation.
 
+        Uses the full-text index of the database when there is one: every
+        word of `term` must appear, as a prefix of a word, in the name or
+        documentation of an item, and results are ranked best match first.
+        Otherwise, like for databases made before the index existed or by
+        an sqlite without FTS5, finds items whose documentation contains
+        `term` as is.
+
         Parameters
         ----------
         term : str
@@ -640,22 +1773,241 @@ class InlistDbHandler(object):
         namelist : str, optional
             name of a namelist to restrict search to (ex. star_job, controls,
             or pgstar. Defaults to None, which means search all namelists
+        version : int or str, optional
+            MESA version to search, default is `self.version`
+        snippets : bool, optional
+            whether to also return a snippet of each item's documentation
+            with the matching words in [brackets]. Default is False
+        limit : int, optional
+            greatest number of results, default is no limit
 
         Returns
         -------
         list of mesatools.database.NamelistItem
-            all namelist items that have `name` somewhere in their name and
-            belong to `namelist`, if provided
+            all namelist items that match `term` and belong to `namelist`,
+            if provided, or (item, snippet) pairs if `snippets` is True
         """
+        words = re.findall(r'\w+', term)
+        if self._has_doc_index() and words:
+            try:
+                rows = self._search_doc_index(term, words, namelist, version,
+                                              limit)
+            except sqlite3.OperationalError:
+                # the index exists, but this sqlite can't read it
+                self._doc_index = False
+            else:
+                return [(NamelistItem.from_tuple(row), row[8]) if snippets
+                        else NamelistItem.from_tuple(row) for row in rows]
         search_pattern = '%{}%'.format(term)
         if namelist is None:
             injection = (search_pattern,)
             query = 'doc LIKE ?'
         else:
-            injection = (namelist, search_pattern)
+            injection = (search_pattern, namelist)
             query = 'doc LIKE ? AND namelist=?'
-        return [NamelistItem.from_tuple(item) for item in
-                self.db.search_for_many('inlist_items', query, injection)]
+        items = [NamelistItem.from_tuple(item) for item in
+                 self._search(self.db.search_for_many, query, injection,
+                              version, limit)]
+        if snippets:
+            return [(item, item.doc) for item in items]
+        return items
+
+    def _has_doc_index(self):
+        """Whether the database has a full-text index of documentation."""
+        self._check_database()
+        if self._doc_index is None:
+            self._doc_index = len(self.db.query(
+                "SELECT name FROM sqlite_master WHERE name='language_docs'")
+            ) > 0
+        return self._doc_index
+
+    def _search_doc_index(self, term, words, namelist, version, limit):
+        """Ranked full-text search for items whose names or docs match all
+        of `words` as prefixes. Rows are as in inlist_items, plus a snippet.
+
+        An item named exactly `term` comes first, then the rest by bm25,
+        with words in names counting ten times as much as in docs.
+        """
+        if version is None:
+            version = self.version
+        match = ' '.join('"{}"*'.format(word) for word in words)
+        query = ("SELECT i.name, v.lower_name, i.dtype, i.dft, i.dim, v.ord, "
+                 "v.namelist, i.doc, snippet(language_docs, 1, '[', ']', "
+                 "'...', 12) FROM language_docs JOIN language_items i ON "
+                 "i.item_id = language_docs.rowid JOIN version_items v ON "
+                 "v.item_id = i.item_id WHERE language_docs MATCH ? AND "
+                 "v.version = ")
+        terms = [match]
+        if version is None:
+            query += ('(SELECT version FROM versions ORDER BY built DESC '
+                      'LIMIT 1)')
+        else:
+            query += '?'
+            terms.append(version_key(version))
+        if namelist is not None:
+            query += ' AND v.namelist = ?'
+            terms.append(namelist)
+        query += (' ORDER BY v.lower_name = ? DESC, bm25(language_docs, '
+                  '10.0, 1.0)')
+        terms.append(term.strip().lower())
+        if limit is not None:
+            query += ' LIMIT {:d}'.format(limit)
+        return self.db.query(query, terms)
+
+    def versions(self):
+        """List the MESA versions in the database, oldest build first."""
+        return [row[0] for row in self.db.query(
+            'SELECT version FROM versions ORDER BY built')]
+
+    def diff_versions(self, old_version, new_version, namelist=None):
+        """Find the namelist items that differ between two MESA versions.
+
+        Items are matched by namelist and case insensitive name. Changes to
+        documentation or order alone are not counted.
+
+        Parameters
+        ----------
+        old_version : int or str
+            MESA version to compare from, like 10398 or 'r10398'
+        new_version : int or str
+            MESA version to compare to
+        namelist : str, optional
+            name of a namelist to restrict the comparison to. Defaults to
+            None, which means all namelists
+
+        Returns
+        -------
+        dict
+            'added' and 'removed' map to lists of NamelistItems only in
+            `new_version` or `old_version`, and 'changed' maps to a list of
+            (old item, new item) pairs whose default, dtype, or dimension
+            changed
+        """
+        old_version = version_key(old_version)
+        new_version = version_key(new_version)
+        restrict = '' if namelist is None else ' AND a.namelist=?'
+        only_in = ('SELECT ?, i.*' + ', NULL' * 10 + ' FROM version_items a '
+                   'JOIN versioned_items i ON i.version=a.version AND '
+                   'i.position=a.position WHERE a.version=?' + restrict +
+                   ' AND NOT EXISTS (SELECT 1 FROM version_items b WHERE '
+                   'b.lower_name=a.lower_name AND b.namelist=a.namelist AND '
+                   'b.version=?)')
+        changed = ('SELECT ?, i.*, j.* FROM version_items a JOIN '
+                   'version_items b ON b.lower_name=a.lower_name AND '
+                   'b.namelist=a.namelist AND b.version=? AND b.item_id != '
+                   'a.item_id JOIN versioned_items i ON i.version=a.version '
+                   'AND i.position=a.position JOIN versioned_items j ON '
+                   'j.version=b.version AND j.position=b.position WHERE '
+                   'a.version=?' + restrict + ' AND (i.dft IS NOT j.dft OR '
+                   'i.dtype IS NOT j.dtype OR i.dim IS NOT j.dim)')
+        extra = [] if namelist is None else [namelist]
+        terms = (['added', new_version] + extra + [old_version] +
+                 ['removed', old_version] + extra + [new_version] +
+                 ['changed', new_version, old_version] + extra)
+        res = {'added': [], 'removed': [], 'changed': []}
+        for row in self.db.query(' UNION ALL '.join((only_in, only_in,
+                                                      changed)), terms):
+            item = NamelistItem.from_tuple(row[1:11])
+            if row[0] == 'changed':
+                res['changed'].append((item,
+                                       NamelistItem.from_tuple(row[11:])))
+            else:
+                res[row[0]].append(item)
+        return res
+
+    def _search(self, search, query, injection, version, limit=None):
+        """Run `search` on the items of `version` or the default version.
+
+        Items are found in the order of their namelists and defaults files.
+        """
+        if version is None:
+            version = self.version
+        limit = '' if limit is None else ' LIMIT {:d}'.format(limit)
+        if version is None:
+            return search('inlist_items', query + limit, injection)
+        return search('versioned_items',
+                      'version=? AND ' + query + ' ORDER BY position' + limit,
+                      (version_key(version),) + tuple(injection))
+
+    def _language(self, version):
+        """Items of `version` held in memory, or None to query the database.
+
+        Items come from the language snapshot next to the database if there
+        is a current one holding `version`, and otherwise, if `preload` is
+        set, are read from the database once.
+        """
+        self._check_database()
+        key = self.version if version is None else version_key(version)
+        if key not in self._loaded:
+            language = None
+            snapshot = self._get_snapshot()
+            if snapshot is not None:
+                language = snapshot.language(key)
+            if language is None and self.preload:
+                rows = self._search(self.db.search_for_many, '1', (), key)
+                language = Language([row[0] for row in rows],
+                                    [row[6] for row in rows],
+                                    rows.__getitem__)
+            self._loaded[key] = language
+        return self._loaded[key]
+
+    def _check_database(self):
+        """Forget what was read from the database if its file was replaced.
+
+        Checks at most once every `self.db.check_interval` seconds, like
+        MesaDatabase does before reconnecting.
+        """
+        now = time.monotonic()
+        if now - self._checked < self.db.check_interval:
+            return
+        self._checked = now
+        try:
+            stat = os.stat(self.db.db_file)
+        except OSError:
+            return
+        file_id = (stat.st_dev, stat.st_ino)
+        if self._file_id is not None and file_id != self._file_id:
+            # lookups in progress may still use the old snapshot, so it is
+            # left to be unmapped once the last of them lets go of it
+            self._forget()
+        self._file_id = file_id
+
+    def _forget(self):
+        """Drop everything read from the database or its snapshot."""
+        self._snapshot = None
+        self._loaded = {}
+        self._name_indexes = {}
+        self._doc_index = None
+        self._data = None
+        self._names = None
+
+    def _get_snapshot(self):
+        """The current language snapshot of the database, or None."""
+        if self._snapshot is None:
+            self._snapshot = False
+            snapshot_file = snapshot_path(self.db.db_file)
+            if self.use_snapshot and isfile(snapshot_file):
+                try:
+                    snapshot = LanguageSnapshot(snapshot_file)
+                except (OSError, ValueError):
+                    pass
+                else:
+                    if snapshot.is_current(self.db.db_file):
+                        self._snapshot = snapshot
+                    else:
+                        snapshot.close()
+        return self._snapshot or None
+
+    def _get_data(self):
+        """Gather dicts of all items of the default version by namelist."""
+        language = self._language(None)
+        if language is None:
+            rows = self._search(self.db.search_for_many, '1', (), None)
+            language = Language([row[0] for row in rows],
+                                [row[6] for row in rows], rows.__getitem__)
+        self._data = {namelist: [language.item(i).to_dict() for i in
+                                 language.namelist_positions(namelist)]
+                      for namelist in language.namelists}
 
     def doc(self, name):
         """Find documentation string for a namelist item
@@ -741,14 +2093,180 @@ class InlistDbHandler(object):
 
     @property
     def data(self):
+        self._check_database()
         if self._data is None:
             self._get_data()
         return self._data
 
     @property
     def names(self):
+        self._check_database()
         if self._names is None:
             self._names = {namelist: [item['lower_name'] for item in
                                       self.data[namelist]]
                            for namelist in self.data.keys()}
         return self._names
+
+
+class ColumnDbHandler(object):
+    """Interface to the history and profile columns in a mesa database.
+
+    Answers which columns are valid without opening any data files, so that
+    a list of requested columns can be checked, and mapped from aliases to
+    the names MESA writes, before reading only those columns.
+
+    Parameters
+    ----------
+    mesa_db : mesatools.MesaDatabase
+        Database made by `make_database`
+    version : int or str, optional
+        MESA version to look columns up in, like 10398 or 'r10398'. Default
+        is None, which means the most recently built version of the
+        database. Every lookup can also be given its own version.
+
+    Attributes
+    ----------
+    db : mesatools.MesaDatabase
+        the database object that is queried
+    version : str or None
+        default MESA version of lookups
+    """
+
+    def __init__(self, mesa_db, version=None):
+        self._db = mesa_db
+        self.version = None if version is None else version_key(version)
+        self._parameterized = {}
+        self._name_indexes = {}
+
+    def find_columns(self, names, kind='history', version=None):
+        """Look up many columns at once by name or alias.
+
+        A name that isn't listed itself but starts with the name of an entry
+        that takes an argument, like 'total_mass_h1' for 'total_mass h1',
+        is taken to be made by that entry.
+
+        Parameters
+        ----------
+        names : list of str
+            names or aliases of columns; case insensitive
+        kind : str, optional
+            'history' or 'profile', default is 'history'
+        version : int or str, optional
+            MESA version to look in, default is `self.version`
+
+        Returns
+        -------
+        list of LogColumn
+            column of each name in `names`, in the same order, or None for
+            names that aren't valid columns
+        """
+        lower_names = [name.lower() for name in names]
+        unique = list(set(lower_names))
+        if len(unique) == 0:
+            return []
+        version_sql, terms = self._version_sql(version)
+        found = {}
+        for start in range(0, len(unique), max_query_names):
+            chunk = unique[start:start + max_query_names]
+            rows = self.db.query(
+                'SELECT n.lookup, c.name, c.kind, c.enabled, c.argument, '
+                'c.section, c.doc, c.position FROM column_names n JOIN '
+                'log_columns c ON c.version = n.version AND c.kind = n.kind '
+                'AND c.lower_name = n.lower_name WHERE n.version = ' +
+                version_sql + ' AND n.kind = ? AND n.lookup IN ({})'.format(
+                    ', '.join('?' * len(chunk))), terms + [kind] + chunk)
+            found.update((row[0], LogColumn(*row[1:])) for row in rows)
+        res = []
+        for name in lower_names:
+            column = found.get(name)
+            if column is None:
+                for entry in self._parameterized_columns(kind, version):
+                    if name.startswith(entry.lower_name + '_'):
+                        column = entry
+                        break
+            res.append(column)
+        return res
+
+    def find_column(self, name, kind='history', version=None):
+        """Look up one column by name or alias (see `find_columns`).
+
+        Raises
+        ------
+        InvalidItemError
+            If `name` is not a valid column. The message, and the error's
+            `suggestions`, give the most similar names.
+        """
+        column = self.find_columns([name], kind, version)[0]
+        if column is None:
+            suggestions = self.suggest(name, kind, version=version)
+            msg = "No {} column named '{}'.".format(kind, name)
+            if suggestions:
+                msg += ' Did you mean {}?'.format(', '.join(suggestions))
+            raise InvalidItemError(msg, suggestions)
+        return column
+
+    def columns(self, kind='history', enabled_only=False, version=None):
+        """List the columns of a kind in the order of their columns list.
+
+        Parameters
+        ----------
+        kind : str, optional
+            'history' or 'profile', default is 'history'
+        enabled_only : bool, optional
+            whether to list only the columns written by default, default is
+            False
+        version : int or str, optional
+            MESA version to look in, default is `self.version`
+
+        Returns
+        -------
+        list of LogColumn
+        """
+        version_sql, terms = self._version_sql(version)
+        query = ('SELECT name, kind, enabled, argument, section, doc, '
+                 'position FROM log_columns WHERE version = ' + version_sql +
+                 ' AND kind = ?')
+        if enabled_only:
+            query += ' AND enabled'
+        return [LogColumn(*row) for row in self.db.query(
+            query + ' ORDER BY position', terms + [kind])]
+
+    def suggest(self, name, kind='history', limit=5, min_similarity=0.3,
+                version=None):
+        """Find names of columns, or their aliases, similar to `name`.
+
+        See `InlistDbHandler.suggest`.
+        """
+        key = (kind, self.version if version is None else
+               version_key(version))
+        if key not in self._name_indexes:
+            version_sql, terms = self._version_sql(version)
+            rows = self.db.query('SELECT lookup FROM column_names WHERE '
+                                 'version = ' + version_sql + ' AND kind = ?',
+                                 terms + [kind])
+            self._name_indexes[key] = TrigramIndex([row[0] for row in rows])
+        return [match for match, _ in self._name_indexes[key].similar(
+            name, limit, min_similarity)]
+
+    def _parameterized_columns(self, kind, version):
+        """Columns of a kind whose entries take an argument."""
+        key = (kind, self.version if version is None else
+               version_key(version))
+        if key not in self._parameterized:
+            self._parameterized[key] = [column for column in
+                                        self.columns(kind, version=version)
+                                        if column.argument is not None]
+        return self._parameterized[key]
+
+    def _version_sql(self, version):
+        """SQL for `version`, or the default version, and its terms."""
+        if version is None:
+            version = self.version
+        if version is None:
+            return ('(SELECT version FROM versions ORDER BY built DESC '
+                    'LIMIT 1)', [])
+        return '?', [version_key(version)]
+
+    @property
+    def db(self):
+        return self._db
@@ -0,0 +1,284 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .grid import read_history_columns
+from .reader import KeyError, _interpolate_at
+
+
+def _first(mask, start):
+    """Index of the first True in `mask` at or after `start`, or -1."""
+    hits = np.flatnonzero(mask[start:])
+    return start + hits[0] if len(hits) > 0 else -1
+
+
+def _pre_ms(cols, previous):
+    return 0
+
+
+def _zams(cols, previous):
+    h1 = cols['center_h1']
+    return _first(h1 < h1[0] - 0.0015, previous)
+
+
+def _iams(cols, previous):
+    return _first(cols['center_h1'] < 0.3, previous)
+
+
+def _tams(cols, previous):
+    return _first(cols['center_h1'] < 1e-4, previous)
+
+
+def _rgb_tip(cols, previous):
+    he4 = cols['center_he4']
+    ignition = _first(he4 < he4[previous] - 0.01, previous)
+    if ignition < 0:
+        return -1
+    return previous + np.argmax(cols['log_L'][previous:ignition + 1])
+
+
+def _zacheb(cols, previous):
+    he4 = cols['center_he4']
+    burning = _first(he4 < he4[previous] - 0.1, previous)
+    if burning < 0:
+        return -1
+    return previous + np.argmin(cols['log_L'][previous:burning + 1])
+
+
+def _tacheb(cols, previous):
+    return _first(cols['center_he4'] < 1e-4, previous)
+
+
+# Primary EEPs in evolutionary order, each with the history columns its
+# detector needs and the detector itself. A detector gets the columns and
+# the row of the previous primary EEP, and returns the row of its own EEP
+# (at or after the previous one) or -1 if the track never reaches it.
+primary_eeps = {
+    'PreMS': ((), _pre_ms),
+    'ZAMS': (('center_h1',), _zams),
+    'IAMS': (('center_h1',), _iams),
+    'TAMS': (('center_h1',), _tams),
+    'RGBTip': (('center_he4', 'log_L'), _rgb_tip),
+    'ZACHeB': (('center_he4', 'log_L'), _zacheb),
+    'TACHeB': (('center_he4',), _tacheb)
+}
+
+# Default history columns, and their weights, of the distance metric used
+# to place secondary EEPs along a track
+default_metric = {'log_Teff': 1.0, 'log_L': 1.0}
+
+
+def find_primary_eeps(cols, phases=None):
+    """Locate the primary EEPs of a track.
+
+    Parameters
+    ----------
+    cols   : dict or MesaData
+             History columns of the track, including those needed by the
+             detectors of `phases` (see `primary_eeps`)
+    phases : list of string, optional
+             Names of primary EEPs to find, in evolutionary order, default
+             is all of `primary_eeps`
+
+    Returns
+    -------
+    numpy_array
+        Row of each primary EEP in `phases`. Once one is not reached (-1),
+        neither are any that follow.
+    """
+    cols = _as_columns(cols, _required_keys(phases, {}))
+    if phases is None:
+        phases = list(primary_eeps)
+    res = np.full(len(phases), -1, dtype=int)
+    previous = 0
+    for i, phase in enumerate(phases):
+        row = primary_eeps[phase][1](cols, previous)
+        if row < 0:
+            break
+        res[i] = previous = row
+    return res
+
+
+def distance(cols, metric=None):
+    """Cumulative distance along a track in the space of `metric` columns.
+
+    Parameters
+    ----------
+    cols   : dict or MesaData
+             History columns of the track
+    metric : dict, optional
+             Maps history columns to their weights, default is
+             `default_metric`
+
+    Returns
+    -------
+    numpy_array
+        Distance from the first row to each row of the track
+    """
+    if metric is None:
+        metric = default_metric
+    cols = _as_columns(cols, list(metric))
+    steps = sum(weight * np.diff(cols[key]) ** 2 for key, weight in
+                metric.items())
+    return np.concatenate(([0.0], np.cumsum(np.sqrt(steps))))
+
+
+def resample(cols, keys, points=100, phases=None, metric=None):
+    """Resample a track onto equivalent evolutionary phases (EEPs).
+
+    The primary EEPs are located with `find_primary_eeps`, and each segment
+    between consecutive primary EEPs is divided into `points` secondary
+    EEPs evenly spaced in `distance`. All `keys` are then interpolated at
+    every EEP at once.
+
+    Parameters
+    ----------
+    cols   : dict or MesaData
+             History columns of the track, including `keys` and those needed
+             to find EEPs and distances
+    keys   : list of string
+             History columns to be resampled
+    points : int or list of int, optional
+             Number of EEPs in each segment between primary EEPs, either one
+             number for all segments or one per segment. Default is 100.
+    phases : list of string, optional
+             Names of primary EEPs, in order, default is all of
+             `primary_eeps`
+    metric : dict, optional
+             Columns and weights of the distance metric, default is
+             `default_metric`
+
+    Returns
+    -------
+    numpy_array
+        (EEPs, `keys`) array. There are sum(`points`) + 1 EEPs, the last
+        being the final primary EEP. EEPs past the last primary EEP the
+        track reaches are NaN.
+    """
+    if phases is None:
+        phases = list(primary_eeps)
+    if metric is None:
+        metric = default_metric
+    keys = list(keys)
+    points = _segment_points(points, phases)
+    cols = _as_columns(cols, _required_keys(phases, metric) + keys)
+
+    rows = find_primary_eeps(cols, phases)
+    dist = distance(cols, metric)
+    # break ties so that the distance strictly increases for interpolation
+    dist = dist + np.arange(len(dist)) * 1e-12 * max(dist[-1], 1.0)
+    locations = []
+    for i, n in enumerate(points):
+        if rows[i + 1] < 0:
+            break
+        locations.append(np.linspace(dist[rows[i]], dist[rows[i + 1]], n,
+                                     endpoint=False))
+    res = np.full((sum(points) + 1, len(keys)), np.nan)
+    if len(locations) == len(points):
+        locations.append([dist[rows[-1]]])
+    if len(locations) > 0:
+        locations = np.concatenate(locations)
+        columns = np.column_stack([np.asarray(cols[key], dtype=float) for key
+                                   in keys])
+        res[:len(locations)] = _interpolate_at(dist, columns, locations)
+    return res
+
+
+def resample_tracks(sources, keys, points=100, phases=None, metric=None,
+                    executor=None, max_workers=None):
+    """Resample many tracks onto the same EEPs, ready for interpolation.
+
+    Parameters
+    ----------
+    sources     : list of string or MesaData
+                  History files (resampled in a process pool, reading only
+                  the needed columns) or MesaData objects (resampled in this
+                  process)
+    keys        : list of string
+                  History columns to be resampled
+    points      : int or list of int, optional
+                  Number of EEPs per segment; see `resample`
+    phases      : list of string, optional
+                  Names of primary EEPs; see `resample`
+    metric      : dict, optional
+                  Columns and weights of the distance metric; see `resample`
+    executor    : concurrent.futures.Executor, optional
+                  Executor for resampling history files, default is a new
+                  process pool with `max_workers` processes
+    max_workers : int, optional
+                  Size of the default process pool
+
+    Returns
+    -------
+    numpy_array
+        (tracks, EEPs, `keys`) array, NaN past the end of each track
+    """
+    if phases is None:
+        phases = list(primary_eeps)
+    if metric is None:
+        metric = default_metric
+    keys = list(keys)
+    n_eeps = sum(_segment_points(points, phases)) + 1
+    res = np.full((len(sources), n_eeps, len(keys)), np.nan)
+    # indices of sources that are history files, resampled in the executor
+    files = []
+    for i, source in enumerate(sources):
+        if isinstance(source, str):
+            files.append(i)
+        else:
+            res[i] = resample(source, keys, points, phases, metric)
+    if len(files) == 0:
+        return res
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        n = len(files)
+        tracks = executor.map(_resample_file, [sources[i] for i in files],
+                              [keys] * n, [points] * n, [phases] * n,
+                              [metric] * n)
+        for i, track in zip(files, tracks):
+            res[i] = track
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return res
+
+
+def _resample_file(file_name, keys, points, phases, metric):
+    """Resample one history file. Module-level for use in process pools."""
+    needed = list(dict.fromkeys(_required_keys(phases, metric) + keys))
+    return resample(read_history_columns(file_name, needed), keys, points,
+                    phases, metric)
+
+
+def _segment_points(points, phases):
+    """Expand `points` to one number of EEPs per segment."""
+    if np.ndim(points) == 0:
+        return [int(points)] * (len(phases) - 1)
+    if len(points) != len(phases) - 1:
+        raise ValueError("Need one number of points for each of the " +
+                         str(len(phases) - 1) + " segments between " +
+                         "primary EEPs.")
+    return [int(n) for n in points]
+
+
+def _required_keys(phases, metric):
+    """History columns needed to find `phases` and measure `metric`."""
+    if phases is None:
+        phases = list(primary_eeps)
+    keys = []
+    for phase in phases:
+        keys.extend(primary_eeps[phase][0])
+    keys.extend(metric)
+    return list(dict.fromkeys(keys))
+
+
+def _as_columns(cols, keys):
+    """Get `keys` from a dict of columns or a MesaData as a dict."""
+    if isinstance(cols, dict):
+        for key in keys:
+            if key not in cols:
+                raise KeyError("'" + str(key) + "' is not a valid data type.")
+        return cols
+    return {key: cols.data(key) for key in keys}
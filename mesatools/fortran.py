@@ -1,5 +1,8 @@
 import re
 
+# Matches the start of a namelist assignment, like ' x_ctrl(1) ='
+assignment_matcher = re.compile('\s*[A-Za-z]\w*\s*(\([^)]*\))?\s*=')
+
 
 def f_end(version):
     """Gives fortran file ending used in MESA depending on the version used
@@ -148,3 +151,90 @@ def full_lines(lines, include_blanks=True, include_comments=True):
         res = filter(lambda line: not is_comment(line), res)
 
     return res
+
+
+def strip_comment(line):
+    """Removes an inline fortran comment, ignoring '!' inside strings."""
+    quote = None
+    for i, char in enumerate(line):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char == '!':
+            return line[:i]
+    return line
+
+
+def split_assignments(line):
+    """Splits a line of namelist assignments into single assignments.
+
+    Splits only at commas (outside of strings) that are followed by a new
+    name and equals sign, so lists of values stay in one piece.
+    """
+    res = []
+    start = 0
+    quote = None
+    for i, char in enumerate(line):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char == ',' and assignment_matcher.match(line, i + 1):
+            res.append(line[start:i])
+            start = i + 1
+    res.append(line[start:])
+    return [part.strip() for part in res if '=' in part]
+
+
+def namelist_assignments(lines):
+    """Gathers the assignments made in each namelist of an inlist
+
+    Parameters
+    ----------
+    lines : str or list of str
+        contents of an inlist, as for `full_lines`
+
+    Returns
+    -------
+    dict
+        maps lower case namelist names to lists of (name, value) pairs of
+        strings in the order they are assigned. Names keep any indices, like
+        'x_ctrl(1)', and values are left exactly as written (minus comments
+        and any trailing comma), like "'inlist_project'" or '1.5d0'.
+
+    Notes
+    -----
+    Several assignments on one line must be separated by commas, and a
+    value that is a list of several comma-separated values is kept as one
+    string.
+    """
+    res = {}
+    namelist = None
+    for line in full_lines(lines, include_blanks=False,
+                           include_comments=False):
+        line = strip_comment(line).strip()
+        if namelist is None:
+            if line.startswith('&'):
+                namelist = line[1:].split()[0].lower() if len(line) > 1 else ''
+                res.setdefault(namelist, [])
+            continue
+        if line.startswith('/') or line.startswith('&end'):
+            namelist = None
+            continue
+        # a closing slash may end the last line, but not inside a string
+        ends = (line.endswith('/') and line.count("'") % 2 == 0 and
+                line.count('"') % 2 == 0)
+        if ends:
+            line = line[:-1].strip()
+        for assignment in split_assignments(line):
+            name, value = assignment.split('=', 1)
+            value = value.strip()
+            if value.endswith(','):
+                value = value[:-1].strip()
+            res[namelist].append((name.strip().replace(' ', ''), value))
+        if ends:
+            namelist = None
+    return res
@@ -0,0 +1,502 @@
+import os
+import pickle
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, as_completed, wait)
+
+import numpy as np
+
+from .reader import MesaData, MesaLogDir, _ColumnExpression, _backup_mask
+
+
+def find_runs(root='.', log_dir='LOGS', history_file='history.data',
+              max_workers=16):
+    """Find all run directories below `root`.
+
+    A run directory is one holding a logs directory named `log_dir` that
+    contains `history_file`. The tree is walked one level at a time with
+    every directory of a level listed in parallel, which hides most of the
+    latency of network file systems. Logs directories, hidden directories,
+    and anything inside a run directory are not searched.
+
+    Parameters
+    ----------
+    root         : string, optional
+                   Top of the tree to search, default is '.'
+    log_dir      : string, optional
+                   Name of the logs directory in each run, default is 'LOGS'
+    history_file : string, optional
+                   Name of the history file in each logs directory, default
+                   is 'history.data'
+    max_workers  : int, optional
+                   Number of directories listed at once, default is 16
+
+    Returns
+    -------
+    list of string
+        Sorted paths of all run directories found
+    """
+    runs = []
+    level = [root]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while level:
+            next_level = []
+            for path, is_run, subdirs in executor.map(
+                    _scan_dir, level, [log_dir] * len(level),
+                    [history_file] * len(level)):
+                if is_run:
+                    runs.append(path)
+                else:
+                    next_level.extend(subdirs)
+            level = next_level
+    return sorted(runs)
+
+
+def _scan_dir(path, log_dir, history_file):
+    """List one directory, noting whether it is a run and its subdirectories."""
+    subdirs = []
+    is_run = False
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                if entry.name == log_dir:
+                    is_run = os.path.isfile(os.path.join(entry.path,
+                                                         history_file))
+                else:
+                    subdirs.append(entry.path)
+    except OSError:
+        pass
+    return path, is_run, subdirs
+
+
+def read_history_columns(file_name, keys):
+    """Read some history columns, with backups and restarts removed.
+
+    Parameters
+    ----------
+    file_name : string
+                Path to a history file
+    keys      : list of string
+                Names of the columns to be read
+
+    Returns
+    -------
+    dict
+        numpy arrays of the values of 'model_number' and each of `keys`
+    """
+    keys = ['model_number'] + [key for key in keys if key != 'model_number']
+    data = MesaData.read_columns(file_name, keys)
+    keep = _backup_mask(data['model_number'])
+    return {key: values[keep] for key, values in data.items()}
+
+
+def summarize_run(run_path, log_dir='LOGS', history_file='history.data',
+                  columns=(), events=None):
+    """Summarize one run from its history.
+
+    Module-level so that it can be sent to a process pool. The header and
+    final row come from `MesaData.read_summary`, so the history is only
+    parsed in full (and then only the needed columns) when there are
+    `events`.
+
+    Parameters
+    ----------
+    run_path     : string
+                   Path to the run directory
+    log_dir      : string, optional
+                   Name of the logs directory in the run, default is 'LOGS'
+    history_file : string, optional
+                   Name of the history file, default is 'history.data'
+    columns      : list of string, optional
+                   History columns whose final values (and values at each
+                   event) are recorded
+    events       : dict, optional
+                   Maps event names to expressions of history columns (see
+                   `MesaLogDir.select_models`), like
+                   {'tams': 'center_h1 < 1e-4'}. Each event happens at the
+                   first row where its expression is true.
+
+    Returns
+    -------
+    header : dict
+             History header values
+    values : dict
+             'final_' + column for each of `columns`, and, for each event,
+             event + '_model_number' and event + '_' + column for each of
+             `columns` (all None if the event never happens)
+    """
+    path = os.path.join(run_path, log_dir, history_file)
+    header, last = MesaData.read_summary(path)
+    res = {}
+    for key in columns:
+        res['final_' + key] = last.get(key)
+    if events:
+        expressions = {name: _ColumnExpression(expression) for name,
+                       expression in events.items()}
+        needed = list(columns)
+        for expression in expressions.values():
+            needed.extend(expression.names)
+        data = read_history_columns(path, list(dict.fromkeys(needed)))
+        for name, expression in expressions.items():
+            hits = np.nonzero(np.broadcast_to(
+                expression.evaluate(data), data['model_number'].shape))[0]
+            row = hits[0] if len(hits) > 0 else None
+            for key in ['model_number'] + list(columns):
+                res[name + '_' + key] = (None if row is None else
+                                         data[key][row].item())
+    return header, res
+
+
+def map_reduce(map_function, reduce_function, initial=None, root='.',
+               columns=None, log_dir='LOGS', history_file='history.data',
+               checkpoint=None, checkpoint_interval=60.0, max_workers=None,
+               max_pending=None, memory_limit=None, max_tasks_per_child=None,
+               progress=None):
+    """Reduce over every run of a grid without holding the grid in memory.
+
+    Each run is handed to `map_function` in a worker process, and each
+    partial result is folded into the running result with `reduce_function`
+    as soon as it arrives, in whatever order runs finish. Only a few runs
+    are in flight at once, so memory does not grow with the size of the
+    grid, and each worker only ever holds the run it is working on.
+
+    With a `checkpoint` file, the running result and the runs already
+    reduced are saved there regularly (and atomically), and a sweep that is
+    started again with the same checkpoint resumes where it left off.
+
+    Parameters
+    ----------
+    map_function        : function
+                          Called as `map_function(data, run_path)` for each
+                          run, where `data` is a lazy MesaLogDir, or, if
+                          `columns` are given, a dict of those history
+                          columns (see `read_history_columns`). Must be
+                          picklable, like a module-level function.
+    reduce_function     : function
+                          Called as `reduce_function(result, partial)` to
+                          fold in the return value of each map, returning
+                          the new result. Should not depend on order. Its
+                          errors are raised, after saving the checkpoint.
+    initial             : optional
+                          Result before any run is reduced, default is None
+    root                : string, optional
+                          Top of the tree of runs, default is '.'
+    columns             : list of string, optional
+                          History columns to read for `map_function` in
+                          place of a MesaLogDir
+    log_dir             : string, optional
+                          Name of the logs directory in each run, default is
+                          'LOGS'
+    history_file        : string, optional
+                          Name of the history file, default is
+                          'history.data'
+    checkpoint          : string, optional
+                          Path of a checkpoint file to resume from and save
+                          to, default is None (no checkpoints)
+    checkpoint_interval : float, optional
+                          Seconds between checkpoints, default is 60
+    max_workers         : int, optional
+                          Number of worker processes, default is the number
+                          of CPUs
+    max_pending         : int, optional
+                          Most runs submitted but not yet reduced, default
+                          is twice the number of workers
+    memory_limit        : int, optional
+                          Address space limit in bytes for each worker, where
+                          supported. A run that needs more fails with a
+                          MemoryError instead of exhausting the node.
+    max_tasks_per_child : int, optional
+                          Replace each worker after this many runs, which
+                          returns memory lost to fragmentation. Workers are
+                          then started with 'spawn', so `map_function` must
+                          be importable.
+    progress            : function, optional
+                          Called as `progress(done, total, elapsed)` after
+                          each run is reduced
+
+    Returns
+    -------
+    result   : object
+               The fully reduced result
+    failures : dict
+               Maps paths of runs whose map failed to the error message.
+               Failed runs are not checkpointed as done, so they are tried
+               again on resuming.
+
+    Examples
+    --------
+    >>> def lifetime(data, run_path):
+    ...     return np.histogram(data['star_age'][-1:], bins=edges)[0]
+    >>> counts, failures = map_reduce(lifetime, np.add, np.zeros(10),
+    ...                               root='grid', columns=['star_age'],
+    ...                               checkpoint='lifetimes.pkl')
+    """
+    start = time.monotonic()
+    result = initial
+    done = set()
+    failures = {}
+    if checkpoint is not None and os.path.exists(checkpoint):
+        with open(checkpoint, 'rb') as f:
+            result, done = pickle.load(f)
+    paths = [path for path in find_runs(root, log_dir, history_file) if
+             os.path.abspath(path) not in done]
+    total = len(paths) + len(done)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * max_workers
+    executor_kwargs = {}
+    if max_tasks_per_child is not None:
+        executor_kwargs['max_tasks_per_child'] = max_tasks_per_child
+    last_checkpoint = time.monotonic()
+    executor = ProcessPoolExecutor(max_workers=max_workers,
+                                   initializer=_limit_memory,
+                                   initargs=(memory_limit,), **executor_kwargs)
+    pending = {}
+    try:
+        remaining = iter(paths)
+        while True:
+            for path in remaining:
+                pending[executor.submit(_map_run, map_function, path,
+                                        columns, log_dir, history_file)] = path
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    failures[path] = '{}: {}'.format(type(e).__name__, e)
+                else:
+                    # errors in the reduction are bugs, not failed runs
+                    result = reduce_function(result, value)
+                    done.add(os.path.abspath(path))
+                if progress is not None:
+                    progress(len(done) + len(failures), total,
+                             time.monotonic() - start)
+            if (checkpoint is not None and time.monotonic() -
+                    last_checkpoint >= checkpoint_interval):
+                _save_checkpoint(checkpoint, result, done)
+                last_checkpoint = time.monotonic()
+    finally:
+        # an interrupted sweep keeps everything reduced so far, without
+        # waiting for maps still running
+        if checkpoint is not None:
+            _save_checkpoint(checkpoint, result, done)
+        executor.shutdown(wait=False, cancel_futures=True)
+    return result, failures
+
+
+def _map_run(map_function, run_path, columns, log_dir, history_file):
+    """Load one run as `map_reduce` promises and map it."""
+    if columns is None:
+        data = MesaLogDir(os.path.join(run_path, log_dir),
+                          history_file=history_file, lazy=True)
+    else:
+        data = read_history_columns(os.path.join(run_path, log_dir,
+                                                 history_file), columns)
+    return map_function(data, run_path)
+
+
+def _limit_memory(memory_limit):
+    """Worker initializer capping the address space of the process."""
+    if memory_limit is None:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    hard = resource.getrlimit(resource.RLIMIT_AS)[1]
+    if hard != resource.RLIM_INFINITY:
+        memory_limit = min(memory_limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+
+
+def _save_checkpoint(file_name, result, done):
+    """Atomically write the running result and finished runs."""
+    temp_name = file_name + '.tmp'
+    with open(temp_name, 'wb') as f:
+        pickle.dump((result, done), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_name, file_name)
+
+
+class MesaGrid:
+    """Summary of a grid of many MESA runs, loaded in parallel.
+
+    Finds every run directory below `root` (see `find_runs`) and summarizes
+    each one in a process pool (see `summarize_run`), reading only the
+    history header, its last row, and whatever columns the `events` need.
+    The results are collected into one structured numpy array with a row
+    per run. A run that fails to load is recorded in `failures` and
+    otherwise skipped.
+
+    Parameters
+    ----------
+    root         : string, optional
+                   Top of the tree of runs, default is '.'
+    columns      : list of string, optional
+                   History columns whose final and event values are
+                   recorded
+    events       : dict, optional
+                   Maps event names to expressions of history columns, like
+                   {'tams': 'center_h1 < 1e-4'}
+    header_keys  : list of string, optional
+                   History header values (initial parameters) to record,
+                   default is every header value found in any run
+    log_dir      : string, optional
+                   Name of the logs directory in each run, default is 'LOGS'
+    history_file : string, optional
+                   Name of the history file, default is 'history.data'
+    executor     : concurrent.futures.Executor, optional
+                   Executor in which runs are summarized, default is a new
+                   process pool with `max_workers` processes
+    max_workers  : int, optional
+                   Size of the default process pool, default is the number
+                   of CPUs
+    progress     : function, optional
+                   Called as `progress(done, total, elapsed)` after each run
+                   is summarized. Default is to print a progress line with
+                   the throughput every few seconds if `verbose` is True.
+    verbose      : bool, optional
+                   Whether to print progress when no `progress` function is
+                   given, default is False
+
+    Attributes
+    ----------
+    root      : string
+                Top of the tree of runs
+    run_paths : numpy_array
+                Paths of the runs that loaded, one per row of `summary`
+    summary   : numpy recarray
+                One row per run, with a field for each header value, each
+                'final_' + column, and each event value. Missing numbers are
+                NaN.
+    failures  : dict
+                Maps paths of runs that failed to load to the error message
+    elapsed   : float
+                Seconds taken to summarize all runs
+    """
+
+    def __init__(self, root='.', columns=(), events=None, header_keys=None,
+                 log_dir='LOGS', history_file='history.data', executor=None,
+                 max_workers=None, progress=None, verbose=False):
+        self.root = root
+        self.log_dir = log_dir
+        self.history_file = history_file
+        self.failures = {}
+
+        start = time.monotonic()
+        paths = find_runs(root, log_dir, history_file)
+        if progress is None and verbose:
+            progress = _ProgressPrinter()
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        results = {}
+        try:
+            futures = {executor.submit(summarize_run, path, log_dir,
+                                       history_file, list(columns), events):
+                       path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    self.failures[path] = '{}: {}'.format(
+                        type(e).__name__, e)
+                if progress is not None:
+                    progress(len(results) + len(self.failures), len(paths),
+                             time.monotonic() - start)
+        finally:
+            if own_executor:
+                executor.shutdown()
+        self.elapsed = time.monotonic() - start
+
+        loaded = [path for path in paths if path in results]
+        self.run_paths = np.array(loaded, dtype=str)
+        self.summary = _table([results[path] for path in loaded],
+                              header_keys, columns, events)
+
+    def log_dir_of(self, i, **kwargs):
+        """Open the logs of the `i`-th run in `summary` as a lazy MesaLogDir.
+
+        Extra keyword arguments are passed on to MesaLogDir.
+        """
+        kwargs.setdefault('lazy', True)
+        return MesaLogDir(os.path.join(self.run_paths[i], self.log_dir),
+                          history_file=self.history_file, **kwargs)
+
+    def select(self, expression):
+        """Return paths of runs whose summary satisfies `expression`.
+
+        Parameters
+        ----------
+        expression : string
+                     Expression of summary fields, like
+                     "initial_mass > 3 & final_star_age > 1e8"
+
+        Returns
+        -------
+        numpy_array
+            Paths of the matching runs
+        """
+        expression = _ColumnExpression(expression)
+        columns = {name: self.summary[name] for name in expression.names}
+        mask = np.broadcast_to(expression.evaluate(columns),
+                               self.run_paths.shape)
+        return self.run_paths[mask]
+
+
+class _ProgressPrinter:
+    """Default progress report, printed at most every few seconds."""
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.last = None
+
+    def __call__(self, done, total, elapsed):
+        if (done == total or self.last is None or
+                elapsed - self.last >= self.interval):
+            self.last = elapsed
+            rate = done / elapsed if elapsed > 0 else float('inf')
+            print("Summarized {}/{} runs in {:.1f} s ({:.1f} runs/s)".format(
+                done, total, elapsed, rate))
+
+
+def _table(results, header_keys, columns, events):
+    """Build a record array from (header, values) run summaries."""
+    if header_keys is None:
+        header_keys = []
+        for header, values in results:
+            for key in header:
+                if key not in header_keys:
+                    header_keys.append(key)
+    rows = [dict(header, **values) for header, values in results]
+    names = list(header_keys) + ['final_' + key for key in columns]
+    for event in (events or {}):
+        names += [event + '_' + key for key in ['model_number'] +
+                  list(columns)]
+    fields = {}
+    for name in names:
+        values = [row.get(name) for row in rows]
+        if all(value is None or (isinstance(value, (int, float, np.number))
+                                 and not isinstance(value, bool))
+               for value in values):
+            fields[name] = np.array([np.nan if value is None else value for
+                                     value in values], dtype=float)
+        else:
+            fields[name] = np.array(['' if value is None else str(value) for
+                                     value in values], dtype=str)
+    table = np.empty(len(rows), dtype=[(name, fields[name].dtype) for name in
+                                       names])
+    for name in names:
+        table[name] = fields[name]
+    return table.view(np.recarray)
@@ -1,6 +1,8 @@
 from os import environ
 from os.path import join
 
+from .reader import BadPathError
+
 
 def get_mesa_dir(mesa_dir=None):
     # Try to find default mesa dir location if one isn't provided
@@ -0,0 +1,184 @@
+import re
+
+import numpy as np
+
+from .reader import KeyError, HistoryError, _nearest_indices
+
+# MESA mixing types as written to the mix_type_* history columns
+mixing_types = {
+    'no_mixing': 0,
+    'convective': 1,
+    'softened_convective': 2,
+    'overshoot': 3,
+    'semiconvective': 4,
+    'thermohaline': 5,
+    'rotation': 6,
+    'minimum': 7,
+    'anonymous': 8
+}
+
+# Value used in the rasterized mixing grid for cells outside of the star
+outside_star = -1
+
+
+class KippenhahnDiagram:
+    """Rasterized Kippenhahn diagram built from mixing and burning regions.
+
+    Decodes the mixing region (`mix_type_*`/`mix_qtop_*`) and burning region
+    (`burn_type_*`/`burn_qtop_*`) columns of a MESA history into grids of
+    mixing type and burning intensity on a regular (mass or fractional mass)
+    by (history column, like model number or age) mesh. Each column of the
+    grid is taken from the history row nearest to its x value, and rows are
+    processed in chunks with array operations only, so long histories are
+    handled quickly and in bounded memory.
+
+    The region columns give, for each model, the outer boundary (as a
+    fraction of the star's mass) of consecutive regions starting from the
+    center, along with the type of each region. Regions with a type of -1
+    or a negative boundary are unused and are skipped.
+
+    Parameters
+    ----------
+    source      : MesaData or MesaLogDir
+                  History data to be rasterized. If a MesaLogDir is given,
+                  its history is used.
+    x           : string, optional
+                  History column used for the horizontal axis. Must increase
+                  monotonically (after backups and restarts are removed), like
+                  'model_number' or 'star_age'. Default is 'model_number'.
+    y           : string, optional
+                  Either 'mass', for a vertical axis of mass coordinate in
+                  solar masses (using the 'star_mass' column), or 'q', for
+                  fractional mass coordinate. Default is 'mass'.
+    nx          : int, optional
+                  Number of cells along the horizontal axis, default is 1000.
+                  If None, every history row in `x_range` gets its own cell.
+    ny          : int, optional
+                  Number of cells along the vertical axis, default is 500
+    x_range     : tuple of float, optional
+                  Limits of the horizontal axis, default is the full range of
+                  the `x` column
+    y_range     : tuple of float, optional
+                  Limits of the vertical axis, default is from zero to the
+                  largest star mass (for `y` = 'mass') or to 1 (for `y` = 'q')
+    mix_prefix  : string, optional
+                  Prefix of the mixing region columns, default is 'mix'
+    burn_prefix : string, optional
+                  Prefix of the burning region columns, default is 'burn'
+    chunk_size  : int, optional
+                  Number of history rows decoded at once, default is 1024.
+                  Bounds the memory used for temporary arrays.
+
+    Attributes
+    ----------
+    x         : numpy_array
+                Values of the `x` column at the history rows used for each
+                grid column (length `nx`)
+    y         : numpy_array
+                Centers of the grid cells along the vertical axis (length
+                `ny`)
+    rows      : numpy_array
+                Indices of the history rows used for each grid column
+    star_mass : numpy_array
+                Star mass (or 1 if `y` is 'q') for each grid column, useful
+                for drawing the surface
+    mixing    : numpy_array
+                (`ny`, `nx`) array of mixing types (see `mixing_types`), with
+                `outside_star` for cells above the surface. None if the
+                history has no mixing region columns.
+    burning   : numpy_array
+                (`ny`, `nx`) array of burning types, as written by MESA (the
+                signed log of the nuclear energy generation rate), with NaN
+                outside the star or any burning region. None if the history
+                has no burning region columns.
+    """
+
+    def __init__(self, source, x='model_number', y='mass', nx=1000, ny=500,
+                 x_range=None, y_range=None, mix_prefix='mix',
+                 burn_prefix='burn', chunk_size=1024):
+        history = getattr(source, 'history', source)
+        if y not in ('mass', 'q'):
+            raise ValueError("y must be 'mass' or 'q', not '" + str(y) + "'.")
+        if not history.in_data(x):
+            raise KeyError("'" + str(x) + "' is not a valid data type.")
+        x_values = history.data(x)
+        if np.any(np.diff(x_values) < 0):
+            raise HistoryError("Can't use '" + x + "' as the x axis because "
+                               "it does not increase monotonically.")
+
+        if x_range is None:
+            x_range = (x_values[0], x_values[-1])
+        if nx is None:
+            self.rows = np.nonzero((x_values >= x_range[0]) &
+                                   (x_values <= x_range[1]))[0]
+        else:
+            self.rows = _nearest_indices(x_values, np.linspace(
+                x_range[0], x_range[1], nx))
+        self.x = x_values[self.rows]
+
+        if y == 'mass':
+            self.star_mass = history.data('star_mass')[self.rows]
+            if y_range is None:
+                y_range = (0.0, float(np.max(history.data('star_mass'))))
+        else:
+            self.star_mass = np.ones(len(self.rows))
+            if y_range is None:
+                y_range = (0.0, 1.0)
+        edges = np.linspace(y_range[0], y_range[1], ny + 1)
+        self.y = 0.5 * (edges[:-1] + edges[1:])
+
+        self.mixing = self._rasterize(history, mix_prefix, chunk_size,
+                                      outside_star, mixing_types['no_mixing'],
+                                      int)
+        self.burning = self._rasterize(history, burn_prefix, chunk_size,
+                                       np.nan, np.nan, float)
+
+    def _rasterize(self, history, prefix, chunk_size, outside, uncovered,
+                   dtype):
+        """Decode one family of region columns onto the grid."""
+        types, qtops = _region_columns(history, prefix)
+        if types is None:
+            return None
+        grid = np.empty((len(self.y), len(self.rows)), dtype=dtype)
+        for start in range(0, len(self.rows), chunk_size):
+            rows = self.rows[start:start + chunk_size]
+            these_types = types[rows]
+            these_qtops = qtops[rows]
+            unused = (these_types == -1) | (these_qtops < 0)
+            these_qtops = np.where(unused, np.inf, these_qtops)
+            # outer boundaries must be non-decreasing for the region search
+            these_qtops = np.maximum.accumulate(these_qtops, axis=1)
+            q = self.y[None, :] / self.star_mass[start:start + chunk_size,
+                                                 None]
+            # index of the first region whose outer boundary lies above q
+            region = np.sum(these_qtops[:, None, :] < q[:, :, None], axis=2)
+            covered = region < these_types.shape[1]
+            region = np.minimum(region, these_types.shape[1] - 1)
+            values = np.take_along_axis(these_types, region, axis=1)
+            values = np.where(covered & ~np.take_along_axis(unused, region,
+                                                            axis=1),
+                              values, uncovered)
+            values = np.where(q > 1, outside, values)
+            grid[:, start:start + chunk_size] = values.T
+        return grid
+
+
+def _region_columns(history, prefix):
+    """Stack the `prefix`_type_N and `prefix`_qtop_N columns of a history.
+
+    Returns two (rows, regions) arrays ordered by N, or (None, None) if the
+    history has no such columns.
+    """
+    matcher = re.compile(r'\A' + re.escape(prefix) + r'_type_(\d+)\Z')
+    numbers = sorted(int(match.group(1)) for match in
+                     (matcher.match(name) for name in history.bulk_names)
+                     if match is not None)
+    numbers = [n for n in numbers if
+               history.in_data('{}_qtop_{}'.format(prefix, n))]
+    if len(numbers) == 0:
+        return None, None
+    types = np.column_stack([history.data('{}_type_{}'.format(prefix, n))
+                             for n in numbers])
+    qtops = np.column_stack([history.data('{}_qtop_{}'.format(prefix, n))
+                             for n in numbers])
+    return types, qtops
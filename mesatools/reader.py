@@ -1,4 +1,12 @@
+import ast
+import asyncio
+import collections
+import functools
 import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
@@ -28,6 +36,86 @@ class BadPathError(Exception):
         Exception.__init__(self, msg)
 
 
+# Guards creation of the shared executor used by MesaLogDir's async methods
+_executor_lock = threading.Lock()
+
+
+def _sorted_lookup(sorted_arr, values):
+    """Locate `values` in the sorted array `sorted_arr`.
+
+    Returns a boolean array flagging which of `values` were found and an
+    array of their indices in `sorted_arr` (only meaningful where found).
+    """
+    values = np.asarray(values)
+    if len(sorted_arr) == 0:
+        return (np.zeros(values.shape, dtype=bool),
+                np.zeros(values.shape, dtype=int))
+    indices = np.searchsorted(sorted_arr, values)
+    indices = np.clip(indices, 0, len(sorted_arr) - 1)
+    return sorted_arr[indices] == values, indices
+
+
+def _backup_mask(model_numbers):
+    """Flag rows of a history that survive removal of backups and restarts.
+
+    A row is kept only if its model number is smaller than every model
+    number that comes after it, so the surviving model numbers increase
+    monotonically.
+    """
+    if len(model_numbers) == 0:
+        return np.ones(0, dtype=bool)
+    later_min = np.minimum.accumulate(model_numbers[::-1])[::-1]
+    keep = np.ones(len(model_numbers), dtype=bool)
+    keep[:-1] = model_numbers[:-1] < later_min[1:]
+    return keep
+
+
+def _parse_number(datum):
+    """Convert a data string to an int or float, falling back to the string."""
+    for convert in (int, float):
+        try:
+            return convert(datum)
+        except ValueError:
+            pass
+    return datum
+
+
+def _fingerprint(path):
+    """Cheap (size, mtime) signature of a file or directory, None if absent."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _call_soon(loop, callback):
+    """Schedule `callback` on `loop` from any thread, unless it is closed."""
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        pass
+
+
+def _forget_read(pending, profile_number, task):
+    """Drop a finished profile read from the reads in progress."""
+    entry = pending.get(profile_number)
+    if entry is not None and entry[0] is task:
+        del pending[profile_number]
+
+
+def _nearest_indices(sorted_arr, values):
+    """Indices of the entries of `sorted_arr` nearest to each of `values`."""
+    values = np.asarray(values)
+    if len(sorted_arr) == 1:
+        return np.zeros(values.shape, dtype=int)
+    right = np.clip(np.searchsorted(sorted_arr, values), 1,
+                    len(sorted_arr) - 1)
+    left = right - 1
+    use_left = (values - sorted_arr[left]) <= (sorted_arr[right] - values)
+    return np.where(use_left, left, right)
+
+
 class MesaData:
     """Structure containing data from a Mesa output file.
 
@@ -111,11 +199,12 @@ class MesaData:
                     which works for
         """
         self.file_name = file_name
-        self.read_data()
         self.bulk_data = None
         self.bulk_names = None
         self.header_names = None
         self.header_data = None
+        self._read_offset = 0
+        self.read_data()
 
     def read_data(self):
         """Update data by re-reading from the original file name.
@@ -125,21 +214,182 @@ class MesaData:
         if the class methods MesaData.set_header_rows or MesaData.set_data_rows
         have been used to alter how the data have been read in.
         """
-        self.bulk_data = np.genfromtxt(self.file_name,
+        with open(self.file_name, 'rb') as f:
+            contents = f.read()
+        # only take complete lines, since MESA may be partway through
+        # writing the last one; `update_data` picks it up once finished
+        contents = contents[:contents.rfind(b'\n') + 1]
+        lines = contents.decode().splitlines()
+        self.bulk_data = np.genfromtxt(lines,
                                        skip_header=MesaData.bulk_names_line - 1,
                                        names=True, dtype=None)
         self.bulk_names = self.bulk_data.dtype.names
-        with open(self.file_name) as f:
-            for i, line in enumerate(f):
-                if i == MesaData.header_names_line - 1:
-                    self.header_names = line.split()
-                elif i == MesaData.header_names_line:
-                    header_data = [eval(datum) for datum in line.split()]
-                elif i > MesaData.header_names_line:
-                    break
+        self.header_names = lines[MesaData.header_names_line - 1].split()
+        header_data = [eval(datum) for datum in
+                       lines[MesaData.header_names_line].split()]
         self.header_data = dict(zip(self.header_names, header_data))
+        self._read_offset = len(contents)
         self.remove_backups()
 
+    @classmethod
+    def read_summary(cls, file_name):
+        """Read only the header and the last row of data from a file.
+
+        Much cheaper than reading the whole file for long histories, since
+        only the first few lines and the end of the file are read. Because
+        backups and restarts never remove the last row, the last row is the
+        same as that of the full, cleaned data.
+
+        Parameters
+        ----------
+        file_name : string
+                    Path to a profile or history output file
+
+        Returns
+        -------
+        header_data : dict
+                      Header data, as in `MesaData.header_data`
+        last_row    : dict
+                      Values of each main data column in the last row
+        """
+        with open(file_name, 'rb') as f:
+            lines = []
+            for line in f:
+                lines.append(line.decode())
+                if len(lines) == cls.bulk_names_line:
+                    break
+            header_names = lines[cls.header_names_line - 1].split()
+            header_data = [eval(datum) for datum in
+                           lines[cls.header_names_line].split()]
+            bulk_names = lines[cls.bulk_names_line - 1].split()
+            data_start = f.tell()
+
+            # step backwards from the end until a full last line is in hand
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            tail = b''
+            position = end
+            while position > data_start and tail.strip().count(b'\n') < 1:
+                step = min(8192, position - data_start)
+                position -= step
+                f.seek(position)
+                tail = f.read(step) + tail
+        tail_lines = tail.decode().strip().splitlines()
+        last_row = {}
+        if len(tail_lines) > 0:
+            values = tail_lines[-1].split()
+            if len(values) == len(bulk_names):
+                # numpy scalars, like the columns of the full data
+                last_row = dict(zip(bulk_names,
+                                    [np.array(_parse_number(v))[()] for v in
+                                     values]))
+        return dict(zip(header_names, header_data)), last_row
+
+    @classmethod
+    def read_columns(cls, file_name, keys):
+        """Read only some main data columns from a file.
+
+        Much faster and lighter than reading the whole file when only a few
+        of many columns are needed. Backups and restarts are not removed, so
+        this is best suited to profiles.
+
+        Parameters
+        ----------
+        file_name : string
+                    Path to a profile or history output file
+        keys      : list of string
+                    Names of the main data columns to be read
+
+        Returns
+        -------
+        dict
+            numpy arrays of the values of each of `keys`
+
+        Raises
+        ------
+        KeyError
+            If any of `keys` is not a column in `file_name`
+        """
+        with open(file_name) as f:
+            for i, line in enumerate(f):
+                if i == cls.bulk_names_line - 1:
+                    bulk_names = line.split()
+                    break
+        for key in keys:
+            if key not in bulk_names:
+                raise KeyError("'" + str(key) + "' is not a valid data " +
+                               "type in " + file_name + ".")
+        columns = [bulk_names.index(key) for key in keys]
+        values = np.loadtxt(file_name, skiprows=cls.bulk_names_line,
+                            usecols=columns, ndmin=2)
+        return {key: values[:, i] for i, key in enumerate(keys)}
+
+    @classmethod
+    def from_data(cls, bulk_data, header_data, file_name):
+        """Make a MesaData object from data already in memory.
+
+        Parameters
+        ----------
+        bulk_data   : numpy recarray
+                      The main data, with one field per data column
+        header_data : dict
+                      Header data, in the order the header names should have
+        file_name   : string
+                      Path to report as the source of the data
+
+        Returns
+        -------
+        MesaData
+            Data built from `bulk_data` and `header_data` without reading any
+            file
+        """
+        data = cls.__new__(cls)
+        data.file_name = file_name
+        data.bulk_data = bulk_data
+        data.bulk_names = bulk_data.dtype.names
+        data.header_names = list(header_data.keys())
+        data.header_data = dict(header_data)
+        data._read_offset = 0
+        return data
+
+    def update_data(self):
+        """Append rows written to the source file since it was last read.
+
+        Reads only the complete lines past the point where the previous read
+        stopped, appending them to `bulk_data` and removing any rows made
+        obsolete by backups or restarts. This is much cheaper than
+        `read_data` for a history file that is still being written. If the
+        file has shrunk since the last read, it is re-read from scratch.
+
+        Returns
+        -------
+        int
+            Number of rows at the end of `bulk_data` that are new since the
+            last read. If the file was re-read from scratch, this is the
+            total number of rows.
+        """
+        if os.path.getsize(self.file_name) < self._read_offset:
+            self.read_data()
+            return len(self.bulk_data)
+        with open(self.file_name, 'rb') as f:
+            f.seek(self._read_offset)
+            contents = f.read()
+        # only take complete lines; a partial one is picked up next time
+        contents = contents[:contents.rfind(b'\n') + 1]
+        lines = [line for line in contents.decode().splitlines()
+                 if line.strip()]
+        if len(lines) == 0:
+            return 0
+        self._read_offset += len(contents)
+        new_data = np.atleast_1d(np.genfromtxt(lines,
+                                               dtype=self.bulk_data.dtype))
+        self.bulk_data = np.concatenate((self.bulk_data, new_data))
+        if not self.is_history:
+            return len(new_data)
+        keep = _backup_mask(self.data('model_number'))
+        self.bulk_data = self.bulk_data[keep]
+        return int(np.count_nonzero(keep[-len(new_data):]))
+
     def data(self, key):
         """Accesses the data and returns a numpy array with the appropriate data
 
@@ -360,6 +610,68 @@ class MesaData:
         elif len(index) == 1:
             return index[0]
 
+    def indices_of_model_numbers(self, m_nums):
+        """Return indices where MesaData.data('model_number') is each of `m_nums`.
+
+        Vectorized counterpart of `index_of_model_number`, locating all of
+        `m_nums` with a single sorted search rather than one scan per model.
+
+        Parameters
+        ----------
+        m_nums : array_like of int
+                 Model numbers where you want to sample data
+
+        Returns
+        -------
+        numpy_array
+            Indices such that MesaData.data('model_number')[indices] == `m_nums`
+
+        Raises
+        ------
+        HistoryError
+            If trying to access a non-history file
+
+        ModelNumberError
+            If any of `m_nums` has no matching entry.
+
+        See Also
+        --------
+        data_at_model_numbers : returns the data of a key at many model numbers
+        """
+        if not self.is_history:
+            raise HistoryError("Can't get data at model numbers " +
+                               "because this isn't a history file")
+        m_nums = np.asarray(m_nums)
+        found, indices = _sorted_lookup(self.data('model_number'), m_nums)
+        if not np.all(found):
+            raise ModelNumberError("Couldn't find any entries with model " +
+                                   "numbers " + str(m_nums[~found].tolist()) +
+                                   ".")
+        return indices
+
+    def data_at_model_numbers(self, key, m_nums):
+        """Return main data at many model numbers (for history files).
+
+        Parameters
+        ----------
+        key : string
+              Name of data. Must match a main data title in the source file.
+
+        m_nums : array_like of int
+                 Model numbers where you want to sample the data
+
+        Returns
+        -------
+        numpy_array
+            Values of MesaData.data(`key`) at the indices where
+            MesaData.data('model_number') matches each of `m_nums`
+
+        See Also
+        --------
+        indices_of_model_numbers : returns the indices, not the values
+        """
+        return self.data(key)[self.indices_of_model_numbers(m_nums)]
+
     def remove_backups(self, dbg=False):
         """Cleases a history file of backups and restarts
 
@@ -380,18 +692,15 @@ class MesaData:
             return None
         if dbg:
             print("Scrubbing history...")
-        to_remove = []
-        for i in range(len(self.data('model_number')) - 1):
-            smallest_future = np.min(self.data('model_number')[i + 1:])
-            if self.data('model_number')[i] >= smallest_future:
-                to_remove.append(i)
-        if len(to_remove) == 0:
+        keep = _backup_mask(self.data('model_number'))
+        if np.all(keep):
             if dbg:
                 print("Already clean!")
             return None
         if dbg:
-            print("Removing {} lines.".format(len(to_remove)))
-        self.bulk_data = np.delete(self.bulk_data, to_remove)
+            print("Removing {} lines.".format(len(keep) -
+                                              np.count_nonzero(keep)))
+        self.bulk_data = self.bulk_data[keep]
 
     def __getattr__(self, method_name):
         if self.in_data(method_name):
@@ -473,16 +782,64 @@ class MesaProfileIndex:
         Called automatically at instantiation, but may be called again to
         refresh data.
         """
-        self.index_data = np.genfromtxt(self.file_name,
-                                        skip_header=MesaProfileIndex.index_start_line - 1,
-                                        dtype=None)
+        with open(self.file_name) as f:
+            lines = f.read().splitlines()[
+                MesaProfileIndex.index_start_line - 1:]
+        if any(line.strip() for line in lines):
+            index_array = np.genfromtxt(lines, dtype=None)
+        else:
+            # an index written before the first profile
+            index_array = np.zeros((0, len(MesaProfileIndex.index_names)),
+                                   dtype=int)
+        self._set_index_array(np.atleast_2d(index_array))
+
+    @classmethod
+    def from_array(cls, index_array, file_name):
+        """Make a MesaProfileIndex from an already-parsed index table.
+
+        Parameters
+        ----------
+        index_array : numpy_array
+                      Two-dimensional array with one row per profile and the
+                      columns named in `MesaProfileIndex.index_names`
+        file_name   : string
+                      Path to report as the source of the index
+
+        Returns
+        -------
+        MesaProfileIndex
+            Index built from `index_array` without reading any file
+        """
+        index = cls.__new__(cls)
+        index.file_name = file_name
+        index._set_index_array(np.atleast_2d(index_array))
+        return index
+
+    def _set_index_array(self, index_array):
+        """Sort an index table by model number and build the lookups."""
         self.model_number_string = MesaProfileIndex.index_names[0]
         self.profile_number_string = MesaProfileIndex.index_names[-1]
-        self.index_data = self.index_data[np.argsort(self.index_data[:, 0])]
+        self.index_data = index_array[np.argsort(index_array[:, 0])]
         self.index_data = dict(
                 zip(MesaProfileIndex.index_names, self.index_data.T))
         self.profile_numbers = self.data(self.profile_number_string)
         self.model_numbers = self.data(self.model_number_string)
+        self._build_lookups()
+
+    def _build_lookups(self):
+        """Build dictionaries and sorted arrays for fast number conversion.
+
+        The dictionaries serve scalar lookups in constant time, while the
+        sorted arrays (and the permutation that sorts the profile numbers)
+        serve vectorized conversions via `np.searchsorted`.
+        """
+        self._profile_of_model = dict(zip(self.model_numbers.tolist(),
+                                          self.profile_numbers.tolist()))
+        self._model_of_profile = dict(zip(self.profile_numbers.tolist(),
+                                          self.model_numbers.tolist()))
+        self._profile_order = np.argsort(self.profile_numbers, kind='stable')
+        self._sorted_profile_numbers = self.profile_numbers[
+            self._profile_order]
 
     def data(self, key):
         """Access index data and return array of column corresponding to `key`.
@@ -522,7 +879,7 @@ class MesaProfileIndex:
         bool
             True if `model_number` has a corresponding profile number. False
             otherwise."""
-        return model_number in self.data(self.model_number_string)
+        return model_number in self._profile_of_model
 
     def have_profile_with_profile_number(self, profile_number):
         """Determines if given `profile_number` is a valid profile number.
@@ -537,7 +894,7 @@ class MesaProfileIndex:
         bool
             True if `profile_number` has a corresponding entry in the index.
             False otherwise."""
-        return profile_number in self.data(self.profile_number_string)
+        return profile_number in self._model_of_profile
 
     def profile_with_model_number(self, model_number):
         """Converts a model number to a profile number if possible.
@@ -560,11 +917,84 @@ class MesaProfileIndex:
         ProfileError
             If no profile number can be found that corresponds to `model_number`
         """
-        if not (self.have_profile_with_model_number(model_number)):
+        if model_number not in self._profile_of_model:
             raise ProfileError("No profile with model number " +
                                str(model_number) + ".")
-        indices = np.where(self.data(self.model_number_string) == model_number)
-        return np.take(self.data(self.profile_number_string), indices[0])[0]
+        return self._profile_of_model[model_number]
+
+    def model_with_profile_number(self, profile_number):
+        """Converts a profile number to a model number if possible.
+
+        Parameters
+        ----------
+        profile_number : int
+                         profile number to be converted into a model number
+
+        Returns
+        -------
+        int
+            model number corresponding to `profile_number`
+
+        Raises
+        ------
+        ProfileError
+            If `profile_number` is not in the index
+        """
+        if profile_number not in self._model_of_profile:
+            raise ProfileError("No profile with profile number " +
+                               str(profile_number) + ".")
+        return self._model_of_profile[profile_number]
+
+    def profiles_with_model_numbers(self, model_numbers):
+        """Converts an array of model numbers to profile numbers at once.
+
+        Parameters
+        ----------
+        model_numbers : array_like of int
+                        model numbers to be converted into profile numbers
+
+        Returns
+        -------
+        numpy_array
+            profile numbers corresponding element-wise to `model_numbers`
+
+        Raises
+        ------
+        ProfileError
+            If any of `model_numbers` has no corresponding profile
+        """
+        model_numbers = np.asarray(model_numbers)
+        found, indices = _sorted_lookup(self.model_numbers, model_numbers)
+        if not np.all(found):
+            raise ProfileError("No profiles with model numbers " +
+                               str(model_numbers[~found].tolist()) + ".")
+        return self.profile_numbers[indices]
+
+    def models_with_profile_numbers(self, profile_numbers):
+        """Converts an array of profile numbers to model numbers at once.
+
+        Parameters
+        ----------
+        profile_numbers : array_like of int
+                          profile numbers to be converted into model numbers
+
+        Returns
+        -------
+        numpy_array
+            model numbers corresponding element-wise to `profile_numbers`
+
+        Raises
+        ------
+        ProfileError
+            If any of `profile_numbers` is not in the index
+        """
+        profile_numbers = np.asarray(profile_numbers)
+        found, indices = _sorted_lookup(self._sorted_profile_numbers,
+                                        profile_numbers)
+        if not np.all(found):
+            raise ProfileError("No profiles with profile numbers " +
+                               str(profile_numbers[~found].tolist()) + ".")
+        return self.model_numbers[self._profile_order[indices]]
 
     def __getattr__(self, method_name):
         if method_name in self.index_data.keys():
@@ -573,6 +1003,215 @@ class MesaProfileIndex:
             raise AttributeError(method_name)
 
 
+class MesaProfileCatalog:
+    """Listing of the profile files actually present in a logs directory.
+
+    Scans the logs directory once with `os.scandir`, recording every file
+    whose name matches `profile_prefix` + profile number + '.' +
+    `profile_suffix` along with its size and modification time. This lets
+    missing or stray profiles be found up front, and lets profiles be opened
+    without checking the file system on every access. Mostly accessed via the
+    MesaLogDir class.
+
+    Parameters
+    ----------
+    log_path       : string, optional
+                     Path to the logs directory, default is 'LOGS'
+    profile_prefix : string, optional
+                     Prefix before profile number in profile file names,
+                     default is 'profile'
+    profile_suffix : string, optional
+                     Suffix after profile number and period for profile file
+                     names, default is 'data'
+
+    Attributes
+    ----------
+    log_path        : string
+                      Path to the scanned logs directory
+    profile_prefix  : string
+                      Prefix before profile number in profile file names
+    profile_suffix  : string
+                      Suffix after profile number and period for profile file
+                      names
+    profile_numbers : numpy_array
+                      Sorted profile numbers of all profile files found
+    sizes           : numpy_array
+                      File sizes in bytes, aligned with `profile_numbers`
+    mtimes          : numpy_array
+                      Modification times (seconds since the epoch), aligned
+                      with `profile_numbers`
+    other_files     : list
+                      Names of all other files found in the directory
+    """
+
+    def __init__(self, log_path='LOGS', profile_prefix='profile',
+                 profile_suffix='data'):
+        self.log_path = log_path
+        self.profile_prefix = profile_prefix
+        self.profile_suffix = profile_suffix
+        self.profile_numbers = None
+        self.sizes = None
+        self.mtimes = None
+        self.other_files = None
+        self._entries = None
+
+        self.scan()
+
+    def scan(self, restat_known=True):
+        """Scan (or re-scan) the logs directory for profile files.
+
+        Called automatically at instantiation, but may be called again to
+        pick up files written since the last scan.
+
+        Parameters
+        ----------
+        restat_known : bool, optional
+                       If False, files already found by a previous scan keep
+                       their recorded size and mtime, so only new files are
+                       stat-ed. Default is True.
+
+        Returns
+        -------
+        numpy_array
+            Sorted profile numbers of files not found by the previous scan
+        """
+        prefix_len = len(self.profile_prefix)
+        ending = '.' + self.profile_suffix
+        old_entries = self._entries if self._entries is not None else {}
+        entries = {}
+        self.other_files = []
+        with os.scandir(self.log_path) as it:
+            for entry in it:
+                name = entry.name
+                number = name[prefix_len:-len(ending)]
+                if (name.startswith(self.profile_prefix) and
+                        name.endswith(ending) and number.isdigit() and
+                        entry.is_file()):
+                    number = int(number)
+                    if not restat_known and number in old_entries:
+                        entries[number] = old_entries[number]
+                    else:
+                        stat = entry.stat()
+                        entries[number] = (entry.path, stat.st_size,
+                                           stat.st_mtime)
+                else:
+                    self.other_files.append(name)
+        numbers = sorted(entries)
+        self.profile_numbers = np.array(numbers, dtype=int)
+        self.sizes = np.array([entries[n][1] for n in numbers],
+                              dtype=np.int64)
+        self.mtimes = np.array([entries[n][2] for n in numbers], dtype=float)
+        self._entries = entries
+        return np.array(sorted(set(numbers) - set(old_entries)), dtype=int)
+
+    @classmethod
+    def from_entries(cls, log_path, profile_prefix, profile_suffix, entries):
+        """Make a catalog from known profile files rather than a scan.
+
+        Parameters
+        ----------
+        log_path       : string
+                         Path to report as the scanned location
+        profile_prefix : string
+                         Prefix before profile number in profile file names
+        profile_suffix : string
+                         Suffix after profile number and period for profile
+                         file names
+        entries        : dict
+                         Maps profile numbers to (path, size, mtime) tuples
+
+        Returns
+        -------
+        MesaProfileCatalog
+            Catalog listing exactly the profiles in `entries`
+        """
+        catalog = cls.__new__(cls)
+        catalog.log_path = log_path
+        catalog.profile_prefix = profile_prefix
+        catalog.profile_suffix = profile_suffix
+        catalog.other_files = []
+        numbers = sorted(entries)
+        catalog.profile_numbers = np.array(numbers, dtype=int)
+        catalog.sizes = np.array([entries[n][1] for n in numbers],
+                                 dtype=np.int64)
+        catalog.mtimes = np.array([entries[n][2] for n in numbers],
+                                  dtype=float)
+        catalog._entries = dict(entries)
+        return catalog
+
+    def have_profile_file(self, profile_number):
+        """Determines if a file was found for `profile_number`.
+
+        Parameters
+        ----------
+        profile_number : int
+                         profile number to be checked
+
+        Returns
+        -------
+        bool
+            True if a matching profile file was found in the scan, otherwise
+            False.
+        """
+        return profile_number in self._entries
+
+    def path(self, profile_number):
+        """Return the path to the file for a given profile number.
+
+        Parameters
+        ----------
+        profile_number : int
+                         profile number whose file path is desired
+
+        Returns
+        -------
+        string
+            Path to the profile file
+
+        Raises
+        ------
+        ProfileError
+            If no file was found for `profile_number`
+        """
+        if profile_number not in self._entries:
+            raise ProfileError("No file for profile number " +
+                               str(profile_number) + " found in " +
+                               self.log_path + ".")
+        return self._entries[profile_number][0]
+
+    def missing_profiles(self, profile_numbers):
+        """Return those of `profile_numbers` that have no file on disk.
+
+        Parameters
+        ----------
+        profile_numbers : array_like of int
+                          profile numbers to check, typically those from a
+                          MesaProfileIndex
+
+        Returns
+        -------
+        numpy_array
+            Sorted profile numbers in `profile_numbers` without a file
+        """
+        return np.setdiff1d(profile_numbers, self.profile_numbers)
+
+    def extra_profiles(self, profile_numbers):
+        """Return profile numbers found on disk but not in `profile_numbers`.
+
+        Parameters
+        ----------
+        profile_numbers : array_like of int
+                          profile numbers to check against, typically those
+                          from a MesaProfileIndex
+
+        Returns
+        -------
+        numpy_array
+            Sorted profile numbers of files not in `profile_numbers`
+        """
+        return np.setdiff1d(self.profile_numbers, profile_numbers)
+
+
 class MesaLogDir:
     """Structure providing access to both history and profile output from MESA
 
@@ -582,7 +1221,10 @@ class MesaLogDir:
     Parameters
     ----------
     log_path         : string, optional
-                       Path to the logs directory, default is 'LOGS'
+                       Path to the logs directory, default is 'LOGS'. May
+                       also be the path to a run archive made by
+                       `mesatools.archive.pack_logs`, which is then read in
+                       place of the directory.
     profile_prefix   : string, optional
                        Prefix before profile number in profile file names,
                        default is 'profile'
@@ -602,6 +1244,11 @@ class MesaLogDir:
                        in again. Good for quick, clean, repeated access of a
                        profile, but bad for reading in many profiles for
                        one-time uses as it will hog memory.
+    lazy             : bool, optional
+                       If True, only check that the paths exist on
+                       instantiation, and put off reading the history, the
+                       profile index, and the list of profile files until
+                       each is first used. Default is False.
 
     Attributes
     -----------
@@ -624,6 +1271,9 @@ class MesaLogDir:
                        profiles from memory. It will simply start/stop memoizing
                        them. To clear out memoized profiles, re-read the data
                        with `self.read_logs()`
+    lazy             : bool
+                       Whether the history, profile index, and list of
+                       profile files are read only on first use.
     history_path     : string
                        Path to the history data file
     index_path       : string
@@ -644,6 +1294,19 @@ class MesaLogDir:
                        the model numbers of the simulations that have
                        corresponding profiles in ascending order.
 
+    archive          : MesaRunArchive
+                       The run archive being read, or None when reading a
+                       logs directory.
+    catalog          : MesaProfileCatalog
+                       Listing of the profile files actually present in
+                       `self.log_path`, with their sizes and mtimes.
+    missing_profiles : numpy_array
+                       Profile numbers listed in the index that have no
+                       profile file.
+    extra_profiles   : numpy_array
+                       Profile numbers with a profile file that are not
+                       listed in the index.
+
     profile_dict     : dictionary
                        Stores MesaData objects from profiles. Keys to this
                        dictionary are profile numbers, so presumably
@@ -653,21 +1316,42 @@ class MesaLogDir:
                        Will remain empty if memoization is shut off.
     """
 
+    # Used by the asynchronous methods; see `MesaLogDir.executor`
+    async_executor = None
+    max_workers = 4
+    max_concurrent_reads = 4
+
     def __init__(self, log_path='LOGS', profile_prefix='profile',
                  profile_suffix='data', history_file='history.data',
-                 index_file='profiles.index', memoize_profiles=True):
+                 index_file='profiles.index', memoize_profiles=True,
+                 lazy=False):
         self.log_path = log_path
         self.profile_prefix = profile_prefix
         self.profile_suffix = profile_suffix
         self.history_file = history_file
         self.index_file = index_file
+        self.lazy = lazy
 
-        self.history = None
-        self.history_data = None
-        self.profiles = None
-        self.profile_numbers = None
-        self.model_numbers = None
+        self.archive = None
         self.profile_dict = None
+        self._history = None
+        self._profiles = None
+        self._catalog = None
+        self._fingerprints = {}
+        self._subscribers = {'new_model': [], 'new_profile': []}
+        self._announced_profiles = None
+        self._load_lock = threading.RLock()
+        # for each event loop, its concurrency limit and the profile reads
+        # in progress, since asyncio primitives belong to a single loop
+        self._loop_states = weakref.WeakKeyDictionary()
+
+        # A single file is a run archive standing in for the logs directory
+        if os.path.isfile(self.log_path):
+            self.history_path = self.log_path
+            self.index_path = self.log_path
+            self.memoize_profiles = memoize_profiles
+            self.read_logs()
+            return
 
         # Check if log_path and files are dir/files.
         if not os.path.isdir(self.log_path):
@@ -690,23 +1374,271 @@ class MesaLogDir:
         """Read (or re-read) data from the history and profile index.
 
         Reads in `self.history_path` and `self.index_file` for use in getting
-        history data and profile information. This is automatically called at
-        instantiation, but can be recalled by the user if for some reason the
-        data needs to be refreshed (for instance, after changing some of the
-        reader methods to read in specially-formatted output.)
+        history data and profile information, and scans `self.log_path` for
+        the profile files that are actually present. This is automatically
+        called at instantiation, but can be recalled by the user if for some
+        reason the data needs to be refreshed (for instance, after changing
+        some of the reader methods to read in specially-formatted output.)
+        If `self.lazy` is True, this only discards what has been read so far;
+        each piece is then read again the first time it is used.
 
         Note
         ----
         This, if called after initialization, will empty `self.profile_dict`,
         erasing all memo-ized profiles.
         """
-
-        self.history = MesaData(self.history_path)
-        self.history_data = self.history
-        self.profiles = MesaProfileIndex(self.index_path)
-        self.profile_numbers = self.profiles.profile_numbers
-        self.model_numbers = self.profiles.model_numbers
+        if os.path.isfile(self.log_path):
+            from .archive import MesaRunArchive
+            self.archive = MesaRunArchive(self.log_path)
+            self.profile_prefix = self.archive.profile_prefix
+            self.profile_suffix = self.archive.profile_suffix
+        self._history = None
+        self._profiles = None
+        self._catalog = None
+        self._fingerprints = {}
+        self._announced_profiles = None
         self.profile_dict = dict()
+        if not self.lazy:
+            self._load_history()
+            self._load_index()
+            self._load_catalog()
+
+    def _ensure_loaded(self, attribute, loader):
+        """Call `loader` unless `attribute` is set, safely across threads."""
+        if getattr(self, attribute) is None:
+            with self._load_lock:
+                if getattr(self, attribute) is None:
+                    loader()
+
+    @property
+    def history(self):
+        self._ensure_loaded('_history', self._load_history)
+        return self._history
+
+    @property
+    def history_data(self):
+        return self.history
+
+    @property
+    def profiles(self):
+        self._ensure_loaded('_profiles', self._load_index)
+        return self._profiles
+
+    @property
+    def profile_numbers(self):
+        return self.profiles.profile_numbers
+
+    @property
+    def model_numbers(self):
+        return self.profiles.model_numbers
+
+    @property
+    def catalog(self):
+        self._ensure_loaded('_catalog', self._load_catalog)
+        return self._catalog
+
+    @property
+    def missing_profiles(self):
+        return self.catalog.missing_profiles(self.profile_numbers)
+
+    @property
+    def extra_profiles(self):
+        return self.catalog.extra_profiles(self.profile_numbers)
+
+    def _load_history(self):
+        """Read the history, noting the fingerprint it was read at."""
+        self._fingerprints['history'] = _fingerprint(self.history_path)
+        if self.archive is not None:
+            self._history = self.archive.history()
+        else:
+            self._history = MesaData(self.history_path)
+
+    def _load_index(self):
+        """Read the profile index, noting the fingerprint it was read at."""
+        self._fingerprints['index'] = _fingerprint(self.index_path)
+        if self.archive is not None:
+            self._profiles = self.archive.profile_index()
+        else:
+            self._profiles = MesaProfileIndex(self.index_path)
+
+    def _load_catalog(self):
+        """Scan for profile files, noting the fingerprint they were found at."""
+        self._fingerprints['log_path'] = _fingerprint(self.log_path)
+        if self.archive is not None:
+            self._catalog = self.archive.catalog()
+        else:
+            self._catalog = MesaProfileCatalog(self.log_path,
+                                               self.profile_prefix,
+                                               self.profile_suffix)
+
+    def summary(self):
+        """Summarize the run cheaply, without parsing the whole history.
+
+        Only the header lines and the last line of the history file and the
+        first line of the profile index are read, unless they have already
+        been read in full.
+
+        Returns
+        -------
+        dict
+            Dictionary with keys 'log_path', 'header' (dict of history header
+            data), 'last' (dict of history data in the last row, i.e. the
+            final model), and 'num_profiles' (number of profiles in the
+            index).
+        """
+        if self._history is not None:
+            history = self._history
+            header = dict(history.header_data)
+            last = ({name: history.bulk_data[name][-1] for name in
+                     history.bulk_names} if len(history.bulk_data) > 0 else
+                    {})
+        elif self.archive is not None:
+            header, last = self.archive.history_summary()
+        else:
+            header, last = MesaData.read_summary(self.history_path)
+        if self._profiles is not None:
+            num_profiles = len(self._profiles.profile_numbers)
+        elif self.archive is not None:
+            num_profiles = len(self.profiles.profile_numbers)
+        else:
+            with open(self.index_path) as f:
+                first_line = f.readline().split()
+            num_profiles = int(first_line[0]) if first_line else 0
+        return {'log_path': self.log_path, 'header': header, 'last': last,
+                'num_profiles': num_profiles}
+
+    def refresh(self):
+        """Re-read only what has changed in the logs directory since last read.
+
+        Compares cheap stat fingerprints of the history file, the profile
+        index, and the logs directory against those from the previous read.
+        New history rows are appended, the (small) profile index is re-read
+        if it changed, and only newly written profile files are stat-ed.
+        Anything not read yet (see `lazy`) is left to be read on first use.
+        Profiles are still only loaded on demand, and memoized profiles are
+        kept unless the index now assigns their profile number to a
+        different model. Callbacks registered with `subscribe` are then
+        called for each new model and each new profile.
+
+        Returns
+        -------
+        tuple of numpy_array
+            Model numbers of new history rows and profile numbers of new
+            profiles (present in both the index and on disk).
+        """
+        fingerprints = self._take_fingerprints()
+        new_models = np.zeros(0, dtype=int)
+        new_profiles = np.zeros(0, dtype=int)
+        if self.archive is not None:
+            # archives are written whole, so just re-open a replaced one
+            if any(fingerprints[key] != value for key, value in
+                   self._fingerprints.items()):
+                self.read_logs()
+            return new_models, new_profiles
+        if (self._history is not None and
+                fingerprints['history'] != self._fingerprints['history']):
+            self._fingerprints['history'] = fingerprints['history']
+            num_new = self._history.update_data()
+            if num_new > 0:
+                new_models = self._history.data('model_number')[-num_new:]
+        if (self._profiles is not None and
+                fingerprints['index'] != self._fingerprints['index']):
+            self._fingerprints['index'] = fingerprints['index']
+            old_models = dict(zip(self.profile_numbers.tolist(),
+                                  self.model_numbers.tolist()))
+            self._profiles.read_index()
+            for p_num in list(self.profile_dict):
+                if (old_models.get(p_num) !=
+                        self._profiles._model_of_profile.get(p_num)):
+                    del self.profile_dict[p_num]
+        if (self._catalog is not None and
+                fingerprints['log_path'] != self._fingerprints['log_path']):
+            self._fingerprints['log_path'] = fingerprints['log_path']
+            self._catalog.scan(restat_known=False)
+
+        if self._announced_profiles is not None:
+            available = self._available_profiles()
+            new_profiles = np.array([p_num for p_num in available.tolist() if
+                                     p_num not in self._announced_profiles],
+                                    dtype=int)
+            self._announced_profiles.update(new_profiles.tolist())
+        for m_num in new_models:
+            for callback in self._subscribers['new_model']:
+                callback(self, m_num)
+        for p_num in new_profiles:
+            for callback in self._subscribers['new_profile']:
+                callback(self, p_num)
+        return new_models, new_profiles
+
+    def subscribe(self, event, callback):
+        """Register a function to be called when `refresh` finds new output.
+
+        Subscribing reads whatever the event is detected from (the history
+        for 'new_model', the index and profile files for 'new_profile'), if
+        it has not been read yet, so that only later output counts as new.
+
+        Parameters
+        ----------
+        event    : string
+                   Either 'new_model', to be notified of each new history
+                   row, or 'new_profile', to be notified of each new profile
+        callback : function
+                   Called as `callback(log_dir, number)`, where `log_dir` is
+                   this MesaLogDir and `number` is the new model number (for
+                   'new_model') or profile number (for 'new_profile')
+
+        Raises
+        ------
+        ValueError
+            If `event` is not a valid event name
+        """
+        if event not in self._subscribers:
+            raise ValueError("'" + str(event) + "' is not a valid event. " +
+                             "Choose from " + str(list(self._subscribers)) +
+                             ".")
+        if event == 'new_model':
+            self.history
+        elif self._announced_profiles is None:
+            self._announced_profiles = set(
+                self._available_profiles().tolist())
+        self._subscribers[event].append(callback)
+
+    def unsubscribe(self, event, callback):
+        """Stop calling `callback` for `event`. See `subscribe`."""
+        if callback in self._subscribers.get(event, []):
+            self._subscribers[event].remove(callback)
+
+    def watch(self, interval=5.0, duration=None):
+        """Repeatedly `refresh` the logs directory, e.g. during a live run.
+
+        Blocks, calling `refresh` every `interval` seconds, until `duration`
+        seconds have passed (or forever if `duration` is None). Run it in a
+        separate thread to keep working while it polls. Use `subscribe` to
+        act on new models and profiles as they appear.
+
+        Parameters
+        ----------
+        interval : float, optional
+                   Seconds between refreshes, default is 5
+        duration : float, optional
+                   Seconds after which to stop watching, default is None,
+                   meaning never stop
+        """
+        start = time.monotonic()
+        while duration is None or time.monotonic() - start < duration:
+            self.refresh()
+            time.sleep(interval)
+
+    def _take_fingerprints(self):
+        """Stat the history file, index file, and logs directory."""
+        return {'history': _fingerprint(self.history_path),
+                'index': _fingerprint(self.index_path),
+                'log_path': _fingerprint(self.log_path)}
+
+    def _available_profiles(self):
+        """Profile numbers both listed in the index and present on disk."""
+        return np.intersect1d(self.profile_numbers,
+                              self.catalog.profile_numbers)
 
     def have_profile_with_model_number(self, m_num):
         """Checks to see if a model number has a corresponding profile number.
@@ -755,6 +1687,36 @@ class MesaLogDir:
         """
         return self.profiles.profile_with_model_number(m_num)
 
+    def profiles_with_model_numbers(self, m_nums):
+        """Converts an array of model numbers to profile numbers at once.
+
+        Parameters
+        ----------
+        m_nums : array_like of int
+                 model numbers to be converted
+
+        Returns
+        -------
+        numpy_array
+            profile numbers that correspond element-wise to `m_nums`.
+        """
+        return self.profiles.profiles_with_model_numbers(m_nums)
+
+    def models_with_profile_numbers(self, p_nums):
+        """Converts an array of profile numbers to model numbers at once.
+
+        Parameters
+        ----------
+        p_nums : array_like of int
+                 profile numbers to be converted
+
+        Returns
+        -------
+        numpy_array
+            model numbers that correspond element-wise to `p_nums`.
+        """
+        return self.profiles.models_with_profile_numbers(p_nums)
+
     def profile_data(self, model_number=-1, profile_number=-1):
         """Generate or retrieve MesaData from a model or profile number.
 
@@ -781,43 +1743,355 @@ class MesaLogDir:
         MesaData
                  Data for profile with desired model/profile number.
         """
+        to_use = self._profile_number(model_number, profile_number)
+        if to_use in self.profile_dict:
+            return self.profile_dict[to_use]
+        return self._read_profile(to_use)
+
+    def _profile_number(self, model_number=-1, profile_number=-1):
+        """Resolve the arguments of `profile_data` to a profile number."""
         if model_number == -1:
             if profile_number == -1:
-                to_use = self.profile_numbers[-1]
+                return self.profile_numbers[-1]
+            return profile_number
+        return self.profile_with_model_number(model_number)
+
+    def _read_profile(self, profile_number):
+        """Read a profile from disk (or archive), memoizing it if desired."""
+        p = self._load_profile(profile_number)
+        if self.memoize_profiles:
+            self.profile_dict[profile_number] = p
+        return p
+
+    def _load_profile(self, profile_number):
+        """Read a profile from disk (or archive)."""
+        if self.archive is not None:
+            return self.archive.profile(profile_number)
+        return MesaData(self.catalog.path(profile_number))
+
+    @classmethod
+    async def aopen(cls, *args, **kwargs):
+        """Make a MesaLogDir without blocking the running event loop.
+
+        Takes the same arguments as MesaLogDir, doing all reading in
+        `MesaLogDir.executor()`.
+
+        Returns
+        -------
+        MesaLogDir
+            The opened logs directory or archive
+
+        Examples
+        --------
+        >>> l = await MesaLogDir.aopen('LOGS', lazy=True)
+        >>> p = await l.aprofile_data(model_number=100)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            cls.executor(), functools.partial(cls, *args, **kwargs))
+
+    @classmethod
+    def executor(cls):
+        """Return the executor used by the asynchronous methods.
+
+        By default this is a thread pool shared by all MesaLogDir objects
+        with `MesaLogDir.max_workers` threads, created on first use. Assign
+        any `concurrent.futures.Executor` to `MesaLogDir.async_executor` to
+        use it instead.
+        """
+        with _executor_lock:
+            if cls.async_executor is None:
+                cls.async_executor = ThreadPoolExecutor(
+                    max_workers=cls.max_workers,
+                    thread_name_prefix='mesatools')
+            return cls.async_executor
+
+    def _loop_state(self):
+        """Concurrency limit and profile reads of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._load_lock:
+            if loop not in self._loop_states:
+                self._loop_states[loop] = (
+                    asyncio.Semaphore(self.max_concurrent_reads), {})
+            return self._loop_states[loop]
+
+    async def _run(self, func, *args):
+        """Run `func(*args)` in the executor, within the concurrency limit.
+
+        If cancelled once `func` has started, it can't be stopped, so its
+        place under the limit is only given up when it finishes.
+        """
+        limit = self._loop_state()[0]
+        await limit.acquire()
+        loop = asyncio.get_running_loop()
+        future = self.executor().submit(func, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            if future.done():
+                limit.release()
             else:
-                to_use = profile_number
-        else:
-            to_use = self.profile_with_model_number(model_number)
+                future.add_done_callback(
+                    lambda done: _call_soon(loop, limit.release))
+
+    async def ahistory(self):
+        """Asynchronous counterpart of `self.history`.
+
+        Returns
+        -------
+        MesaData
+            History data, read in the executor if not read already
+        """
+        if self._history is None:
+            await self._run(self._ensure_loaded, '_history',
+                            self._load_history)
+        return self._history
+
+    async def aprofile_data(self, model_number=-1, profile_number=-1):
+        """Asynchronous counterpart of `profile_data`.
+
+        Reading and parsing happen in the executor, with at most
+        `self.max_concurrent_reads` reads at a time. Concurrent requests for
+        the same profile share one read, and cancelling one request does
+        not cancel the read for the others. Once every request for a
+        profile is cancelled, so is its read: it never starts if it is
+        still waiting for the executor, and its result is not memoized if
+        it was already running.
+
+        Parameters
+        ----------
+        model_number   : int, optional
+                         model number for the profile MesaData object desired.
+                         Default is -1, corresponding to the last model number.
+        profile_number : int, optional
+                         profile number for the profile MesaData object desired.
+                         Default is -1, corresponding to the last model number.
+                         If both `model_number` and `profile_number` are given,
+                         `profile_number` is ignored.
 
+        Returns
+        -------
+        MesaData
+                 Data for profile with desired model/profile number.
+        """
+        if self._profiles is None:
+            await self._run(self._ensure_loaded, '_profiles',
+                            self._load_index)
+        to_use = self._profile_number(model_number, profile_number)
         if to_use in self.profile_dict:
             return self.profile_dict[to_use]
-
-        file_name = os.path.join(self.log_path,
-                                 (self.profile_prefix +
-                                  str(to_use) + '.' + self.profile_suffix))
-        p = MesaData(file_name)
+        # shared read and the number of requests waiting on it
+        pending = self._loop_state()[1]
+        entry = pending.get(to_use)
+        if entry is None:
+            task = asyncio.ensure_future(self._aread_profile(to_use))
+            entry = pending[to_use] = [task, 0]
+            task.add_done_callback(
+                functools.partial(_forget_read, pending, to_use))
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+
+    async def _aread_profile(self, profile_number):
+        """Read a profile in the executor, memoizing it unless cancelled."""
+        p = await self._run(self._load_profile, profile_number)
         if self.memoize_profiles:
-            self.profile_dict[to_use] = p
+            self.profile_dict[profile_number] = p
         return p
 
-    def select_models(self, f, *keys):
+    async def aiter_profiles(self, model_numbers=None, prefetch=None):
+        """Asynchronously iterate over profiles in order of model number.
+
+        Profiles are read ahead of the one being yielded, so reading overlaps
+        with whatever is done with each profile. Stopping the iteration
+        early, or cancelling it, cancels the reads made ahead (see
+        `aprofile_data`). After a `break`, this only happens once the
+        iterator is closed, so wrap it in `contextlib.aclosing` to cancel
+        them at once.
+
+        Parameters
+        ----------
+        model_numbers : array_like of int, optional
+                        Model numbers of the profiles to iterate over, default
+                        is `self.model_numbers`
+        prefetch      : int, optional
+                        Number of profiles to read ahead, default is
+                        `self.max_concurrent_reads`
+
+        Yields
+        ------
+        MesaData
+            Data for each profile, in the order of `model_numbers`
+
+        Examples
+        --------
+        >>> async for p in l.aiter_profiles():
+        >>>     print(p.header('model_number'))
+        """
+        if model_numbers is None:
+            if self._profiles is None:
+                await self._run(self._ensure_loaded, '_profiles',
+                                self._load_index)
+            model_numbers = self.model_numbers
+        if prefetch is None:
+            prefetch = self.max_concurrent_reads
+        model_numbers = list(model_numbers)
+        pending = collections.deque()
+        try:
+            for m_num in model_numbers:
+                pending.append(asyncio.ensure_future(
+                    self.aprofile_data(model_number=m_num)))
+                if len(pending) > prefetch:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+            # wait for the cancellations to reach the shared reads
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def profile_column(self, key, profile_numbers=None):
+        """Return one profile column from many profiles.
+
+        For a run archive, the column of all profiles is a single contiguous
+        read, and the returned arrays are memory-mapped views. For a logs
+        directory, each profile is read in turn (and memoized as usual).
+
+        Parameters
+        ----------
+        key             : string
+                          Name of a profile column
+        profile_numbers : array_like of int, optional
+                          Profiles to read, default is `self.profile_numbers`
+
+        Returns
+        -------
+        list of numpy_array
+            Values of `key`, one array per profile in `profile_numbers`
+        """
+        if profile_numbers is None:
+            profile_numbers = self.profile_numbers
+        if self.archive is not None:
+            return self.archive.profile_column(key, profile_numbers)
+        return [self.profile_data(profile_number=p_num).data(key) for p_num
+                in profile_numbers]
+
+    def track_at(self, coord='mass', values=(), keys=(), model_numbers=None,
+                 executor=None):
+        """Follow profile quantities at fixed interior coordinates over time.
+
+        For each profile, reads only the `coord` and `keys` columns and
+        interpolates all of them at every one of `values` in a single
+        vectorized step, so full profiles are never held in memory. Profiles
+        in a logs directory are read in parallel; those in a run archive are
+        taken from contiguous column reads.
+
+        Parameters
+        ----------
+        coord         : string, optional
+                        Profile column giving the interior coordinate, like
+                        'mass' (the default), 'q', or 'radius'. It must vary
+                        monotonically through each profile.
+        values        : array_like of float
+                        Values of `coord` at which to track the `keys`
+        keys          : list of string
+                        Profile columns to be tracked, like 'logT' or 'h1'.
+                        If empty, nothing is read.
+        model_numbers : array_like of int, optional
+                        Model numbers of the profiles to be used, default is
+                        `self.model_numbers`
+        executor      : concurrent.futures.Executor, optional
+                        Executor in which profiles are read and interpolated,
+                        default is `MesaLogDir.executor()`. A process pool
+                        avoids contention for the GIL while parsing.
+
+        Returns
+        -------
+        dict
+            'model_number' maps to the model numbers of the profiles used,
+            and each of `keys` maps to a (profiles, locations) array of its
+            values at each of `values`, with rows aligned with
+            'model_number'. Locations outside a profile are NaN.
+
+        Examples
+        --------
+        >>> l = MesaLogDir()
+        >>> t = l.track_at('mass', [0.1, 0.5], ['logT', 'logRho'])
+        >>> t['logT'][:, 0]   # log T at m = 0.1 Msun for every profile
+        """
+        locations = np.atleast_1d(np.asarray(values, dtype=float))
+        keys = list(keys)
+        if model_numbers is None:
+            model_numbers = self.model_numbers
+        model_numbers = np.asarray(model_numbers)
+        profile_numbers = self.profiles_with_model_numbers(model_numbers)
+        res = {'model_number': model_numbers}
+        if len(keys) == 0:
+            return res
+
+        if self.archive is not None:
+            coords = self.archive.profile_column(coord, profile_numbers)
+            columns = [self.archive.profile_column(key, profile_numbers) for
+                       key in keys]
+            tracks = [_interpolate_at(coords[i], np.column_stack(
+                [column[i] for column in columns]), locations) for i in
+                range(len(profile_numbers))]
+        else:
+            if executor is None:
+                executor = self.executor()
+            paths = [self.catalog.path(p_num) for p_num in profile_numbers]
+            tracks = list(executor.map(_track_profile, paths,
+                                       [coord] * len(paths),
+                                       [keys] * len(paths),
+                                       [locations] * len(paths)))
+
+        if len(tracks) > 0:
+            stacked = np.stack(tracks)
+        else:
+            stacked = np.zeros((0, len(locations), len(keys)))
+        for i, key in enumerate(keys):
+            res[key] = stacked[:, :, i]
+        return res
+
+    def select_models(self, f, *keys, vectorized=False):
         """Yields model numbers for profiles that satisfy a given criteria.
 
         Given a function `f` of various time-domain (history) variables,
         `*keys` (i.e., categories in `self.history.bulk_names`), filters
         `self.model_numbers` and returns all model numbers that satisfy the
-        criteria.
+        criteria. The history values for all profiles are gathered at once;
+        `f` is then called either once per model or, if `vectorized` is True,
+        a single time with whole arrays. `f` may also be a string expression
+        of history columns, which is always evaluated on whole arrays.
 
         Parameters
         ----------
-        f    : function
-               A function of the same number of parameters as strings given
-               for `keys` that returns a boolean. Should evaluate to `True`
-               when condition is met and `False` otherwise.
-        keys : strings
-               Name of data categories from `self.history.bulk_names` whose
-               values are to be used in the arguments to `f`, in the same order
-               that they appear as arguments in `f`.
+        f          : function or string
+                     A function of the same number of parameters as strings
+                     given for `keys` that returns a boolean. Should evaluate
+                     to `True` when condition is met and `False` otherwise.
+                     Alternatively, an expression like
+                     "star_age > 1e9 & log_L > 3" in terms of history columns,
+                     combining comparisons with `&` (and), `|` (or) and `~`
+                     (not).
+        keys       : strings
+                     Name of data categories from `self.history.bulk_names`
+                     whose values are to be used in the arguments to `f`, in
+                     the same order that they appear as arguments in `f`.
+                     Ignored if `f` is a string, whose column names are used
+                     instead.
+        vectorized : bool, optional
+                     If True, `f` is called once with numpy arrays of the
+                     values of each key, aligned with `self.model_numbers`,
+                     and must return a boolean array of the same length.
+                     Default is False.
 
         Returns
         -------
@@ -828,7 +2102,8 @@ class MesaLogDir:
         Raises
         ------
         KeyError
-            If any of the `keys` are invalid history keys.
+            If any of the `keys` (or names in an expression) are invalid
+            history keys.
 
         Examples
         --------
@@ -840,17 +2115,171 @@ class MesaLogDir:
         Here, `m_nums` will contain all model numbers that have profiles where
         the age is greater than a billion years and the luminosity is greater
         than 1000 Lsun, provided that 'star_age' and 'log_L' are in
-        `self.history.bulk_names`."""
+        `self.history.bulk_names`. The same selection can be made in one
+        vectorized pass with either of
+
+        >>> m_nums = l.select_models(lambda age, log_lum: (age > 1e9) &
+        >>>                          (log_lum > 3), 'star_age', 'log_L',
+        >>>                          vectorized=True)
+        >>> m_nums = l.select_models('star_age > 1e9 & log_L > 3')
+        """
+        if isinstance(f, str):
+            expression = _ColumnExpression(f)
+            columns = self._history_at_profiles(expression.names)
+            mask = expression.evaluate(dict(zip(expression.names, columns)))
+        else:
+            columns = self._history_at_profiles(keys)
+            if vectorized:
+                mask = f(*columns)
+            elif len(keys) == 0:
+                mask = [f() for m_num in self.model_numbers]
+            else:
+                mask = [f(*row) for row in zip(*columns)]
+        mask = np.broadcast_to(np.asarray(mask, dtype=bool),
+                               self.model_numbers.shape)
+        return self.model_numbers[mask]
 
+    def _history_at_profiles(self, keys):
+        """Gather history columns `keys` aligned with `self.model_numbers`."""
         for key in keys:
             if not self.history.in_data(key):
                 raise KeyError("'" + str(key) + "' is not a valid data type.")
-        inputs = {}
-        for m_num in self.model_numbers:
-            this_input = []
-            for key in keys:
-                this_input.append(
-                        self.history.data_at_model_number(key, m_num))
-            inputs[m_num] = this_input
-        mask = np.array([f(*inputs[m_num]) for m_num in self.model_numbers])
-        return self.model_numbers[mask]
+        if len(keys) == 0:
+            return []
+        indices = self.history.indices_of_model_numbers(self.model_numbers)
+        return [self.history.data(key)[indices] for key in keys]
+
+
+def _interpolate_at(coord, columns, locations):
+    """Linearly interpolate several columns at `locations` of `coord` at once.
+
+    `coord` may increase or decrease monotonically. Returns a (locations,
+    columns) array, with NaN for locations outside the range of `coord`.
+    """
+    if coord[0] > coord[-1]:
+        coord = coord[::-1]
+        columns = columns[::-1]
+    right = np.clip(np.searchsorted(coord, locations), 1, len(coord) - 1)
+    left = right - 1
+    span = coord[right] - coord[left]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(span != 0, (locations - coord[left]) / span, 0.0)
+    res = (columns[left] * (1 - weight)[:, None] +
+           columns[right] * weight[:, None])
+    outside = (locations < coord[0]) | (locations > coord[-1])
+    res[outside] = np.nan
+    return res
+
+
+def _track_profile(file_name, coord, keys, locations):
+    """Read `coord` and `keys` from a profile and interpolate at `locations`.
+
+    Module-level so that it can be sent to a process pool.
+    """
+    data = MesaData.read_columns(file_name, [coord] + list(keys))
+    columns = np.column_stack([data[key] for key in keys])
+    return _interpolate_at(data[coord], columns, locations)
+
+
+class _ColumnExpression:
+    """Safely parsed expression of data columns, evaluated on numpy arrays.
+
+    Expressions use python syntax for arithmetic and comparisons, with `&`,
+    `|`, and `~` standing in for element-wise and, or, and not. These are
+    given the same low precedence as python's `and`, `or`, and `not`, so
+    "star_age > 1e9 & log_L > 3" means what it looks like it means. Names
+    are data columns, except for a handful of numpy functions like `log10`
+    and `abs`.
+    """
+
+    bin_ops = {ast.Add: np.add, ast.Sub: np.subtract,
+               ast.Mult: np.multiply, ast.Div: np.true_divide,
+               ast.Pow: np.power, ast.Mod: np.mod}
+    unary_ops = {ast.USub: np.negative, ast.UAdd: np.positive,
+                 ast.Not: np.logical_not}
+    compare_ops = {ast.Gt: np.greater, ast.GtE: np.greater_equal,
+                   ast.Lt: np.less, ast.LtE: np.less_equal,
+                   ast.Eq: np.equal, ast.NotEq: np.not_equal}
+    functions = {'abs': np.abs, 'log10': np.log10, 'log': np.log,
+                 'exp': np.exp, 'sqrt': np.sqrt}
+
+    def __init__(self, expression):
+        self.expression = expression
+        translated = (expression.replace('&', ' and ')
+                      .replace('|', ' or ').replace('~', ' not '))
+        try:
+            self.tree = ast.parse(translated.strip(), mode='eval').body
+        except SyntaxError:
+            raise ValueError("Could not parse expression '" + expression +
+                             "'.")
+        self.names = []
+        self._check(self.tree)
+
+    def _check(self, node):
+        """Reject unsupported syntax and record column names in order."""
+        if isinstance(node, ast.Name):
+            if node.id not in self.names:
+                self.names.append(node.id)
+            return
+        if isinstance(node, ast.Call):
+            if (not isinstance(node.func, ast.Name) or node.keywords or
+                    node.func.id not in self.functions):
+                raise ValueError("Unsupported function call in expression '" +
+                                 self.expression + "'.")
+            for arg in node.args:
+                self._check(arg)
+            return
+        operators = (ast.operator, ast.unaryop, ast.cmpop)
+        if isinstance(node, operators):
+            if not (type(node) in self.bin_ops or
+                    type(node) in self.unary_ops or
+                    type(node) in self.compare_ops):
+                raise ValueError("Unsupported operator in expression '" +
+                                 self.expression + "'.")
+            return
+        allowed = (ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare,
+                   ast.Constant, ast.expr_context, ast.boolop)
+        if not isinstance(node, allowed):
+            raise ValueError("Unsupported syntax in expression '" +
+                             self.expression + "'.")
+        for child in ast.iter_child_nodes(node):
+            self._check(child)
+
+    def evaluate(self, columns):
+        """Evaluate the expression with names looked up in dict `columns`."""
+        return self._evaluate(self.tree, columns)
+
+    def _evaluate(self, node, columns):
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            return columns[node.id]
+        if isinstance(node, ast.Call):
+            return self.functions[node.func.id](
+                *[self._evaluate(arg, columns) for arg in node.args])
+        if isinstance(node, ast.BoolOp):
+            combine = (np.logical_and if isinstance(node.op, ast.And) else
+                       np.logical_or)
+            values = [self._evaluate(v, columns) for v in node.values]
+            res = values[0]
+            for value in values[1:]:
+                res = combine(res, value)
+            return res
+        if isinstance(node, ast.UnaryOp):
+            return self.unary_ops[type(node.op)](
+                self._evaluate(node.operand, columns))
+        if isinstance(node, ast.BinOp):
+            return self.bin_ops[type(node.op)](
+                self._evaluate(node.left, columns),
+                self._evaluate(node.right, columns))
+        if isinstance(node, ast.Compare):
+            left = self._evaluate(node.left, columns)
+            res = True
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._evaluate(comparator, columns)
+                res = np.logical_and(res, self.compare_ops[type(op)](left,
+                                                                     right))
+                left = right
+            return res
+        raise ValueError("Unsupported syntax in expression '" +
+                         self.expression + "'.")
@@ -0,0 +1,423 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import json
+import os
+import pickle
+import socket
+import threading
+import time
+import uuid
+
+from .grid import find_runs, _map_run
+from .reader import BadPathError
+
+
+class MesaWorkQueue:
+    """Work queue of run directories kept on a shared file system.
+
+    Lets any number of workers, on any number of hosts that share a file
+    system, process a grid of runs together without a message broker. The
+    queue is a directory holding the list of runs, one claim file per run
+    being worked on, and one result file per finished run:
+
+        queue_dir/tasks.json          run directories, written by `create`
+        queue_dir/claims/<key>        claim on a run, made with O_EXCL
+        queue_dir/results/<key>.pkl   pickled result of a finished run
+
+    A worker claims a run by creating its claim file exclusively, which
+    only one worker can do, and holds a lease on it by touching the file
+    regularly from a heartbeat thread. A claim whose file has not been
+    touched for `lease_timeout` seconds belongs to a crashed worker; it is
+    recovered by renaming it away (which only one worker can do), checking
+    that what was renamed is still expired, and claiming the run again.
+    Results are written to a temporary file and renamed into place, so they
+    are never seen half-written. Lease ages are measured against the file
+    system's own clock, so clock skew between hosts does not matter.
+
+    Parameters
+    ----------
+    queue_dir : string
+                Path to the queue directory, made by `create`
+
+    Attributes
+    ----------
+    queue_dir : string
+                Path to the queue directory
+    run_paths : list of string
+                Run directories in the queue
+    worker_id : string
+                Name of this worker in claim files, from the host name,
+                process id, and a random suffix
+
+    Examples
+    --------
+    On one node:
+
+    >>> MesaWorkQueue.create('/shared/queue', '/shared/grid')
+
+    Then on every node:
+
+    >>> q = MesaWorkQueue('/shared/queue')
+    >>> q.work(my_module.analyze, max_workers=16)
+
+    And once all are done:
+
+    >>> results = q.results()
+    """
+
+    def __init__(self, queue_dir):
+        self.queue_dir = queue_dir
+        tasks_file = os.path.join(queue_dir, 'tasks.json')
+        if not os.path.isfile(tasks_file):
+            raise BadPathError('No work queue found in ' + queue_dir + '.')
+        with open(tasks_file) as f:
+            self.run_paths = json.load(f)
+        self.worker_id = '{}-{}-{}'.format(socket.gethostname(), os.getpid(),
+                                           uuid.uuid4().hex[:8])
+        self._claims_dir = os.path.join(queue_dir, 'claims')
+        self._results_dir = os.path.join(queue_dir, 'results')
+        self._held = set()
+        self._held_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, queue_dir, runs='.', log_dir='LOGS',
+               history_file='history.data'):
+        """Make a new queue directory holding a list of runs.
+
+        Parameters
+        ----------
+        queue_dir    : string
+                       Path to the queue directory, created if needed. Any
+                       claims and results of an earlier queue there are kept.
+        runs         : string or list of string, optional
+                       Either the top of a tree of runs (see `find_runs`) or
+                       a list of run directories. Default is '.'.
+        log_dir      : string, optional
+                       Name of the logs directory in each run, default is
+                       'LOGS'
+        history_file : string, optional
+                       Name of the history file, default is 'history.data'
+
+        Returns
+        -------
+        MesaWorkQueue
+            The new queue
+        """
+        if isinstance(runs, str):
+            runs = find_runs(runs, log_dir, history_file)
+        run_paths = [os.path.abspath(path) for path in runs]
+        for name in ('claims', 'results', 'clock'):
+            os.makedirs(os.path.join(queue_dir, name), exist_ok=True)
+        _write_atomically(os.path.join(queue_dir, 'tasks.json'),
+                          json.dumps(run_paths).encode())
+        return cls(queue_dir)
+
+    def work(self, function, columns=None, log_dir='LOGS',
+             history_file='history.data', max_workers=None,
+             lease_timeout=600.0, heartbeat_interval=None, poll_interval=None,
+             wait_for_all=True):
+        """Claim and process runs until the queue is finished.
+
+        Claims at most as many runs as there are local worker processes, so
+        the rest stay free for other workers.
+
+        Parameters
+        ----------
+        function           : function
+                             Called as `function(data, run_path)` for each
+                             run, with `data` as for `map_reduce`. Its return
+                             value is the result of the run. Must be
+                             picklable, like a module-level function.
+        columns            : list of string, optional
+                             History columns to pass to `function` in place
+                             of a lazy MesaLogDir
+        log_dir            : string, optional
+                             Name of the logs directory in each run, default
+                             is 'LOGS'
+        history_file       : string, optional
+                             Name of the history file, default is
+                             'history.data'
+        max_workers        : int, optional
+                             Number of local worker processes, default is the
+                             number of CPUs
+        lease_timeout      : float, optional
+                             Seconds after the last heartbeat before a claim
+                             is taken to be abandoned, default is 600. Must be
+                             the same for all workers.
+        heartbeat_interval : float, optional
+                             Seconds between touches of held claims, default
+                             is a tenth of `lease_timeout`
+        poll_interval      : float, optional
+                             Seconds to wait before looking for claimable
+                             runs again when there are none, default is a
+                             twentieth of `lease_timeout`
+        wait_for_all       : bool, optional
+                             Whether to keep polling, to recover the claims
+                             of crashed workers, until every run has a
+                             result. If False, return as soon as nothing is
+                             left to claim. Default is True.
+
+        Returns
+        -------
+        int
+            Number of runs this worker finished
+
+        Raises
+        ------
+        BrokenProcessPool
+            If a local worker process dies abruptly. The claims on the runs
+            in progress are released, so they can be tried again.
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if heartbeat_interval is None:
+            heartbeat_interval = lease_timeout / 10
+        if poll_interval is None:
+            poll_interval = lease_timeout / 20
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat,
+                                     args=(stop, heartbeat_interval),
+                                     daemon=True)
+        heartbeat.start()
+        finished = 0
+        pending = {}
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                while True:
+                    if len(pending) < max_workers:
+                        claimed = self._claim(max_workers - len(pending),
+                                              lease_timeout)
+                        for i, path in enumerate(claimed):
+                            try:
+                                pending[executor.submit(
+                                    _map_run, function, path, columns,
+                                    log_dir, history_file)] = path
+                            except BaseException:
+                                # e.g. the pool broke since the last wait
+                                for unsubmitted in claimed[i:]:
+                                    self._release(unsubmitted)
+                                raise
+                    if pending:
+                        done, _ = wait(pending, timeout=poll_interval,
+                                       return_when=FIRST_COMPLETED)
+                        for future in done:
+                            path = pending.pop(future)
+                            try:
+                                result = ('ok', future.result())
+                            except BrokenProcessPool:
+                                # says nothing about the run itself, so
+                                # leave it to be released for a retry
+                                pending[future] = path
+                                raise
+                            except Exception as e:
+                                result = ('error', '{}: {}'.format(
+                                    type(e).__name__, e))
+                            self._finish(path, result)
+                            finished += 1
+                        continue
+                    if self.is_finished() or not wait_for_all:
+                        break
+                    time.sleep(poll_interval)
+        finally:
+            stop.set()
+            heartbeat.join()
+            for path in pending.values():
+                self._release(path)
+        return finished
+
+    def status(self):
+        """Count the runs that are finished, claimed, and unclaimed.
+
+        Returns
+        -------
+        dict
+            Numbers of 'finished', 'claimed', and 'unclaimed' runs
+        """
+        results = set(os.listdir(self._results_dir))
+        claims = set(os.listdir(self._claims_dir))
+        res = {'finished': 0, 'claimed': 0, 'unclaimed': 0}
+        for path in self.run_paths:
+            key = _key(path)
+            if key + '.pkl' in results:
+                res['finished'] += 1
+            elif key in claims:
+                res['claimed'] += 1
+            else:
+                res['unclaimed'] += 1
+        return res
+
+    def is_finished(self):
+        """Determine if every run in the queue has a result."""
+        return self.status()['finished'] == len(self.run_paths)
+
+    def results(self):
+        """Gather the results of all finished runs that succeeded.
+
+        Returns
+        -------
+        dict
+            Maps run directories to the return values of the work function
+        """
+        return {path: value for path, (state, value) in
+                self._read_results().items() if state == 'ok'}
+
+    def failures(self):
+        """Gather the errors of all finished runs that failed.
+
+        Returns
+        -------
+        dict
+            Maps run directories to the error message
+        """
+        return {path: value for path, (state, value) in
+                self._read_results().items() if state == 'error'}
+
+    def _read_results(self):
+        res = {}
+        for path in self.run_paths:
+            result_file = self._result_file(path)
+            if os.path.exists(result_file):
+                with open(result_file, 'rb') as f:
+                    res[path] = pickle.load(f)
+        return res
+
+    def _claim(self, count, lease_timeout):
+        """Claim up to `count` runs, recovering expired claims on the way."""
+        claimed = []
+        results = set(os.listdir(self._results_dir))
+        now = None
+        for path in self.run_paths:
+            if len(claimed) >= count:
+                break
+            key = _key(path)
+            if key + '.pkl' in results:
+                continue
+            claim_file = os.path.join(self._claims_dir, key)
+            if os.path.exists(claim_file):
+                if now is None:
+                    now = self._fs_now()
+                if not self._recover(claim_file, now, lease_timeout):
+                    continue
+            if self._try_claim(claim_file, path):
+                # the run may have been finished since results were listed
+                if os.path.exists(self._result_file(path)):
+                    self._release(path)
+                else:
+                    claimed.append(path)
+        return claimed
+
+    def _try_claim(self, claim_file, path):
+        try:
+            fd = os.open(claim_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'worker': self.worker_id, 'run': path,
+                       'time': time.time()}, f)
+        with self._held_lock:
+            self._held.add(path)
+        return True
+
+    def _recover(self, claim_file, now, lease_timeout):
+        """Remove `claim_file` if its lease has expired.
+
+        Returns True if the claim is gone, by this or any other worker.
+        """
+        stale_file = '{}.stale.{}'.format(claim_file, self.worker_id)
+        try:
+            if now - os.stat(claim_file).st_mtime <= lease_timeout:
+                return False
+            os.rename(claim_file, stale_file)
+            # another worker may have recovered the claim and made a fresh
+            # one between the stat and the rename; if so, put it back
+            fresh = now - os.stat(stale_file).st_mtime <= lease_timeout
+        except FileNotFoundError:
+            return True
+        if fresh:
+            try:
+                # linking back never clobbers a claim made in the meantime
+                os.link(stale_file, claim_file)
+            except FileExistsError:
+                pass
+            except OSError:
+                # file systems without hard links
+                os.rename(stale_file, claim_file)
+                return False
+            os.remove(stale_file)
+            return False
+        os.remove(stale_file)
+        return True
+
+    def _finish(self, path, result):
+        _write_atomically(self._result_file(path), pickle.dumps(
+            result, protocol=pickle.HIGHEST_PROTOCOL))
+        self._release(path)
+
+    def _release(self, path):
+        """Drop this worker's claim on `path`, if it still holds it."""
+        with self._held_lock:
+            self._held.discard(path)
+        claim_file = os.path.join(self._claims_dir, _key(path))
+        if _owner(claim_file) == self.worker_id:
+            try:
+                os.remove(claim_file)
+            except FileNotFoundError:
+                pass
+
+    def _heartbeat(self, stop, interval):
+        """Touch every held claim every `interval` seconds until `stop`."""
+        while not stop.wait(interval):
+            with self._held_lock:
+                held = list(self._held)
+            for path in held:
+                claim_file = os.path.join(self._claims_dir, _key(path))
+                # a claim that was recovered and re-made by another worker
+                # is no longer ours to extend. An unreadable claim may be
+                # mid-recovery or a passing read error, so keep trying it.
+                owner = _owner(claim_file)
+                if owner is not None and owner != self.worker_id:
+                    with self._held_lock:
+                        self._held.discard(path)
+                    continue
+                try:
+                    os.utime(claim_file)
+                except FileNotFoundError:
+                    pass
+
+    def _fs_now(self):
+        """Current time according to the shared file system's clock."""
+        clock_file = os.path.join(self.queue_dir, 'clock', self.worker_id)
+        with open(clock_file, 'w'):
+            pass
+        now = os.stat(clock_file).st_mtime
+        os.remove(clock_file)
+        return now
+
+    def _result_file(self, path):
+        return os.path.join(self._results_dir, _key(path) + '.pkl')
+
+
+def _key(path):
+    """File name for a run directory in the queue."""
+    return hashlib.sha1(path.encode()).hexdigest()
+
+
+def _owner(claim_file):
+    """Worker id recorded in `claim_file`, or None if it can't be read."""
+    try:
+        with open(claim_file) as f:
+            return json.load(f)['worker']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_atomically(file_name, contents):
+    """Write `contents` to a temporary file, then rename it into place."""
+    temp_name = '{}.{}.{}.tmp'.format(file_name, socket.gethostname(),
+                                      os.getpid())
+    with open(temp_name, 'wb') as f:
+        f.write(contents)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_name, file_name)
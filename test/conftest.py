@@ -0,0 +1,216 @@
+import os
+
+import pytest
+
+history_columns = ['model_number', 'star_age', 'log_L', 'center_h1']
+profile_columns = ['zone', 'mass', 'logT']
+
+
+def _table_header(header, names):
+    """Header lines of a MESA output file, up to the column names."""
+    lines = [''.join('{:>28d}'.format(i + 1) for i in range(len(header))),
+             ''.join('{:>28}'.format(name) for name in header),
+             ''.join('{:>28}'.format(repr(value)) for value in
+                     header.values()),
+             '',
+             ''.join('{:>28d}'.format(i + 1) for i in range(len(names))),
+             ''.join('{:>28}'.format(name) for name in names)]
+    return '\n'.join(lines) + '\n'
+
+
+def history_row(model_number):
+    """One line of a history file, with values that follow the model."""
+    return '{:>28d}{:>28.16e}{:>28.16e}{:>28.16e}\n'.format(
+        model_number, model_number * 1e7, 1 + model_number / 100,
+        max(0.7 - model_number / 1000, 0))
+
+
+def write_history(log_dir, model_numbers):
+    """Write a history file holding a row for each of `model_numbers`."""
+    with open(os.path.join(log_dir, 'history.data'), 'w') as f:
+        f.write(_table_header({'version_number': 10398, 'initial_mass': 1.0,
+                               'initial_z': 0.02}, history_columns))
+        for model_number in model_numbers:
+            f.write(history_row(model_number))
+
+
+def append_history(log_dir, model_numbers, partial=False):
+    """Append rows to a history file, the last one only half written if
+    `partial`."""
+    text = ''.join(history_row(model_number) for model_number in
+                   model_numbers)
+    if partial:
+        text = text[:-40]
+    with open(os.path.join(log_dir, 'history.data'), 'a') as f:
+        f.write(text)
+
+
+def write_profile(log_dir, profile_number, model_number, zones=20):
+    """Write profile file `profile_number` of model `model_number`."""
+    file_name = os.path.join(log_dir,
+                             'profile{}.data'.format(profile_number))
+    with open(file_name, 'w') as f:
+        f.write(_table_header({'model_number': model_number,
+                               'num_zones': zones}, profile_columns))
+        for zone in range(zones):
+            q = 1 - zone / (zones - 1)
+            f.write('{:>28d}{:>28.16e}{:>28.16e}\n'.format(
+                zone + 1, q, 7 - q + model_number / 1000))
+
+
+def write_index(log_dir, model_numbers):
+    """Write a profile index listing profiles 1, 2, ... of `model_numbers`."""
+    with open(os.path.join(log_dir, 'profiles.index'), 'w') as f:
+        if len(model_numbers) == 0:
+            return
+        f.write('{} models.    lines hold model number, priority, and log '
+                'file number.\n'.format(len(model_numbers)))
+        for i, model_number in enumerate(model_numbers):
+            f.write('{:>10d}{:>10d}{:>10d}\n'.format(model_number, 1, i + 1))
+
+
+def write_logs(log_dir, num_models=50, every=10):
+    """Write a complete logs directory with a profile every `every` models.
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    write_history(log_dir, range(1, num_models + 1))
+    profile_models = list(range(every, num_models + 1, every))
+    write_index(log_dir, profile_models)
+    for i, model_number in enumerate(profile_models):
+        write_profile(log_dir, i + 1, model_number)
+    return log_dir
+
+
+@pytest.fixture
+def logs(tmp_path):
+    """Path of a complete logs directory of 50 models and 5 profiles."""
+    return write_logs(str(tmp_path / 'LOGS'))
+
+
+# Definition and defaults files of a small MESA installation, with the
+# cases the language parser has to get right: shared and missing docs,
+# arrays, continued declarations, trailing comments, mixed case, and items
+# only found in one of the files
+mesa_sources = {
+    'star/private/star_job_controls.inc': """\
+      logical :: pgstar_flag
+      integer :: num_steps ! comment
+      real(dp), dimension(10) :: extra_values
+      character (len=strlen) :: save_model_filename
+      real(dp) :: grid_values(5,2), &
+         Mixed_Case
+      integer :: undocumented_item
+""",
+    'star/defaults/star_job.defaults': """\
+! star_job defaults
+
+      ! ### pgstar_flag
+
+      ! Whether to show plots.
+      ! # not part of the doc
+      !   pgstar_flag = .true.
+
+      pgstar_flag = .false.
+
+      ! ### num_steps
+      ! ### save_model_filename
+
+      ! Shared by two items.
+      !
+      ! 1.5 values
+
+      num_steps = 10
+      save_model_filename = 'final.mod' ! trailing comment
+
+      ! ### extra_values
+
+      extra_values(:) = 1d-4
+
+      ! ### grid_values(1)
+         ! more
+      grid_values(1,2) = 2.5
+      mixed_case = 3d0
+      undocumented_item = 7
+      only_in_defaults = 1
+
+      ! ### dangling_at_end
+      ! never ends
+""",
+    'star/private/star_controls.inc': """\
+      real(dp) :: initial_mass, initial_z
+      real(dp), dimension(100) :: x_ctrl
+      character (len=32) :: Zbase_Name
+""",
+    'star/private/ctrls_io.f90': """\
+      namelist /controls/ &
+         initial_mass, initial_z
+      real(dp) :: extra_io_item
+      contains
+      real :: after_contains
+""",
+    'star/defaults/controls.defaults': """\
+      ! ### initial_mass
+
+      ! Mass in Msun.
+
+      initial_mass = 1
+      initial_z = 0.02d0
+
+      ! ### x_ctrl
+
+      ! For your own use.
+
+      x_ctrl(1:100) = 0d0
+      zbase_name = ''
+      extra_io_item = 0.5
+""",
+    'star/private/pgstar_controls.inc': """\
+      logical :: pause
+      integer :: Grid1_win_flag
+""",
+    'star/defaults/pgstar.defaults': """\
+      ! ### pause
+
+      ! Wait for input.
+
+      pause = .false.
+      grid1_win_flag = 0
+""",
+    'star/defaults/history_columns.list': """\
+! history columns, which can be turned on by removing the ! before them
+
+      !# general
+      model_number ! alias: model
+      star_age ! aliases: age, time
+      !log_L
+      num_zones
+
+      !# abundances
+      !total_mass h1 ! mass of h1 in Msun
+      star_age ! listed again
+""",
+    'star/defaults/profile_columns.list': """\
+      zone
+      logT ! aliases: log_T, temperature
+      !logRho
+""",
+}
+
+
+def write_mesa(mesa_dir, version='10398', changes=None):
+    """Write a small MESA installation, with `changes` mapping some of the
+    files in `mesa_sources` to other contents."""
+    sources = dict(mesa_sources, **(changes or {}))
+    sources['data/version_number'] = version + '\n'
+    for name, text in sources.items():
+        file_name = os.path.join(mesa_dir, name)
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, 'w') as f:
+            f.write(text)
+    return mesa_dir
+
+
+@pytest.fixture
+def mesa_dir(tmp_path):
+    """Path of a small MESA installation."""
+    return write_mesa(str(tmp_path / 'mesa'))
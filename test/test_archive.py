@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pytest
+
+from mesatools import archive
+from mesatools.archive import MesaRunArchive, is_archive, pack_logs
+from mesatools.reader import MesaLogDir
+
+from conftest import write_profile
+
+
+def test_archive_reads_like_the_logs_directory(logs, tmp_path):
+    # profiles of different lengths share the packed columns
+    write_profile(logs, 3, 30, zones=7)
+    archive_path = str(tmp_path / 'run.mesa')
+    pack_logs(logs, archive_path)
+    assert is_archive(archive_path)
+    assert not is_archive(os.path.join(logs, 'history.data'))
+    packed, unpacked = MesaLogDir(archive_path), MesaLogDir(logs)
+    assert packed.archive is not None
+    assert packed.model_numbers.tolist() == unpacked.model_numbers.tolist()
+    for name in unpacked.history.bulk_names:
+        assert np.array_equal(packed.history.data(name),
+                              unpacked.history.data(name))
+    for m_num in unpacked.model_numbers:
+        p, q = (l.profile_data(model_number=m_num) for l in
+                (packed, unpacked))
+        assert p.header('model_number') == q.header('model_number')
+        assert np.array_equal(p.data('logT'), q.data('logT'))
+    assert [len(column) for column in packed.profile_column('zone')] == [
+        20, 20, 7, 20, 20]
+    assert packed.summary()['last'] == unpacked.summary()['last']
+    packed.archive.close()
+
+
+def test_closed_archive_refuses_reads(logs, tmp_path):
+    archive_path = str(tmp_path / 'run.mesa')
+    pack_logs(logs, archive_path)
+    run = MesaRunArchive(archive_path)
+    run.close()
+    with pytest.raises(ValueError):
+        run.history()
+
+
+def test_failed_pack_leaves_no_file(logs, tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('interrupted')
+
+    monkeypatch.setattr(archive.os, 'replace', fail)
+    with pytest.raises(RuntimeError):
+        pack_logs(logs, str(tmp_path / 'run.mesa'))
+    assert sorted(os.listdir(str(tmp_path))) == ['LOGS']
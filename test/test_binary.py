@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+
+from mesatools.binary import MesaBinaryRun
+from mesatools.reader import BadPathError
+
+from conftest import _table_header, write_logs
+
+
+def write_binary_run(run_path, star_2=True):
+    """Write a binary run of 20 models every 3 models, star 1 with 50
+    models and star 2, unless it is a point mass, with 30."""
+    write_logs(os.path.join(run_path, 'LOGS1'))
+    if star_2:
+        write_logs(os.path.join(run_path, 'LOGS2'), num_models=30)
+    with open(os.path.join(run_path, 'binary_history.data'), 'w') as f:
+        f.write(_table_header({'version_number': 10398},
+                              ['model_number', 'age', 'period_days']))
+        for model_number in range(3, 61, 3):
+            # ages a little off the stars', to be matched to the nearest
+            f.write('{:>28d}{:>28.16e}{:>28.16e}\n'.format(
+                model_number, model_number * 1e7 + 1e6, 10 - model_number /
+                10))
+    return run_path
+
+
+def test_binary_run(tmp_path):
+    b = MesaBinaryRun(write_binary_run(str(tmp_path)), lazy=True)
+    assert b.star_1.history.model_number[-1] == 50
+    assert b.star_2.history.model_number[-1] == 30
+    assert b.model_number.tolist() == list(range(3, 61, 3))
+    star_2_ages = b.data('star_age', star=2)
+    assert np.allclose(star_2_ages[:10], np.arange(3, 31, 3) * 1e7)
+    assert np.isnan(star_2_ages[10:]).all()
+    # by age, every binary row is matched to the nearest model
+    assert b.data('model_number', star=2, on='age')[-1] == 30
+    t = b.table(['period_days'], ['log_L'], ['log_L'])
+    assert sorted(t) == ['model_number', 'period_days', 'star_1_log_L',
+                         'star_2_log_L']
+    assert np.allclose(t['star_1_log_L'][:16], 1 + t['model_number'][:16] /
+                       100)
+    with pytest.raises(ValueError):
+        b.alignment(1, on='radius')
+
+
+def test_binary_run_with_a_point_mass(tmp_path):
+    b = MesaBinaryRun(write_binary_run(str(tmp_path), star_2=False))
+    assert b.star_2 is None
+    with pytest.raises(BadPathError):
+        b.data('star_age', star=2)
+    with pytest.raises(BadPathError):
+        MesaBinaryRun(str(tmp_path / 'LOGS1'))
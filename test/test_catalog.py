@@ -0,0 +1,143 @@
+import os
+import time
+
+import pytest
+
+from mesatools.catalog import (MesaHistoryDatabase, MesaRunCatalog,
+                               read_inlist)
+from mesatools.database import InlistDbHandler, MesaDatabase, make_database
+
+from conftest import write_logs
+
+inlist = """\
+&star_job
+  pgstar_flag = .true.
+/ ! end of star_job namelist
+
+&controls
+  initial_mass = {}
+  initial_z = 0.02
+  x_ctrl(1) = 0.5
+  read_extra_controls_inlist1 = .true.
+  extra_controls_inlist1_name = 'inlist_extra'
+/ ! end of controls namelist
+"""
+
+
+def write_run(run_path, initial_mass, num_models=50):
+    write_logs(os.path.join(run_path, 'LOGS'), num_models=num_models)
+    with open(os.path.join(run_path, 'inlist'), 'w') as f:
+        f.write(inlist.format(initial_mass))
+    with open(os.path.join(run_path, 'inlist_extra'), 'w') as f:
+        f.write('&controls\n  initial_z = 0.014\n/\n')
+
+
+@pytest.fixture
+def grid(tmp_path):
+    root = str(tmp_path / 'grid')
+    for i, mass in enumerate((1, 2, 3)):
+        write_run(os.path.join(root, 'run{}'.format(i)), mass,
+                  num_models=10 * (i + 1))
+    return root
+
+
+def test_extra_inlists_override(grid):
+    files = []
+    values = read_inlist(os.path.join(grid, 'run0', 'inlist'), files=files)
+    assert values['controls']['initial_z'] == '0.014'
+    assert values['controls']['x_ctrl(1)'] == '0.5'
+    assert [os.path.basename(f) for f in files] == ['inlist', 'inlist_extra']
+
+
+def test_catalog(grid, tmp_path):
+    cat = MesaRunCatalog(str(tmp_path / 'runs.db'))
+    updated, removed = cat.scan(grid, columns=['star_age'],
+                                events={'h_drop': 'center_h1 < 0.6755'},
+                                index_columns=['initial_mass'],
+                                max_workers=2)
+    assert len(updated) == 3 and removed == []
+    assert cat.columns()['initial_z'] == 'controls'
+    assert cat.columns()['final_star_age'] == 'final'
+    assert cat.select(columns=['initial_mass', 'initial_z', 'x_ctrl_1',
+                               'pgstar_flag', 'final_star_age',
+                               'h_drop_model_number']) == [
+        (1, 0.014, 0.5, 1, 1e8, None), (2, 0.014, 0.5, 1, 2e8, None),
+        (3, 0.014, 0.5, 1, 3e8, 25)]
+    assert cat.paths('initial_mass > ?', (1,)) == updated[1:]
+    assert 'runs_initial_mass' in [row[0] for row in cat._conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='index'")]
+    cat.close()
+
+
+def test_scans_are_incremental(grid, tmp_path):
+    cat = MesaRunCatalog(str(tmp_path / 'runs.db'))
+    cat.scan(grid, max_workers=2)
+    assert cat.scan(grid, max_workers=2) == ([], [])
+    # a changed extra inlist rescans its run
+    extra = os.path.join(grid, 'run1', 'inlist_extra')
+    with open(extra, 'w') as f:
+        f.write('&controls\n  initial_z = 0.03\n/\n')
+    os.utime(extra, ns=(time.time_ns() + 10 ** 9,) * 2)
+    assert cat.scan(grid, max_workers=2) == (
+        [os.path.join(grid, 'run1')], [])
+    assert cat.select('initial_z > 0.02') == [(os.path.join(grid, 'run1'),)]
+    os.rename(os.path.join(grid, 'run2'), str(tmp_path / 'moved'))
+    assert cat.scan(grid, max_workers=2) == (
+        [], [os.path.join(grid, 'run2')])
+    cat.close()
+
+
+def test_inlist_database_types_values(grid, tmp_path, mesa_dir):
+    db_file = str(tmp_path / 'mesa.db')
+    make_database(db_file, mesa_dir)
+    with MesaDatabase(db_file) as db:
+        typed = MesaRunCatalog(str(tmp_path / 'typed.db'),
+                               InlistDbHandler(db))
+        typed.scan(grid, max_workers=2)
+        # initial_mass is a real, even if written as an integer
+        values = typed.select(columns=['initial_mass'])
+        typed.close()
+    assert [type(row[0]) for row in values] == [float] * 3
+    guessed = MesaRunCatalog(str(tmp_path / 'guessed.db'))
+    guessed.scan(grid, max_workers=2)
+    assert [type(row[0]) for row in guessed.select(
+        columns=['initial_mass'])] == [int] * 3
+    guessed.close()
+
+
+def test_history_database(grid, tmp_path):
+    hdb = MesaHistoryDatabase(str(tmp_path / 'histories.db'))
+    loaded, removed = hdb.load(grid, columns=['star_age', 'log_L'],
+                               index_columns=['star_age'], max_workers=2)
+    assert len(loaded) == 3 and removed == []
+    assert hdb.query('SELECT path, COUNT(*), MAX(star_age) FROM history '
+                     'JOIN history_runs USING (run_id) GROUP BY path '
+                     'ORDER BY path') == [
+        (path, 10 * (i + 1), 1e8 * (i + 1)) for i, path in
+        enumerate(loaded)]
+    # log_L is 1 + model_number / 100, so only run2 gets past 1.25
+    assert hdb.query('SELECT COUNT(*) FROM history WHERE log_L > 1.25') == [
+        (5,)]
+    indexes = hdb._index_names()
+    assert 'history_star_age' in indexes
+    assert 'history_run_model' in indexes
+    # pragmas relaxed for loading are restored
+    assert hdb.query('PRAGMA synchronous') == [(2,)]
+    assert hdb.load(grid, columns=['star_age', 'log_L'],
+                    max_workers=2) == ([], [])
+    hdb.close()
+
+
+def test_history_database_reloads_changed_runs(grid, tmp_path):
+    hdb = MesaHistoryDatabase(str(tmp_path / 'histories.db'))
+    hdb.load(grid, max_workers=2)
+    run_path = os.path.join(grid, 'run0')
+    write_logs(os.path.join(run_path, 'LOGS'), num_models=15)
+    os.rename(os.path.join(grid, 'run2'), str(tmp_path / 'moved'))
+    assert hdb.load(grid, max_workers=2) == (
+        [run_path], [os.path.join(grid, 'run2')])
+    assert hdb.query('SELECT COUNT(*) FROM history WHERE run_id=?',
+                     (hdb.run_id(run_path),)) == [(15,)]
+    assert hdb.query('SELECT COUNT(*) FROM history') == [(15 + 20,)]
+    assert hdb.run_id(os.path.join(grid, 'run2')) is None
+    hdb.close()
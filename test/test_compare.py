@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+from mesatools.compare import MesaComparison, compare_many, compare_profiles
+from mesatools.reader import HistoryError, MesaData, MesaLogDir
+
+from conftest import write_logs
+
+
+def changed(data, rows, key, factor):
+    """Copy of MesaData `data` with `key` scaled by `factor` in `rows`."""
+    bulk_data = data.bulk_data.copy()
+    bulk_data[key][rows] *= factor
+    return MesaData.from_data(bulk_data, data.header_data, data.file_name)
+
+
+def test_comparison_on_model_number(logs):
+    reference = MesaData(os.path.join(logs, 'history.data'))
+    candidate = changed(reference, slice(30, None), 'log_L', 1.01)
+    c = MesaComparison(candidate, reference)
+    assert c.keys == ['star_age', 'log_L', 'center_h1']
+    assert not c.passed
+    assert c.failed_keys == ['log_L']
+    assert c.first_exceeded == {'star_age': None, 'log_L': 31,
+                                'center_h1': None}
+    assert c.max_diff['log_L'] == pytest.approx(0.01 / 1.01)
+    assert c.max_diff['star_age'] == 0
+    assert 'log_L' in c.report()
+    assert MesaComparison(reference, reference).passed
+
+
+def test_comparison_interpolates_on_other_columns(logs, tmp_path):
+    short = write_logs(str(tmp_path / 'short'), num_models=40)
+    c = MesaComparison(MesaLogDir(short), MesaLogDir(logs), on='star_age',
+                       keys=['log_L'])
+    # reference models past the end of the candidate are left out
+    assert c.coordinate.tolist() == [m * 1e7 for m in range(1, 41)]
+    assert c.passed
+    reference = MesaData(os.path.join(logs, 'history.data'))
+    with pytest.raises(HistoryError):
+        MesaComparison(reference, changed(reference, [3], 'star_age', 0),
+                       on='star_age')
+
+
+def test_compare_profiles_and_many(logs, tmp_path):
+    other = write_logs(str(tmp_path / 'other'), num_models=30)
+    comparisons = compare_profiles(MesaLogDir(other), MesaLogDir(logs))
+    assert list(comparisons) == [10, 20, 30]
+    assert all(c.passed for c in comparisons.values())
+    pairs = [(os.path.join(other, 'history.data'),
+              os.path.join(logs, 'history.data'))] * 2
+    assert [len(c.coordinate) for c in compare_many(pairs,
+                                                    max_workers=2)] == [30] * 2
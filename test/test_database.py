@@ -0,0 +1,401 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from mesatools import database
+from mesatools.database import (ColumnDbHandler, InlistDbHandler,
+                                InvalidItemError, LanguageSnapshot,
+                                MesaDatabase, TrigramIndex,
+                                generate_language_data, get_doc_text,
+                                make_database, read_column_list,
+                                read_defaults, snapshot_path)
+
+from conftest import mesa_sources, write_mesa
+
+# rows of the small installation as found by the parser before the
+# definition and defaults files were read in one pass each
+star_job_doc = ('! ### num_steps\n  \n  ! Shared by two items.\n'
+                '  ! 1.5 values')
+language_rows = [
+    ('pgstar_flag', 'pgstar_flag', 'bool', 'False', 0, 0, 'star_job',
+     '! ### pgstar_flag\n  \n  ! Whether to show plots.\n'
+     '  !   pgstar_flag = .true.'),
+    ('num_steps', 'num_steps', 'int', '10', 0, 1, 'star_job', star_job_doc),
+    ('extra_values', 'extra_values', 'float', '0.0001', 0, 3, 'star_job',
+     '! ### extra_values'),
+    ('save_model_filename', 'save_model_filename', 'str', "'final.mod'", 0,
+     2, 'star_job', star_job_doc.replace('num_steps', 'save_model_filename')),
+    ('grid_values', 'grid_values', 'float', '2.5', 0, 4, 'star_job',
+     '! ### grid_values(1)\n  ! more'),
+    ('Mixed_Case', 'mixed_case', 'float', '3.0', 0, 5, 'star_job',
+     'Could not get documentation for item mixed_case.'),
+    ('undocumented_item', 'undocumented_item', 'int', '7', 0, 6, 'star_job',
+     'Could not get documentation for item undocumented_item.'),
+    ('only_in_defaults', 'only_in_defaults', 'int', '1', 0, 7, 'star_job',
+     'Could not get documentation for item only_in_defaults.'),
+    ('initial_mass', 'initial_mass', 'float', '1', 0, 0, 'controls',
+     '! ### initial_mass\n  \n  ! Mass in Msun.'),
+    ('initial_z', 'initial_z', 'float', '0.02', 0, 1, 'controls',
+     'Could not get documentation for item initial_z.'),
+    ('x_ctrl', 'x_ctrl', 'float', '0.0', 0, 2, 'controls',
+     '! ### x_ctrl\n  \n  ! For your own use.'),
+    ('Zbase_Name', 'zbase_name', 'str', "''", 0, 3, 'controls',
+     'Could not get documentation for item zbase_name.'),
+    ('extra_io_item', 'extra_io_item', 'float', '0.5', 0, 4, 'controls',
+     'Could not get documentation for item extra_io_item.'),
+    ('pause', 'pause', 'bool', 'False', 0, 0, 'pgstar',
+     '! ### pause\n  \n  ! Wait for input.'),
+    ('Grid1_win_flag', 'grid1_win_flag', 'int', '0', 0, 1, 'pgstar',
+     'Could not get documentation for item grid1_win_flag.'),
+]
+
+
+def defaults_lines(namelist):
+    return mesa_sources['star/defaults/{}.defaults'.format(
+        namelist)].splitlines(True)
+
+
+def test_language_rows_match_the_old_parser(mesa_dir):
+    assert [tuple(row) for row in generate_language_data(mesa_dir)] == \
+        language_rows
+
+
+def test_doc_text_matches_the_old_parser():
+    lines = defaults_lines('star_job')
+    assert get_doc_text(lines, 'num_steps') == star_job_doc
+    assert get_doc_text(lines, 'grid_values') == \
+        '! ### grid_values(1)\n  ! more'
+    # a header that is never followed by code documents nothing
+    for name in ('dangling_at_end', 'undocumented_item', 'missing'):
+        assert get_doc_text(lines, name) == \
+            'Could not get documentation for item {}.'.format(name)
+
+
+def test_read_defaults():
+    rows = read_defaults(defaults_lines('controls'))
+    assert [row[:4] for row in rows] == [
+        ('initial_mass', 'int', 1, 0), ('initial_z', 'float', 0.02, 0),
+        ('x_ctrl', 'float', 0.0, 0), ('zbase_name', 'str', "''", 0),
+        ('extra_io_item', 'float', 0.5, 0)]
+    assert rows[2][4] == '! ### x_ctrl\n  \n  ! For your own use.'
+
+
+def test_rebuild_only_parses_what_changed(mesa_dir, tmp_path):
+    db_file = str(tmp_path / 'mesa.db')
+    assert sorted(make_database(db_file, mesa_dir)) == [
+        'controls', 'history_columns', 'pgstar', 'profile_columns',
+        'star_job']
+    assert make_database(db_file, mesa_dir) == []
+    # touched files keep their cached parse
+    defaults_file = os.path.join(mesa_dir, 'star/defaults/pgstar.defaults')
+    os.utime(defaults_file, (1, 1))
+    assert make_database(db_file, mesa_dir) == []
+    assert make_database(db_file, mesa_dir) == []
+    write_mesa(mesa_dir, changes={
+        'star/defaults/pgstar.defaults': mesa_sources[
+            'star/defaults/pgstar.defaults'].replace('= 0', '= 3')})
+    assert make_database(db_file, mesa_dir) == ['pgstar']
+    with MesaDatabase(db_file) as db:
+        items = InlistDbHandler(db)
+        assert items.default('grid1_win_flag') == 3
+        assert items.default('num_steps') == 10
+        items.close()
+    assert sorted(make_database(db_file, mesa_dir, force=True)) == [
+        'controls', 'history_columns', 'pgstar', 'profile_columns',
+        'star_job']
+
+
+def test_rebuild_is_atomic(mesa_dir, tmp_path):
+    db_file = str(tmp_path / 'mesa.db')
+    make_database(db_file, mesa_dir)
+    reader = sqlite3.connect(db_file)
+    query = "SELECT dft FROM inlist_items WHERE lower_name='num_steps'"
+    assert reader.execute(query).fetchone() == ('10',)
+    write_mesa(mesa_dir, changes={
+        'star/defaults/star_job.defaults': mesa_sources[
+            'star/defaults/star_job.defaults'].replace('= 10', '= 20')})
+    assert make_database(db_file, mesa_dir) == ['star_job']
+    # a connection opened before the rebuild still sees the old database
+    assert reader.execute(query).fetchone() == ('10',)
+    reader.close()
+    with MesaDatabase(db_file, check_interval=0) as db:
+        assert db.query(query) == [('20',)]
+    assert sorted(os.listdir(str(tmp_path))) == ['mesa', 'mesa.db',
+                                                  'mesa.lang']
+
+
+def test_failed_rebuild_leaves_the_database(mesa_dir, tmp_path,
+                                            monkeypatch):
+    db_file = str(tmp_path / 'mesa.db')
+    make_database(db_file, mesa_dir)
+
+    def fail(conn):
+        raise RuntimeError('interrupted')
+
+    monkeypatch.setattr(database, '_index_docs', fail)
+    with pytest.raises(RuntimeError):
+        make_database(db_file, mesa_dir, force=True)
+    assert sorted(os.listdir(str(tmp_path))) == ['mesa', 'mesa.db',
+                                                  'mesa.lang']
+    with MesaDatabase(db_file) as db:
+        assert InlistDbHandler(db).default('num_steps') == 10
+
+
+@pytest.fixture
+def two_versions(mesa_dir, tmp_path):
+    """Database of the small installation as versions 10398 and 12115, the
+    later one with a changed default, a removed and an added item."""
+    db_file = str(tmp_path / 'mesa.db')
+    make_database(db_file, mesa_dir)
+    defaults = mesa_sources['star/defaults/star_job.defaults']
+    write_mesa(mesa_dir, version='12115', changes={
+        'star/defaults/star_job.defaults': defaults.replace(
+            '= 10', '= 20').replace('only_in_defaults', 'new_item')})
+    make_database(db_file, mesa_dir)
+    db = MesaDatabase(db_file)
+    yield InlistDbHandler(db)
+    db.close()
+
+
+def test_versions(two_versions):
+    assert two_versions.versions() == ['10398', '12115']
+    assert two_versions.default('num_steps') == 20
+    assert two_versions.find_namelist_item(
+        'num_steps', version='r10398').default == 10
+    assert InlistDbHandler(two_versions.db, version=10398).default(
+        'num_steps') == 10
+    with pytest.raises(database.InvalidItemError):
+        two_versions.find_namelist_item('new_item', version=10398)
+
+
+def test_diff_versions(two_versions):
+    diff = two_versions.diff_versions(10398, 'r12115')
+    assert [item.name for item in diff['added']] == ['new_item']
+    assert [item.name for item in diff['removed']] == ['only_in_defaults']
+    assert [(old.name, old.default, new.default) for old, new in
+            diff['changed']] == [('num_steps', 10, 20)]
+    backwards = two_versions.diff_versions(12115, 10398)
+    assert [item.name for item in backwards['added']] == [
+        'only_in_defaults']
+    assert two_versions.diff_versions(10398, 12115, namelist='controls') == {
+        'added': [], 'removed': [], 'changed': []}
+
+
+@pytest.fixture
+def db_file(mesa_dir, tmp_path):
+    """Path of a database built from the small installation."""
+    db_file = str(tmp_path / 'mesa.db')
+    make_database(db_file, mesa_dir)
+    return db_file
+
+
+def test_lookups_use_indexes(db_file):
+    with MesaDatabase(db_file) as db:
+        for where in ("lower_name='num_steps'",
+                      "namelist='controls' ORDER BY position"):
+            plan = db.query("EXPLAIN QUERY PLAN SELECT * FROM "
+                            "versioned_items WHERE version='10398' AND " +
+                            where)
+            assert 'USING INDEX' in plan[0][3]
+
+
+def test_search_doc(db_file):
+    with MesaDatabase(db_file) as db:
+        items = InlistDbHandler(db)
+        assert [item.name for item in items.search_doc('shared')] == [
+            'num_steps', 'save_model_filename']
+        # every word must match, in any order
+        assert [item.name for item in items.search_doc('msun mass')] == [
+            'initial_mass']
+        assert items.search_doc('mass shared') == []
+        assert items.search_doc('shared', namelist='controls') == []
+        assert [item.name for item in items.search_doc('shared',
+                                                       limit=1)] == [
+            'num_steps']
+        item, snippet = items.search_doc('own use', snippets=True)[0]
+        assert item.name == 'x_ctrl'
+        assert '[own] [use]' in snippet
+        # without the index, the term is matched as is
+        items._doc_index = False
+        assert [item.name for item in items.search_doc('by two')] == [
+            'num_steps', 'save_model_filename']
+        assert items.search_doc('two by') == []
+
+
+def handlers(db):
+    """Handlers that query the database, preload, and use the snapshot."""
+    return [InlistDbHandler(db, use_snapshot=False),
+            InlistDbHandler(db, preload=True, use_snapshot=False),
+            InlistDbHandler(db)]
+
+
+def test_lookups_agree_in_every_mode(db_file):
+    # more names than can be bound in one query
+    names = (['NUM_STEPS', 'missing', 'zbase_name', 'num_steps'] +
+             ['missing_{}'.format(i) for i in range(1200)] + ['pause'])
+    with MesaDatabase(db_file) as db:
+        for items in handlers(db):
+            found = items.find_namelist_items(names)
+            assert len(found) == len(names)
+            assert [item.to_tuple() for item in found if item is not None] \
+                == [language_rows[i] for i in (1, 11, 1, 13)]
+            assert found.count(None) == 1201
+            assert items.find_namelist_item('Mixed_case').default == 3.0
+            assert items.names['controls'] == [
+                'initial_mass', 'initial_z', 'x_ctrl', 'zbase_name',
+                'extra_io_item']
+            assert items.data['pgstar'][1]['name'] == 'Grid1_win_flag'
+            assert items.find_namelist_items([]) == []
+
+
+def test_threads_get_their_own_connections(db_file):
+    db = MesaDatabase(db_file)
+    barrier = threading.Barrier(4)
+    results = []
+
+    def lookup(name):
+        # all threads hold a connection at once
+        barrier.wait()
+        results.append(db.query('SELECT dft FROM inlist_items WHERE '
+                                'lower_name=?', (name,)))
+        barrier.wait()
+
+    threads = [threading.Thread(target=lookup, args=(name,)) for name in
+               ('num_steps', 'pause', 'initial_z', 'num_steps')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [[('0.02',)], [('10',)], [('10',)],
+                               [('False',)]]
+    assert len(db._connections) == 4
+    db.close()
+    assert len(db._connections) == 0
+    # connections are read only, and reopen after closing
+    with pytest.raises(sqlite3.OperationalError):
+        db.query('DELETE FROM versions')
+    assert db.query('SELECT COUNT(*) FROM versions') == [(1,)]
+    db.close()
+
+
+def test_connections_reopen_once_the_file_is_replaced(db_file, mesa_dir):
+    db = MesaDatabase(db_file, check_interval=60)
+    query = "SELECT dft FROM inlist_items WHERE lower_name='pause'"
+    assert db.query(query) == [('False',)]
+    write_mesa(mesa_dir, changes={
+        'star/defaults/pgstar.defaults': mesa_sources[
+            'star/defaults/pgstar.defaults'].replace('.false.', '.true.')})
+    make_database(db_file, mesa_dir)
+    # the file is only checked every check_interval seconds
+    assert db.query(query) == [('False',)]
+    db.check_interval = 0
+    assert db.query(query) == [('True',)]
+    db.close()
+
+
+def test_trigram_index():
+    index = TrigramIndex(['mesh_delta_coeff', 'max_age', 'max_model_number',
+                          'max_age'])
+    assert index.names == ['mesh_delta_coeff', 'max_age',
+                           'max_model_number']
+    matches = index.similar('MAX_AEG')
+    assert matches[0][0] == 'max_age'
+    assert 0 < matches[0][1] < 1
+    assert index.similar('max_age')[0] == ('max_age', 1.0)
+    assert index.similar('zzzz') == []
+    assert index.similar('max', limit=1, min_similarity=0) == [
+        index.similar('max', min_similarity=0)[0]]
+
+
+def test_misspelled_names_get_suggestions(db_file):
+    with MesaDatabase(db_file) as db:
+        for items in handlers(db):
+            assert items.suggest('num_step') == ['num_steps']
+            assert items.suggest('INITIAL_MAS')[:2] == ['initial_mass',
+                                                        'initial_z']
+            # suggestions keep the case of the defining file
+            assert items.suggest('mixed_cas') == ['Mixed_Case']
+            with pytest.raises(InvalidItemError) as error:
+                items.default('num_step')
+            assert error.value.suggestions == ['num_steps']
+            assert 'Did you mean num_steps?' in str(error.value)
+
+
+def test_snapshot_serves_lookups_without_the_database(db_file):
+    snapshot = LanguageSnapshot(snapshot_path(db_file))
+    assert snapshot.is_current(db_file)
+    assert snapshot.versions == ['10398']
+    language = snapshot.language()
+    assert language.names == [row[0] for row in language_rows]
+    assert language.find('zbase_name').to_tuple() == language_rows[11]
+    assert snapshot.language('1') is None
+    snapshot.close()
+    db = MesaDatabase(db_file)
+    items = InlistDbHandler(db)
+    assert items.default('num_steps') == 10
+    assert items.suggest('num_step') == ['num_steps']
+    assert db._connections == {}
+    items.close()
+    db.close()
+
+
+def test_stale_snapshots_are_not_used(db_file, mesa_dir):
+    db = MesaDatabase(db_file, check_interval=60)
+    items = InlistDbHandler(db)
+    assert items.default('pause') is False
+    write_mesa(mesa_dir, changes={
+        'star/defaults/pgstar.defaults': mesa_sources[
+            'star/defaults/pgstar.defaults'].replace('.false.', '.true.')})
+    make_database(db_file, mesa_dir)
+    db.check_interval = 0
+    assert items.default('pause') is True
+    items.close()
+    # a snapshot left behind by another database is ignored
+    old_snapshot = snapshot_path(db_file)
+    os.rename(old_snapshot, old_snapshot + '.old')
+    make_database(db_file, mesa_dir, force=True)
+    os.replace(old_snapshot + '.old', old_snapshot)
+    snapshot = LanguageSnapshot(old_snapshot)
+    assert not snapshot.is_current(db_file)
+    snapshot.close()
+    fresh = InlistDbHandler(db)
+    assert fresh._get_snapshot() is None
+    assert fresh.default('pause') is True
+    db.close()
+
+
+def test_read_column_list():
+    lines = mesa_sources['star/defaults/history_columns.list'].splitlines(
+        True)
+    # prose comments are skipped and only the first star_age is kept
+    assert read_column_list(lines) == [
+        ['model_number', True, None, 'general', 'alias: model', ['model']],
+        ['star_age', True, None, 'general', 'aliases: age, time',
+         ['age', 'time']],
+        ['log_L', False, None, 'general', '', []],
+        ['num_zones', True, None, 'general', '', []],
+        ['total_mass', False, 'h1', 'abundances', 'mass of h1 in Msun', []]]
+
+
+def test_columns(db_file):
+    with MesaDatabase(db_file) as db:
+        columns = ColumnDbHandler(db)
+        found = columns.find_columns(['MODEL', 'time', 'log_l',
+                                      'total_mass_h1', 'logT', 'missing'])
+        assert [None if column is None else column.name for column in
+                found] == ['model_number', 'star_age', 'log_L',
+                           'total_mass', None, None]
+        assert not found[2].enabled
+        assert found[3].argument == 'h1'
+        assert columns.find_column('log_T', kind='profile').name == 'logT'
+        assert [column.name for column in columns.columns(
+            enabled_only=True)] == ['model_number', 'star_age', 'num_zones']
+        assert [column.order for column in columns.columns()] == list(
+            range(5))
+        with pytest.raises(InvalidItemError) as error:
+            columns.find_column('num_zone')
+        assert error.value.suggestions == ['num_zones']
+        assert columns.find_columns([]) == []
+        assert columns.find_columns(['zone'], version=10398)[0] is None
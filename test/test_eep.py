@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pytest
+
+from mesatools import reader
+from mesatools.eep import find_primary_eeps, resample, resample_tracks
+from mesatools.reader import MesaData
+
+from conftest import write_logs
+
+phases = ['PreMS', 'ZAMS', 'IAMS', 'TAMS']
+
+
+def track(rows=100):
+    """Main sequence track with ZAMS at row 11, IAMS at row 50, and TAMS at
+    row 80, and a distance metric column `x` equal to the row."""
+    x = np.arange(rows, dtype=float)
+    h1 = np.clip(np.where(x <= 10, 0.7, 0.695 - 0.01 * (x - 10)), 0, None)
+    return {'center_h1': h1, 'x': x, 'y': 2 * x}
+
+
+def test_primary_eeps():
+    assert find_primary_eeps(track(), phases).tolist() == [0, 11, 50, 80]
+    # once an EEP isn't reached, neither are any that follow
+    assert find_primary_eeps(track(60), phases).tolist() == [0, 11, 50, -1]
+    with pytest.raises(reader.KeyError):
+        find_primary_eeps({'x': np.arange(5.0)}, phases)
+
+
+def test_resample():
+    eeps = resample(track(), ['y'], points=[2, 2, 2], phases=phases,
+                    metric={'x': 1.0})
+    # halfway between primary EEPs in x, and so in y = 2 x
+    assert eeps[:, 0].tolist() == [0, 11, 22, 61, 100, 130, 160]
+    short = resample(track(60), ['y'], points=2, phases=phases,
+                     metric={'x': 1.0})
+    assert short[:4, 0].tolist() == [0, 11, 22, 61]
+    assert np.isnan(short[4:]).all()
+    with pytest.raises(ValueError):
+        resample(track(), ['y'], points=[2, 2], phases=phases)
+
+
+def test_resample_tracks_of_files_and_data(tmp_path):
+    files = [os.path.join(write_logs(str(tmp_path / 'run{}'.format(i)),
+                                     num_models=n), 'history.data')
+             for i, n in enumerate((30, 50))]
+    metric = {'star_age': 1.0}
+    keys = ['log_L', 'model_number']
+    from_files = resample_tracks(files, keys, points=5,
+                                 phases=['PreMS', 'ZAMS'], metric=metric,
+                                 max_workers=2)
+    from_data = resample_tracks([MesaData(f) for f in files], keys,
+                                points=5, phases=['PreMS', 'ZAMS'],
+                                metric=metric)
+    assert from_files.shape == (2, 6, 2)
+    assert np.allclose(from_files, from_data)
+    # ZAMS is at model 3 in both runs
+    assert np.allclose(from_files[:, -1, 1], 3)
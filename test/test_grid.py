@@ -0,0 +1,86 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from mesatools.grid import MesaGrid, find_runs, map_reduce
+
+from conftest import write_logs
+
+
+@pytest.fixture
+def grid(tmp_path):
+    """Grid of runs of 10 to 60 models, nested at different depths, with
+    a hidden run and a run whose history is unreadable."""
+    root = tmp_path / 'grid'
+    for i, run in enumerate(['a/run1', 'a/run2', 'b/c/run3', 'run4',
+                             '.hidden/run5']):
+        write_logs(str(root / run / 'LOGS'), num_models=10 * (i + 1))
+    os.makedirs(str(root / 'broken' / 'LOGS'))
+    with open(str(root / 'broken' / 'LOGS' / 'history.data'), 'w') as f:
+        f.write('not a history\n')
+    return str(root)
+
+
+def test_find_runs(grid):
+    assert [os.path.relpath(path, grid) for path in find_runs(grid)] == [
+        'a/run1', 'a/run2', 'b/c/run3', 'broken', 'run4']
+
+
+def test_grid_summary(grid):
+    g = MesaGrid(grid, columns=['star_age'],
+                 events={'depleted': 'center_h1 < 0.6655'}, max_workers=2)
+    assert list(g.failures) == [os.path.join(grid, 'broken')]
+    assert [os.path.relpath(path, grid) for path in g.run_paths] == [
+        'a/run1', 'a/run2', 'b/c/run3', 'run4']
+    assert g.summary.final_star_age.tolist() == [1e8, 2e8, 3e8, 4e8]
+    assert g.summary.initial_mass.tolist() == [1.0] * 4
+    # center_h1 drops below 0.6655 at model 35
+    assert np.isnan(g.summary.depleted_model_number[:3]).all()
+    assert g.summary.depleted_model_number[3] == 35
+    assert g.select('final_star_age > 2.5e8').tolist() == g.run_paths[
+        2:].tolist()
+    assert g.log_dir_of(0).history.model_number[-1] == 10
+
+
+def count_models(data, run_path):
+    if run_path.endswith('broken'):
+        raise ValueError('no data')
+    return len(data['model_number'])
+
+
+def add(result, value):
+    return result + value
+
+
+def fail_on_40(result, value):
+    if value == 40:
+        raise RuntimeError('bad reduction')
+    return result + value
+
+
+def test_map_reduce(grid):
+    total, failures = map_reduce(count_models, add, 0, root=grid,
+                                 columns=['model_number'], max_workers=2,
+                                 max_pending=2)
+    assert total == 100
+    assert list(failures) == [os.path.join(grid, 'broken')]
+
+
+def test_map_reduce_resumes_from_checkpoint(grid, tmp_path):
+    checkpoint = str(tmp_path / 'sweep.pkl')
+    with pytest.raises(RuntimeError):
+        map_reduce(count_models, fail_on_40, 0, root=grid,
+                   columns=['model_number'], checkpoint=checkpoint,
+                   max_workers=1, max_pending=1)
+    with open(checkpoint, 'rb') as f:
+        result, done = pickle.load(f)
+    # runs finished before the bad reduction are kept
+    assert result == sum(10 * (i + 1) for i in range(3))
+    assert len(done) == 3
+    total, failures = map_reduce(count_models, add, 0, root=grid,
+                                 columns=['model_number'],
+                                 checkpoint=checkpoint, max_workers=2)
+    assert total == 100
+    assert len(failures) == 1
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from mesatools.kippenhahn import KippenhahnDiagram, outside_star
+from mesatools.reader import HistoryError, MesaData
+
+
+def history(model_numbers=(1, 2, 3)):
+    """History of a 2 Msun star with a convective core that grows from a
+    quarter to half of its mass in model 3, and hydrogen burning in the
+    inner tenth."""
+    rows = []
+    for m_num in model_numbers:
+        core = 0.5 if m_num >= 3 else 0.25
+        rows.append((m_num, 2.0, 1, core, 0, 1.0, -1, -1.0, 3.0, 0.1, -1,
+                     -1.0))
+    names = ['model_number', 'star_mass', 'mix_type_1', 'mix_qtop_1',
+             'mix_type_2', 'mix_qtop_2', 'mix_type_3', 'mix_qtop_3',
+             'burn_type_1', 'burn_qtop_1', 'burn_type_2', 'burn_qtop_2']
+    bulk_data = np.rec.fromrecords(rows, names=names)
+    return MesaData.from_data(bulk_data, {}, 'history.data')
+
+
+def test_rasterized_regions():
+    k = KippenhahnDiagram(history(), y='q', nx=None, ny=8)
+    assert k.x.tolist() == [1, 2, 3]
+    assert k.y.tolist() == [(i + 0.5) / 8 for i in range(8)]
+    assert k.mixing.T.tolist() == [[1, 1, 0, 0, 0, 0, 0, 0],
+                                   [1, 1, 0, 0, 0, 0, 0, 0],
+                                   [1, 1, 1, 1, 0, 0, 0, 0]]
+    assert (k.burning[0] == 3).all()
+    assert np.isnan(k.burning[1:]).all()
+    # chunking doesn't change the result
+    chunked = KippenhahnDiagram(history(), y='q', nx=None, ny=8,
+                                chunk_size=2)
+    assert np.array_equal(chunked.mixing, k.mixing)
+
+
+def test_cells_above_the_surface():
+    k = KippenhahnDiagram(history(), nx=3, ny=4, y_range=(0, 4))
+    assert k.x.tolist() == [1, 2, 3]
+    assert k.star_mass.tolist() == [2.0] * 3
+    assert k.mixing[:, 0].tolist() == [1, 0, outside_star, outside_star]
+    assert np.isnan(k.burning[2:]).all()
+
+
+def test_bad_axes():
+    with pytest.raises(HistoryError):
+        KippenhahnDiagram(history([1, 3, 2]))
+    with pytest.raises(ValueError):
+        KippenhahnDiagram(history(), y='radius')
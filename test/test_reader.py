@@ -0,0 +1,223 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from mesatools import reader
+from mesatools.reader import MesaData, MesaLogDir, ProfileError
+
+from conftest import (append_history, write_history, write_index,
+                      write_profile)
+
+
+def test_read_ignores_partly_written_row(logs):
+    append_history(logs, [51, 52], partial=True)
+    history = MesaData(logs + '/history.data')
+    assert history.model_number[-1] == 51
+    write_history(logs, range(1, 53))
+    assert history.update_data() == 1
+    assert history.model_number[-1] == 52
+
+
+def test_refresh_appends_new_rows(logs):
+    l = MesaLogDir(logs)
+    append_history(logs, range(51, 56))
+    new_models, new_profiles = l.refresh()
+    assert new_models.tolist() == [51, 52, 53, 54, 55]
+    assert len(new_profiles) == 0
+    assert l.history.model_number.tolist() == list(range(1, 56))
+
+
+def test_refresh_waits_for_complete_rows(logs):
+    l = MesaLogDir(logs)
+    append_history(logs, [51, 52], partial=True)
+    assert l.refresh()[0].tolist() == [51]
+    write_history(logs, range(1, 53))
+    assert l.refresh()[0].tolist() == [52]
+    assert l.history.model_number.tolist() == list(range(1, 53))
+
+
+def test_refresh_drops_rows_made_obsolete_by_a_restart(logs):
+    l = MesaLogDir(logs)
+    append_history(logs, range(45, 53))
+    assert l.refresh()[0].tolist() == list(range(45, 53))
+    model_numbers = l.history.model_number
+    assert model_numbers.tolist() == list(range(1, 53))
+    assert np.allclose(l.history.star_age, model_numbers * 1e7)
+
+
+def test_refresh_rereads_a_shrunken_history(logs):
+    l = MesaLogDir(logs)
+    write_history(logs, range(1, 21))
+    append_history(logs, [21], partial=True)
+    l.refresh()
+    assert l.history.model_number.tolist() == list(range(1, 21))
+
+
+def test_refresh_finds_new_profiles_and_notifies(logs):
+    l = MesaLogDir(logs)
+    seen = {'new_model': [], 'new_profile': []}
+    for event in seen:
+        l.subscribe(event, lambda log_dir, number, event=event:
+                    seen[event].append(number))
+    append_history(logs, range(51, 61))
+    write_profile(logs, 6, 60)
+    write_index(logs, [10, 20, 30, 40, 50, 60])
+    new_models, new_profiles = l.refresh()
+    assert new_profiles.tolist() == [6]
+    assert seen['new_model'] == list(range(51, 61))
+    assert seen['new_profile'] == [6]
+    assert l.profile_with_model_number(60) == 6
+    assert l.profile_data(model_number=60).header('model_number') == 60
+    assert l.refresh()[1].tolist() == []
+
+
+def test_summary_is_the_same_lazy_or_not(logs):
+    eager = MesaLogDir(logs).summary()
+    lazy = MesaLogDir(logs, lazy=True).summary()
+    assert lazy['num_profiles'] == eager['num_profiles'] == 5
+    assert lazy['header'] == eager['header']
+    assert list(lazy['last']) == list(eager['last'])
+    for name, value in eager['last'].items():
+        assert type(lazy['last'][name]) is type(value)
+        assert lazy['last'][name] == value
+    assert eager['last']['model_number'] == 50
+
+
+def test_lazy_summary_leaves_the_history_unread(logs):
+    l = MesaLogDir(logs, lazy=True)
+    l.summary()
+    assert l._history is None
+    assert l.history.model_number[-1] == 50
+
+
+def test_summary_of_an_empty_index(logs):
+    write_index(logs, [])
+    for lazy in (True, False):
+        l = MesaLogDir(logs, lazy=lazy)
+        assert l.summary()['num_profiles'] == 0
+        assert len(l.profile_numbers) == 0
+
+
+def test_profile_lookups(logs):
+    l = MesaLogDir(logs)
+    assert l.profile_with_model_number(30) == 3
+    assert l.profiles.model_with_profile_number(3) == 30
+    assert l.profiles_with_model_numbers([50, 10, 30]).tolist() == [5, 1, 3]
+    assert l.models_with_profile_numbers([2, 4]).tolist() == [20, 40]
+    assert l.have_profile_with_model_number(40)
+    assert not l.have_profile_with_model_number(41)
+    with pytest.raises(ProfileError):
+        l.profile_with_model_number(41)
+    with pytest.raises(ProfileError):
+        l.profiles_with_model_numbers([10, 11])
+
+
+def test_catalog_finds_missing_and_extra_profiles(logs):
+    os.remove(os.path.join(logs, 'profile2.data'))
+    write_profile(logs, 9, 90)
+    l = MesaLogDir(logs)
+    assert l.catalog.profile_numbers.tolist() == [1, 3, 4, 5, 9]
+    assert l.missing_profiles.tolist() == [2]
+    assert l.extra_profiles.tolist() == [9]
+    assert l.catalog.path(3) == os.path.join(logs, 'profile3.data')
+    assert 'history.data' in l.catalog.other_files
+
+
+def test_select_models(logs):
+    l = MesaLogDir(logs)
+    # star_age is 1e7 times the model number
+    expected = [40, 50]
+    assert l.select_models(lambda age: age > 3.5e8,
+                           'star_age').tolist() == expected
+    assert l.select_models(lambda age: age > 3.5e8, 'star_age',
+                           vectorized=True).tolist() == expected
+    assert l.select_models('star_age > 3.5e8').tolist() == expected
+    assert l.select_models(
+        'star_age > 1.5e8 & ~(log10(star_age) > 8.5)').tolist() == [20, 30]
+    assert l.select_models('star_age < 0').tolist() == []
+
+
+def test_select_models_rejects_bad_names_and_code(logs):
+    l = MesaLogDir(logs)
+    with pytest.raises(reader.KeyError):
+        l.select_models('no_such_column > 1')
+    with pytest.raises(reader.KeyError):
+        l.select_models(lambda x: x, 'no_such_column')
+    with pytest.raises(ValueError):
+        l.select_models('__import__("os").getcwd()')
+
+
+def test_async_reads(logs):
+    async def main():
+        l = await MesaLogDir.aopen(logs, lazy=True)
+        history = await l.ahistory()
+        profiles = await asyncio.gather(
+            *(l.aprofile_data(model_number=m) for m in (20, 20, 40)))
+        seen = [p.header('model_number') async for p in l.aiter_profiles()]
+        return l, history, profiles, seen
+
+    l, history, profiles, seen = asyncio.run(main())
+    assert history.model_number[-1] == 50
+    assert profiles[0] is profiles[1]
+    assert profiles[2].header('model_number') == 40
+    assert seen == [10, 20, 30, 40, 50]
+    # a new event loop gets its own limit and shared reads
+    l.profile_dict.clear()
+    assert asyncio.run(l.aprofile_data(profile_number=2)).header(
+        'model_number') == 20
+
+
+def test_cancelled_async_read_is_not_kept(logs):
+    l = MesaLogDir(logs)
+    started = threading.Event()
+    release = threading.Event()
+    load_profile = l._load_profile
+
+    def slow_load(profile_number):
+        started.set()
+        release.wait(5)
+        return load_profile(profile_number)
+
+    l._load_profile = slow_load
+
+    async def main():
+        task = asyncio.ensure_future(l.aprofile_data(model_number=10))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # the running read keeps its place until it finishes
+        limit = l._loop_state()[0]
+        assert limit._value == l.max_concurrent_reads - 1
+        release.set()
+        while limit._value < l.max_concurrent_reads:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert 1 not in l.profile_dict
+
+
+def test_track_at(logs):
+    l = MesaLogDir(logs)
+    # mass runs from 1 at the surface to 0 at the center, and logT is
+    # 7 - mass + model_number / 1000
+    track = l.track_at('mass', [0.25, 0.5, 2], ['logT', 'zone'],
+                       model_numbers=[20, 40])
+    assert track['model_number'].tolist() == [20, 40]
+    assert np.allclose(track['logT'][:, :2], [[6.77, 6.52], [6.79, 6.54]])
+    assert np.isnan(track['logT'][:, 2]).all()
+    assert np.allclose(track['zone'][:, 0], 1 + 0.75 * 19)
+    with ThreadPoolExecutor(2) as executor:
+        all_models = l.track_at('mass', 0.5, ['logT'], executor=executor)
+    assert all_models['logT'].shape == (5, 1)
+
+
+def test_track_at_without_keys(logs):
+    l = MesaLogDir(logs)
+    assert list(l.track_at('mass', [0.5])) == ['model_number']
+    assert l.track_at('mass', [0.5], ['logT'],
+                      model_numbers=[])['logT'].shape == (0, 1)
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from mesatools.workqueue import MesaWorkQueue, _key
+
+from conftest import write_logs
+
+
+def count_models(data, run_path):
+    """Work function that notes every call in the run directory."""
+    with open(os.path.join(run_path, 'calls'), 'a') as f:
+        f.write('{}\n'.format(os.getpid()))
+    return len(data['model_number'])
+
+
+def crash_on_run_2(data, run_path):
+    if run_path.endswith('run2'):
+        os._exit(1)
+    return 0
+
+
+@pytest.fixture
+def queue(tmp_path):
+    for i in range(8):
+        write_logs(str(tmp_path / 'grid' / 'run{}'.format(i) / 'LOGS'),
+                   num_models=10 * (i + 1))
+    return MesaWorkQueue.create(str(tmp_path / 'queue'),
+                                str(tmp_path / 'grid'))
+
+
+def calls(run_path):
+    with open(os.path.join(run_path, 'calls')) as f:
+        return len(f.readlines())
+
+
+def test_workers_share_the_queue(queue):
+    counts = []
+
+    def worker():
+        counts.append(MesaWorkQueue(queue.queue_dir).work(
+            count_models, columns=['model_number'], max_workers=2,
+            lease_timeout=30, poll_interval=0.1))
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(counts) == 8
+    assert queue.is_finished()
+    assert queue.failures() == {}
+    results = queue.results()
+    for path in queue.run_paths:
+        assert calls(path) == 1
+        assert results[path] == 10 * (int(path[-1]) + 1)
+    assert os.listdir(os.path.join(queue.queue_dir, 'claims')) == []
+
+
+def test_expired_claims_are_recovered(queue):
+    path = queue.run_paths[0]
+    claim_file = os.path.join(queue.queue_dir, 'claims', _key(path))
+    with open(claim_file, 'w') as f:
+        json.dump({'worker': 'crashed', 'run': path, 'time': 0}, f)
+    os.utime(claim_file, (0, 0))
+    assert queue.work(count_models, columns=['model_number'], max_workers=2,
+                      lease_timeout=30, poll_interval=0.1) == 8
+    assert queue.is_finished()
+    assert calls(path) == 1
+
+
+def test_live_claims_are_left_alone(queue):
+    path = queue.run_paths[0]
+    other = MesaWorkQueue(queue.queue_dir)
+    assert other._claim(1, 30) == [path]
+    assert queue.work(count_models, columns=['model_number'], max_workers=2,
+                      lease_timeout=30, poll_interval=0.1,
+                      wait_for_all=False) == 7
+    assert queue.status() == {'finished': 7, 'claimed': 1, 'unclaimed': 0}
+
+
+def test_fresh_claim_is_not_recovered_twice(queue):
+    path = queue.run_paths[0]
+    claim_file = os.path.join(queue.queue_dir, 'claims', _key(path))
+    with open(claim_file, 'w') as f:
+        json.dump({'worker': 'crashed', 'run': path, 'time': 0}, f)
+    os.utime(claim_file, (0, 0))
+    first, second = (MesaWorkQueue(queue.queue_dir) for _ in range(2))
+    # both saw the claim expire, but the first recovers and re-claims it
+    now = first._fs_now()
+    assert first._recover(claim_file, now, 30)
+    assert first._try_claim(claim_file, path)
+    assert not second._recover(claim_file, now, 30)
+    with open(claim_file) as f:
+        assert json.load(f)['worker'] == first.worker_id
+    assert os.listdir(os.path.join(queue.queue_dir, 'claims')) == [
+        _key(path)]
+
+
+def test_broken_pool_releases_claims(queue):
+    with pytest.raises(BrokenProcessPool):
+        queue.work(crash_on_run_2, columns=['model_number'], max_workers=2,
+                   lease_timeout=30, poll_interval=0.1)
+    status = queue.status()
+    assert status['claimed'] == 0
+    assert queue.failures() == {}
+    assert status['unclaimed'] >= 1